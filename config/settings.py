@@ -7,6 +7,74 @@ TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
 GOOGLE_SHEETS_CREDENTIALS = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "service_account.json")
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID", "")
 
+# Максимум одновременных запросов к Google Sheets из пула потоков
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", "8"))
+
+# Время жизни снимков справочных листов в памяти (секунды, 0 — без кэша)
+SHEETS_CACHE_TTL = int(os.getenv("SHEETS_CACHE_TTL", "60"))
+
+# Период полной перечитки листа "Расходы" (секунды); в промежутках
+# подтягиваются только новые строки
+SHEETS_FULL_RELOAD_INTERVAL = int(os.getenv("SHEETS_FULL_RELOAD_INTERVAL", "900"))
+
+# Окно накопления добавляемых строк перед одним append_rows (секунды)
+# и максимальный размер такой пачки
+SHEETS_WRITE_BATCH_WINDOW = float(os.getenv("SHEETS_WRITE_BATCH_WINDOW", "0.5"))
+SHEETS_WRITE_BATCH_SIZE = int(os.getenv("SHEETS_WRITE_BATCH_SIZE", "100"))
+
+# Квоты Google Sheets API на запросы чтения и записи в минуту (на сервисный
+# аккаунт), сколько запросов можно выполнить подряд без ожидания
+# и сколько раз повторять запрос после 429/5xx
+SHEETS_READS_PER_MINUTE = int(os.getenv("SHEETS_READS_PER_MINUTE", "60"))
+SHEETS_WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+SHEETS_RATE_BURST = int(os.getenv("SHEETS_RATE_BURST", "10"))
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+
+# Рассылка сообщений в Telegram: одновременных отправок, сообщений в секунду
+# на бота (лимит Telegram — около 30), пауза между сообщениями в один чат
+# (секунды) и сколько раз повторять отправку после сетевого сбоя или 5xx
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+BROADCAST_PER_SECOND = float(os.getenv("BROADCAST_PER_SECOND", "25"))
+BROADCAST_CHAT_INTERVAL = float(os.getenv("BROADCAST_CHAT_INTERVAL", "1.0"))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+# Каталог локальных баз SQLite (журнал, задачи планировщика, хранилище);
+# создаётся при запуске, в репозиторий не попадает
+DATA_DIR = os.getenv("DATA_DIR", "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Локальный журнал сохранений (SQLite), максимальная пауза между
+# повторами переноса записи в Sheets (секунды) и число попыток, после
+# которого запись снимается с очереди и администраторы получают уведомление
+JOURNAL_DB_PATH = os.getenv("JOURNAL_DB_PATH", os.path.join(DATA_DIR, "journal.db"))
+JOURNAL_RETRY_MAX_DELAY = int(os.getenv("JOURNAL_RETRY_MAX_DELAY", "300"))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "20"))
+
+# База задач планировщика отчётов (SQLite) с историей запусков; сколько
+# секунд после пропущенного времени задачу ещё можно выполнить (после
+# перезапуска бота) и пауза между догоняющими запусками (секунды)
+SCHEDULER_DB_PATH = os.getenv("SCHEDULER_DB_PATH", os.path.join(DATA_DIR, "scheduler.db"))
+SCHEDULER_MISFIRE_GRACE_TIME = int(os.getenv("SCHEDULER_MISFIRE_GRACE_TIME", "14400"))
+SCHEDULER_CATCHUP_STAGGER = int(os.getenv("SCHEDULER_CATCHUP_STAGGER", "60"))
+
+# Напоминание о нулевом/отрицательном балансе, пока он не восстановится
+# (часы, 0 — уведомлять только при переходе баланса в минус; 24 — раз в сутки)
+BALANCE_ALERT_REMINDER_HOURS = int(os.getenv("BALANCE_ALERT_REMINDER_HOURS", "0"))
+
+# Хранилище данных: "sheets" — напрямую Google Sheets,
+# "sqlite" — локальная база с зеркалированием в Google Sheets
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets").lower()
+LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", os.path.join(DATA_DIR, "storage.db"))
+
+# Имитация Google Sheets в памяти для нагрузочных замеров (без реальных квот)
+FAKE_SHEETS = os.getenv("FAKE_SHEETS", "").lower() in ("1", "true", "yes")
+FAKE_SHEETS_LATENCY_MS = float(os.getenv("FAKE_SHEETS_LATENCY_MS", "150"))
+FAKE_SHEETS_JITTER_MS = float(os.getenv("FAKE_SHEETS_JITTER_MS", "50"))
+FAKE_SHEETS_ERROR_RATE = float(os.getenv("FAKE_SHEETS_ERROR_RATE", "0"))
+FAKE_SHEETS_READS_PER_MINUTE = int(os.getenv("FAKE_SHEETS_READS_PER_MINUTE", "300"))
+FAKE_SHEETS_WRITES_PER_MINUTE = int(os.getenv("FAKE_SHEETS_WRITES_PER_MINUTE", "300"))
+FAKE_SHEETS_SEED = os.getenv("FAKE_SHEETS_SEED", "")  # JSON {"лист": [[...], ...]} или путь к JSON-файлу
+
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN не найден в .env")
 if not SPREADSHEET_ID:
@@ -1,20 +1,31 @@
+import logging
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, ReplyKeyboardRemove
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+    ReplyKeyboardRemove,
+)
 
 from keyboards.main_menu import get_admin_menu, get_user_menu, get_back_keyboard
 from utils.google_sheets import (
     add_employee_to_sheet,
     block_employee,
     check_photo_ownership,
-    get_all_expenses,
     get_employees_from_sheet,
 )
 from utils.sheets_extended import set_employee_limit
 from utils.states import AdminStates, ViewStates, LimitStates
 from utils.decorators import role_required, ROLE_OWNER, ROLE_CHIEF_ACCOUNTANT
+from utils.sheets_gateway import run_sheets
+from utils.expense_store import get_expense_table
+from utils.balance_ledger import find_balance_drift, repair_balance_drift
 
+logger = logging.getLogger(__name__)
 router = Router()
 
 
@@ -121,7 +132,7 @@ async def add_employee_finish(message: Message, state: FSMContext):
     first_name = data["first_name"]
     last_name = message.text.strip()
 
-    ok = add_employee_to_sheet(emp_id, first_name, last_name, role="Сотрудник")
+    ok = await run_sheets(add_employee_to_sheet, emp_id, first_name, last_name, role="Сотрудник")
 
     await state.clear()
     if ok:
@@ -164,7 +175,7 @@ async def remove_employee_finish(message: Message, state: FSMContext):
         await message.answer("Введите целое число")
         return
 
-    ok = block_employee(emp_id)
+    ok = await run_sheets(block_employee, emp_id)
     await state.clear()
 
     if ok:
@@ -185,25 +196,19 @@ async def show_stats(message: Message, is_admin: bool):
         await message.answer("Команда доступна только администраторам")
         return
 
-    expenses = get_all_expenses()
-    if not expenses:
+    try:
+        table = await run_sheets(get_expense_table)
+    except Exception as e:
+        logger.error(f"❌ Ошибка чтения расходов: {e}")
+        table = None
+    if not table:
         await message.answer("Пока нет данных")
         return
 
-    total = 0.0
-    count = len(expenses)
-    cats = {}
-
-    for row in expenses:
-        if len(row) < 5:
-            continue
-        try:
-            amt = float(row[3])
-            total += amt
-        except ValueError:
-            continue
-        cat = row[4]
-        cats[cat] = cats.get(cat, 0) + 1
+    count = len(table)
+    positions = [i for i in table.select(min_columns=5) if table.amounts[i] is not None]
+    total = table.total(positions)
+    cats = table.group_count(positions, table.categories)
 
     avg = total / count if count else 0.0
     top = sorted(cats.items(), key=lambda x: x[1], reverse=True)[:5]
@@ -224,7 +229,7 @@ async def show_users(message: Message, is_admin: bool):
         await message.answer("Команда доступна только администраторам")
         return
 
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
 
     admins = []
     active_emps = []
@@ -282,7 +287,9 @@ async def view_process_file_id(
         return
 
     if not is_admin:
-        if not check_photo_ownership(file_id, user_first_name, user_last_name):
+        if not await run_sheets(
+            check_photo_ownership, file_id, message.from_user.id, user_first_name, user_last_name
+        ):
             await message.answer("Вы можете просматривать только свои чеки")
             return
 
@@ -320,7 +327,7 @@ async def set_limit_employee(message: Message, state: FSMContext):
         return
     
     # Проверяем что сотрудник существует
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     if emp_id not in employees:
         await message.answer("Сотрудник с таким ID не найден")
         return
@@ -385,7 +392,7 @@ async def set_limit_period(message: Message, state: FSMContext):
     emp_id = data["employee_id"]
     limit = data["limit_amount"]
     
-    success = set_employee_limit(emp_id, limit, period)
+    success = await run_sheets(set_employee_limit, emp_id, limit, period)
     await state.clear()
     
     if success:
@@ -403,6 +410,100 @@ async def set_limit_period(message: Message, state: FSMContext):
         )
 
 
+# ===== СВЕРКА БАЛАНСОВ =====
+
+
+def _format_drift(drift: list) -> str:
+    """Строки расхождений для сообщения."""
+    return "\n".join(
+        f"{item['name']} ({item['telegram_id']}): "
+        f"{item['balance'] if item['balance'] is not None else '—'} → {item['ledger_balance']:.2f}"
+        + (" — не исправляется: у однофамильцев есть строки без telegram_id" if item['ambiguous'] else "")
+        for item in drift
+    )
+
+
+@router.message(Command("reconcile_balances"))
+@role_required([ROLE_OWNER, ROLE_CHIEF_ACCOUNTANT])
+async def reconcile_balances(message: Message, state: FSMContext, user_role: str = None):
+    """
+    Сверить балансы с операциями.
+    
+    /reconcile_balances — показать расхождения,
+    /reconcile_balances fix — показать план исправления; балансы
+    записываются только после подтверждения кнопкой.
+    """
+    fix = (message.text or "").split()[1:2] == ["fix"]
+    
+    try:
+        if fix:
+            drift = await repair_balance_drift()
+        else:
+            drift = await run_sheets(find_balance_drift)
+    except Exception as e:
+        logger.error(f"❌ Ошибка сверки балансов: {e}")
+        await message.answer("❌ Не удалось сверить балансы")
+        return
+    
+    if not drift:
+        text = "✅ Исправлять нечего" if fix else "✅ Расхождений балансов с операциями нет"
+        await message.answer(text)
+        return
+    
+    if not fix:
+        await message.answer(
+            "⚠️ Расхождения балансов (колонка → по операциям):\n\n"
+            + _format_drift(drift)
+            + "\n\nИсправить: /reconcile_balances fix"
+        )
+        return
+    
+    # План запоминается: записано будет только то, что показано
+    await state.update_data(reconcile_plan=drift)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Записать", callback_data="reconcile_confirm")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="reconcile_cancel")],
+    ])
+    await message.answer(
+        "⚠️ В колонку \"Баланс\" будут записаны балансы по операциям:\n\n"
+        + _format_drift(drift)
+        + "\n\nНачальные остатки и ручные корректировки, внесённые прямо в колонку, "
+        "будут потеряны. Записать?",
+        reply_markup=keyboard,
+    )
+
+
+@router.callback_query(F.data == "reconcile_confirm")
+@role_required([ROLE_OWNER, ROLE_CHIEF_ACCOUNTANT])
+async def reconcile_confirm(callback: CallbackQuery, state: FSMContext, user_role: str = None):
+    """Записать подтверждённый план исправления балансов."""
+    plan = (await state.get_data()).get("reconcile_plan")
+    await state.update_data(reconcile_plan=None)
+    if not plan:
+        await callback.message.edit_text("⚠️ План устарел. Запустите /reconcile_balances fix ещё раз")
+        return
+    
+    try:
+        repaired = await repair_balance_drift(plan)
+    except Exception as e:
+        logger.error(f"❌ Ошибка исправления балансов: {e}")
+        await callback.message.edit_text("❌ Не удалось исправить балансы")
+        return
+    
+    text = "✅ Исправлены балансы:\n\n" + _format_drift(repaired) if repaired else "ℹ️ Балансы не изменены"
+    skipped = len(plan) - len(repaired)
+    if skipped:
+        text += f"\n\n⚠️ Пропущено {skipped}: расхождение изменилось или не записалось, проверьте ещё раз"
+    await callback.message.edit_text(text)
+
+
+@router.callback_query(F.data == "reconcile_cancel")
+async def reconcile_cancel(callback: CallbackQuery, state: FSMContext):
+    """Отменить исправление балансов."""
+    await state.update_data(reconcile_plan=None)
+    await callback.message.edit_text("Исправление балансов отменено")
+
+
 # ===== КНОПКА НАЗАД =====
 
 
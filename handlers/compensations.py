@@ -1,7 +1,9 @@
 """
 Хендлеры для системы компенсаций.
 """
+import asyncio
 import logging  # ДОБАВЛЕНО
+from datetime import datetime
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -21,6 +23,7 @@ from utils.sheets_extended import (
 )
 from utils.states import CompensationStates
 from utils.google_sheets import get_employees_from_sheet
+from utils.sheets_gateway import run_sheets, sheets_async
 
 router = Router()
 logger = logging.getLogger(__name__)  # ДОБАВЛЕНО
@@ -32,17 +35,17 @@ logger = logging.getLogger(__name__)  # ДОБАВЛЕНО
 async def list_compensations(message: Message, state: FSMContext):
     """Показать список компенсаций с фильтрами."""
     user_id = message.from_user.id
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     user_data = employees.get(user_id, {})
     user_role = user_data.get("role", ROLE_EMPLOYEE)
     
     # Фильтр по роли
     if user_role == ROLE_EMPLOYEE:
         # Подотчётник видит только свои
-        expenses = get_employee_expenses(user_id, status_filter="all")
+        expenses = await run_sheets(get_employee_expenses, user_id, status_filter="all")
     else:
         # Главбух и владелец видят все
-        expenses = get_expenses_by_status("all")
+        expenses = await run_sheets(get_expenses_by_status, "all")
     
     if not expenses:
         await message.answer(
@@ -119,11 +122,11 @@ async def process_compensation_type(callback: CallbackQuery, state: FSMContext):
         )
     else:
         # По факту расходов - показываем список расходов
-        employees = get_employees_from_sheet()
+        employees = await run_sheets(get_employees_from_sheet)
         user_data = employees.get(user_id, {})
         
         # Получаем расходы пользователя без компенсации
-        expenses = get_employee_expenses(user_id, status_filter="no_compensation")
+        expenses = await run_sheets(get_employee_expenses, user_id, status_filter="no_compensation")
         
         if not expenses:
             await callback.message.edit_text(
@@ -220,7 +223,8 @@ async def process_payment_method(callback: CallbackQuery, state: FSMContext):
     
     # Обновляем статус в таблице расходов если есть row_idx
     if row_idx:
-        update_compensation_status(
+        await run_sheets(
+            update_compensation_status,
             row_idx=int(row_idx),
             status="ожидает",
             amount=amount,
@@ -253,7 +257,8 @@ async def approve_compensation(callback: CallbackQuery, user_role: str = None):
     """Одобрить компенсацию."""
     row_idx = callback.data.replace("comp_approve_", "")
     
-    success = update_compensation_status(
+    success = await run_sheets(
+        update_compensation_status,
         row_idx=int(row_idx),
         status="одобрено"
     )
@@ -284,7 +289,8 @@ async def reject_compensation_finish(message: Message, state: FSMContext):
     data = await state.get_data()
     row_idx = data.get("reject_row")
     
-    success = update_compensation_status(
+    success = await run_sheets(
+        update_compensation_status,
         row_idx=int(row_idx),
         status="отклонено",
         comment=reason
@@ -308,7 +314,7 @@ async def notify_approvers_about_compensation(employee, amount: float, comp_type
     from config.settings import TELEGRAM_TOKEN
     
     bot = Bot(TELEGRAM_TOKEN)
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     type_text = "по факту расходов" if comp_type == "expense" else "аванс"
     
@@ -349,6 +355,8 @@ async def notify_low_balance(employee_id: int, balance: float, bot=None):
     """
     from aiogram import Bot
     from config.settings import TELEGRAM_TOKEN
+    from services.balance_alerts import get_balance_alert_store
+    from services.broadcast import broadcast
     from utils.google_sheets import get_employees_from_sheet
     
     if bot is None:
@@ -357,21 +365,18 @@ async def notify_low_balance(employee_id: int, balance: float, bot=None):
     else:
         close_bot = False
     
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     emp_data = employees.get(employee_id, {})
     emp_name = f"{emp_data.get('first_name', '')} {emp_data.get('last_name', '')}".strip()
     
     # Уведомление сотруднику
-    try:
-        text = (
-            f"⚠️ <b>Внимание! Отрицательный баланс</b>\n\n"
-            f"Ваш текущий баланс: {balance:.2f}₽\n"
-            f"Автоматически создан запрос на компенсацию.\n\n"
-            f"Ожидайте выплаты от главбуха."
-        )
-        await bot.send_message(chat_id=employee_id, text=text, parse_mode="HTML")
-    except Exception as e:
-        logger.error(f"❌ Не удалось отправить уведомление сотруднику {employee_id}: {e}")
+    text = (
+        f"⚠️ <b>Внимание! Отрицательный баланс</b>\n\n"
+        f"Ваш текущий баланс: {balance:.2f}₽\n"
+        f"Автоматически создан запрос на компенсацию.\n\n"
+        f"Ожидайте выплаты от главбуха."
+    )
+    messages = [(employee_id, text)]
     
     # Уведомление главбуху и владельцу
     text_admin = (
@@ -384,13 +389,19 @@ async def notify_low_balance(employee_id: int, balance: float, bot=None):
     
     for emp_id, emp in employees.items():
         if emp.get("role") in [ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER]:
-            try:
-                await bot.send_message(chat_id=emp_id, text=text_admin, parse_mode="HTML")
-            except Exception as e:
-                logger.error(f"❌ Не удалось отправить уведомление админу {emp_id}: {e}")
+            messages.append((emp_id, text_admin))
     
-    if close_bot:
-        await bot.session.close()
+    try:
+        await broadcast(bot, messages, name=f"Уведомление об отрицательном балансе ({employee_id})")
+    finally:
+        if close_bot:
+            await bot.session.close()
+    
+    # Плановая проверка балансов (check_zero_balances) не повторит это уведомление
+    try:
+        await asyncio.to_thread(get_balance_alert_store().mark_notified, {employee_id: balance})
+    except Exception as e:
+        logger.error(f"❌ Не удалось сохранить состояние уведомления о балансе {employee_id}: {e}")
 
 
 async def notify_employee_about_decision(row_idx: str, decision: str, comment: str = ""):
@@ -409,7 +420,7 @@ async def notify_employee_about_decision(row_idx: str, decision: str, comment: s
     
     try:
         # Получаем расход по row_idx
-        expenses = get_expenses_by_status("all")
+        expenses = await run_sheets(get_expenses_by_status, "all")
         expense = None
         for e in expenses:
             if str(e['row_idx']) == str(row_idx):
@@ -421,7 +432,7 @@ async def notify_employee_about_decision(row_idx: str, decision: str, comment: s
             return
         
         # Находим employee_id по имени
-        employees = get_employees_from_sheet()
+        employees = await run_sheets(get_employees_from_sheet)
         employee_id = None
         for emp_id, emp_data in employees.items():
             full_name = f"{emp_data.get('first_name', '')} {emp_data.get('last_name', '')}".strip()
@@ -476,7 +487,7 @@ async def approve_compensation_command(message: Message, state: FSMContext, user
         )
         return
     
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     # Формируем список
     text_lines = [f"📋 <b>Ожидают компенсации ({len(requests)})</b>\n"]
@@ -519,8 +530,7 @@ async def approve_compensation_request(callback: CallbackQuery, user_role: str =
     """Одобрить запрос на компенсацию из списка."""
     from utils.sheets_extended import (
         get_compensation_requests,
-        update_compensation_status as update_compensation_status_sheet,
-        update_employee_balance
+        apply_balance_operation
     )
     
     req_id = callback.data.replace("comp_approve_req_", "")
@@ -545,12 +555,10 @@ async def approve_compensation_request(callback: CallbackQuery, user_role: str =
     )
     
     if success:
-        # Увеличиваем баланс сотрудника
-        await update_employee_balance(request['employee_id'], request['amount'], "compensation")
-        
-        # Получаем новый баланс
-        from utils.sheets_extended import get_employee_balance
-        new_balance = await get_employee_balance(request['employee_id'])
+        # Увеличиваем баланс сотрудника и получаем новый баланс
+        new_balance = await apply_balance_operation(request['employee_id'], request['amount'], "compensation")
+        if new_balance is None:
+            new_balance = await get_employee_balance(request['employee_id'])
         
         # Уведомляем сотрудника
         await notify_compensation_paid(
@@ -582,8 +590,6 @@ async def reject_compensation_request(callback: CallbackQuery, state: FSMContext
 @router.message(CompensationStates.entering_reject_reason)
 async def finish_reject_compensation(message: Message, state: FSMContext):
     """Завершить отклонение компенсации."""
-    from utils.sheets_extended import update_compensation_status as update_compensation_status_sheet
-    
     reason = message.text.strip()
     data = await state.get_data()
     req_id = data.get("reject_req_id")
@@ -642,7 +648,8 @@ async def notify_compensation_paid(employee_id: int, amount: float, new_balance:
 
 # ============ ОБНОВЛЕНИЕ СТАТУСА В ЛИСТЕ КОМПЕНСАЦИЙ ============
 
-async def update_compensation_status_sheet(
+@sheets_async
+def update_compensation_status_sheet(
     req_id: str,
     status: str,
     paid_date: str = "",
@@ -661,31 +668,30 @@ async def update_compensation_status_sheet(
         bool: Успешно ли обновление
     """
     try:
-        from utils.google_sheets import get_sheets_client
+        from utils.google_sheets import get_worksheet, patch_row
         from utils.sheets_extended import SHEET_COMPENSATIONS
-        from config.settings import SPREADSHEET_ID
+        from utils.sheets_cache import invalidate_sheet_values
         
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_COMPENSATIONS)
+        sheet = get_worksheet(SHEET_COMPENSATIONS)
         
         # Ищем запрос по ID
         rows = sheet.get_all_values()
         for idx, row in enumerate(rows[1:], start=2):
             if row[0] == req_id:
                 # Обновляем статус (колонка E - 5)
-                sheet.update_cell(idx, 5, status)
+                values = {5: status}
                 
                 # Обновляем дату выплаты (колонка G - 7)
                 if paid_date:
-                    sheet.update_cell(idx, 7, paid_date)
+                    values[7] = paid_date
                 
                 # Обновляем комментарий (колонка H - 8)
                 if comment:
-                    current_comment = sheet.cell(idx, 8).value or ""
-                    new_comment = f"{current_comment}; {comment}".strip("; ")
-                    sheet.update_cell(idx, 8, new_comment)
+                    current_comment = row[7] if len(row) > 7 else ""
+                    values[8] = f"{current_comment}; {comment}".strip("; ")
                 
+                patch_row(sheet, idx, values)
+                invalidate_sheet_values(SHEET_COMPENSATIONS)
                 logger.info(f"✅ Статус компенсации {req_id} обновлен на '{status}'")
                 return True
         
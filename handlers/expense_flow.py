@@ -19,16 +19,16 @@ from utils.google_sheets import append_expense_row
 from utils.sheets_extended import (
     get_active_projects, 
     check_limit_status, 
-    append_expense_row_extended,
     get_employees_from_sheet,
     # ДОБАВЛЕНО: функции баланса
-    process_expense_with_balance,
+    record_expense,
     get_employee_balance,
     # ДОБАВЛЕНО: уведомления о лимитах
     notify_limit_warning,
     notify_limit_exceeded,
 )
 from handlers.compensations import notify_low_balance  # ДОБАВЛЕНО: уведомление при низком балансе
+from utils.sheets_gateway import run_sheets
 from utils.states import ExpenseStates
 from utils.decorators import ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER
 
@@ -60,12 +60,12 @@ async def process_amount(message: Message, state: FSMContext):
 
     # 🔥 ПРОВЕРКА ЛИМИТА перед продолжением
     user_id = message.from_user.id
-    limit_exceeded, percentage, status = check_limit_status(user_id, amount)
+    limit_exceeded, percentage, status = await run_sheets(check_limit_status, user_id, amount)
     
     # ДОБАВЛЕНО: Получаем текущие значения лимита для уведомлений
     from utils.sheets_extended import get_employee_limit, get_expenses_for_period
-    limit, period = get_employee_limit(user_id)
-    current_expenses = get_expenses_for_period(user_id, period)
+    limit, period = await run_sheets(get_employee_limit, user_id)
+    current_expenses = await run_sheets(get_expenses_for_period, user_id, period)
     total_with_new = current_expenses + amount
     
     if status == "limit_exceeded":
@@ -92,6 +92,8 @@ async def process_amount(message: Message, state: FSMContext):
     now = datetime.now()
     await state.update_data(
         amount=str(amount),
+        limit_status=status,
+        limit_percentage=percentage,
         date=now.strftime("%d.%m.%Y"),
         time=now.strftime("%H:%M:%S"),
     )
@@ -131,7 +133,7 @@ async def process_category(message: Message, state: FSMContext):
 
 async def show_project_selection(message: Message, state: FSMContext):
     """Показать список активных проектов для выбора."""
-    projects = get_active_projects()
+    projects = await run_sheets(get_active_projects)
     
     # ДОБАВЛЕНО: Проверка наличия активных проектов
     if not projects:
@@ -168,7 +170,7 @@ async def show_project_selection(message: Message, state: FSMContext):
 async def process_project_selection(message: Message, state: FSMContext):
     """Обработка выбора проекта."""
     project_name = message.text.replace("📁 ", "").strip()
-    projects = get_active_projects()
+    projects = await run_sheets(get_active_projects)
     
     project_id = ""
     for proj in projects:
@@ -289,16 +291,21 @@ async def save_expense(message: Message, state: FSMContext, is_admin: bool):
     await message.answer("Сохраняю данные...", reply_markup=ReplyKeyboardRemove())
     
     # 🔥 ДОБАВЛЕНО: Обрабатываем расход с учётом баланса
-    result = await process_expense_with_balance(
+    # (фиксируется в локальном журнале, в Sheets переносится в фоне)
+    result = await record_expense(
         user_id=user_id,
         amount=amount,
         expense_data=row,
-        project_id=data.get('project_id', '')
+        project_id=data.get('project_id', ''),
+        limit_status=data.get('limit_status', 'ok'),
+        limit_percentage=data.get('limit_percentage', 0.0)
     )
 
     if result['success']:
         # Формируем сообщение о результате
-        balance_text = f"\n💳 Текущий баланс: {result['new_balance']:.2f}₽"
+        balance_text = ""
+        if result['new_balance'] is not None:
+            balance_text = f"\n💳 Текущий баланс: {result['new_balance']:.2f}₽"
         
         await message.answer(
             f"✅ Данные сохранены!\n\n"
@@ -347,9 +354,10 @@ async def notify_approvers(message: Message, data: dict):
     """Уведомить главбуха и владельца о необходимости согласования."""
     from aiogram import Bot
     from config.settings import TELEGRAM_TOKEN
+    from services.broadcast import broadcast_text
     
     bot = Bot(TELEGRAM_TOKEN)
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     text = (
         f"🚨 <b>Требуется согласование расхода</b>\n\n"
@@ -360,27 +368,25 @@ async def notify_approvers(message: Message, data: dict):
         f"Причина: превышен лимит"
     )
     
-    for emp_id, emp_data in employees.items():
-        if emp_data.get('role') in [ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER]:
-            try:
-                await bot.send_message(
-                    chat_id=emp_id,
-                    text=text,
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                print(f"Не удалось отправить уведомление {emp_id}: {e}")
+    approvers = [
+        emp_id for emp_id, emp_data in employees.items()
+        if emp_data.get('role') in [ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER]
+    ]
     
-    await bot.session.close()
+    try:
+        await broadcast_text(bot, approvers, text, name="Запрос согласования расхода")
+    finally:
+        await bot.session.close()
 
 
 async def notify_controllers(message: Message, data: dict, percentage: float):
     """Уведомить контролёров о превышении 80% лимита."""
     from aiogram import Bot
     from config.settings import TELEGRAM_TOKEN
+    from services.broadcast import broadcast_text
     
     bot = Bot(TELEGRAM_TOKEN)
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     text = (
         f"⚡ <b>Уведомление о лимите</b>\n\n"
@@ -389,15 +395,12 @@ async def notify_controllers(message: Message, data: dict, percentage: float):
         f"Последний расход: {data['amount']} руб"
     )
     
-    for emp_id, emp_data in employees.items():
-        if emp_data.get('role') == "контролер":
-            try:
-                await bot.send_message(
-                    chat_id=emp_id,
-                    text=text,
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                print(f"Не удалось отправить уведомление {emp_id}: {e}")
+    controllers = [
+        emp_id for emp_id, emp_data in employees.items()
+        if emp_data.get('role') == "контролер"
+    ]
     
-    await bot.session.close()
+    try:
+        await broadcast_text(bot, controllers, text, name="Уведомление контролёров о лимите")
+    finally:
+        await bot.session.close()
@@ -14,6 +14,7 @@ from utils.sheets_extended import (
     get_active_projects, get_all_projects, add_project, update_project_status
 )
 from utils.states import ProjectStates
+from utils.sheets_gateway import run_sheets
 
 router = Router()
 
@@ -24,7 +25,7 @@ router = Router()
 @router.message(F.text == "📁 Проекты")
 async def show_projects(message: Message, state: FSMContext):
     """Показать список проектов."""
-    projects = get_all_projects()
+    projects = await run_sheets(get_all_projects)
     
     if not projects:
         await message.answer(
@@ -136,7 +137,8 @@ async def add_project_dates(message: Message, state: FSMContext):
     project_budget = data.get("project_budget", "")
     
     # Сохраняем проект
-    success = add_project(
+    success = await run_sheets(
+        add_project,
         name=project_name,
         status="активный",
         budget=project_budget,
@@ -166,7 +168,7 @@ async def add_project_dates(message: Message, state: FSMContext):
 @router.callback_query(F.data == "change_project_status")
 async def change_status_callback(callback: CallbackQuery, state: FSMContext):
     """Показать список проектов для изменения статуса."""
-    projects = get_all_projects()
+    projects = await run_sheets(get_all_projects)
     
     if not projects:
         await callback.message.edit_text("Нет доступных проектов")
@@ -217,7 +219,7 @@ async def apply_status(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     project_id = data.get("project_id")
     
-    success = update_project_status(project_id, new_status)
+    success = await run_sheets(update_project_status, project_id, new_status)
     
     if success:
         await callback.message.edit_text(
@@ -258,7 +260,7 @@ async def add_project_callback(callback: CallbackQuery, state: FSMContext):
 @role_required([ROLE_OWNER, ROLE_CHIEF_ACCOUNTANT])
 async def toggle_project_command(message: Message, state: FSMContext):
     """Command to toggle project status (active/inactive)."""
-    projects = get_all_projects()
+    projects = await run_sheets(get_all_projects)
     
     if not projects:
         await message.answer(
@@ -298,7 +300,7 @@ async def process_toggle_project(callback: CallbackQuery):
     project_id = callback.data.replace("toggle_proj_", "")
     
     # Получаем текущий проект
-    projects = get_all_projects()
+    projects = await run_sheets(get_all_projects)
     project = None
     for p in projects:
         if p['id'] == project_id:
@@ -314,7 +316,7 @@ async def process_toggle_project(callback: CallbackQuery):
     new_status = "завершенный" if current_status == "активный" else "активный"
     
     # Обновляем статус
-    success = update_project_status(project_id, new_status)
+    success = await run_sheets(update_project_status, project_id, new_status)
     
     if success:
         status_emoji = "🔴" if new_status == "завершенный" else "🟢"
@@ -19,9 +19,11 @@ from utils.sheets_extended import (
     get_negative_balances,
     get_all_employee_balances,
     get_all_projects,
+    get_project_index,
 )
 from utils.reports_excel import generate_expense_report, cleanup_temp_file
 from utils.states import ReportStates
+from utils.sheets_gateway import run_sheets
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -178,7 +180,7 @@ async def report_menu(message: Message, user_role: str = None):
 @router.callback_query(F.data == "report_type_employees")
 async def report_by_employees(callback):
     """Отчёт по подотчётникам."""
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     for emp_id, emp_data in employees.items():
@@ -204,7 +206,7 @@ async def report_by_employees(callback):
 async def report_employee_detail(callback):
     """Детальный отчёт по сотруднику."""
     emp_id = int(callback.data.replace("report_emp_", ""))
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     emp_data = employees.get(emp_id, {})
     emp_name = f"{emp_data.get('first_name', '')} {emp_data.get('last_name', '')}".strip()
     
@@ -243,7 +245,7 @@ async def report_employee_detail(callback):
 @router.callback_query(F.data == "report_type_projects")
 async def report_by_projects(callback):
     """Отчёт по проектам."""
-    projects = get_all_projects()
+    projects = await run_sheets(get_all_projects)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     for proj in projects:
@@ -267,13 +269,8 @@ async def report_by_projects(callback):
 async def report_project_detail(callback):
     """Детальный отчёт по проекту."""
     project_id = callback.data.replace("report_proj_", "")
-    projects = get_all_projects()
-    
-    project_name = ""
-    for p in projects:
-        if p['id'] == project_id:
-            project_name = p['name']
-            break
+    project_index = await run_sheets(get_project_index)
+    project_name = project_index.get(project_id, "")
     
     await callback.message.edit_text(f"⏳ Формирую отчёт по проекту '{project_name}'...")
     
@@ -321,7 +318,7 @@ async def report_debts(callback):
     
     total_pending = sum(r['amount'] for r in requests)
     
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     
     text_lines = [f"💸 <b>Ожидают компенсации ({len(requests)})</b>\n"]
     
@@ -398,7 +395,7 @@ async def report_back(callback):
 async def balance_summary(message: Message):
     """Сводка по балансам."""
     user_id = message.from_user.id
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     user_data = employees.get(user_id, {})
     user_role = user_data.get("role", ROLE_EMPLOYEE)
     
@@ -471,7 +468,7 @@ async def balance_summary_management(message: Message):
 async def manage_subscriptions(message: Message):
     """Manage report subscriptions."""
     user_id = message.from_user.id
-    employees = get_employees_from_sheet()
+    employees = await run_sheets(get_employees_from_sheet)
     user_data = employees.get(user_id, {})
     user_role = user_data.get("role", ROLE_EMPLOYEE)
     
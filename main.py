@@ -4,13 +4,19 @@ import logging
 
 from aiogram import Bot, Dispatcher
 
-from config.settings import TELEGRAM_TOKEN
+from config.settings import TELEGRAM_TOKEN, STORAGE_BACKEND
 from handlers import start, expense_flow, admin, projects, compensations, reports  # ДОБАВЛЕНО: reports
 from middlewares.auth import AuthMiddleware
 from middlewares.fsm_timeout import FSMTimeoutMiddleware
 from utils.google_sheets import get_employees_from_sheet
-from utils.sheets_extended import ensure_sheets_exist
+from utils.sheets_extended import ensure_sheets_exist, backfill_expense_telegram_ids
+from utils.sheets_gateway import run_sheets, shutdown_sheets_gateway
+from utils.sheets_write_queue import flush_write_queue
+from utils.balance_service import flush_balance_writes
+from utils.spend_totals import warm_spend_totals
 from services.scheduler import ReportScheduler  # ДОБАВЛЕНО: планировщик
+from services.journal_replayer import JournalReplayer
+from services.sheets_mirror import SheetsMirror
 
 
 async def main():
@@ -26,7 +32,7 @@ async def main():
     # 🔥 СОЗДАНИЕ ЛИСТОВ ПРИ СТАРТЕ
     logger.info("🔄 Проверка и создание листов Google Sheets...")
     try:
-        ensure_sheets_exist()
+        await run_sheets(ensure_sheets_exist)
         logger.info("✅ Листы проверены/созданы")
     except Exception as e:
         logger.error(f"❌ Ошибка создания листов: {e}")
@@ -34,7 +40,7 @@ async def main():
     # 🔥 ЗАГРУЗКА WHITELIST ПРИ СТАРТЕ
     logger.info("🔄 Загрузка whitelist из Google Sheets при старте...")
     try:
-        whitelist = get_employees_from_sheet()
+        whitelist = await run_sheets(get_employees_from_sheet)
         if whitelist:
             logger.info(f"✅ Whitelist загружен успешно: {len(whitelist)} пользователей")
             logger.info(f"📋 ID в whitelist: {list(whitelist.keys())}")
@@ -45,6 +51,15 @@ async def main():
         logger.error(f"❌ Ошибка загрузки whitelist при старте: {e}")
         logger.warning("⚠️ Бот запустится, но могут быть проблемы с доступом.")
 
+    # telegram_id у старых строк "Расходы" (один раз; дальше пишется при сохранении)
+    await run_sheets(backfill_expense_telegram_ids)
+
+    # Итоги расходов за день/неделю/месяц для проверки лимитов
+    try:
+        await run_sheets(warm_spend_totals)
+    except Exception as e:
+        logger.warning(f"⚠️ Итоги расходов будут посчитаны при первом обращении: {e}")
+
     # Инициализация бота
     bot = Bot(TELEGRAM_TOKEN)
     dp = Dispatcher()
@@ -67,6 +82,15 @@ async def main():
     scheduler.start()
     logger.info("✅ Планировщик запущен")
 
+    # Перенос сохранённых локально расходов в Google Sheets
+    replayer = JournalReplayer(bot)
+    replayer.start()
+
+    # В режиме локального хранилища Google Sheets — зеркало для бухгалтерии
+    mirror = SheetsMirror() if STORAGE_BACKEND == "sqlite" else None
+    if mirror:
+        mirror.start()
+
     logger.info("✅ Бот запущен и готов к работе")
 
     # Запуск polling
@@ -75,6 +99,12 @@ async def main():
     finally:
         # Останавливаем планировщик при завершении
         scheduler.stop()
+        await replayer.stop()
+        await flush_write_queue()
+        await flush_balance_writes()
+        if mirror:
+            await mirror.stop()
+        shutdown_sheets_gateway()
         logger.info("🛑 Бот остановлен")
 
 
@@ -5,6 +5,7 @@ import logging
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 from utils.google_sheets import get_employees_from_sheet
+from utils.sheets_gateway import run_sheets
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +20,13 @@ class AuthMiddleware(BaseMiddleware):
     _cache_duration = timedelta(minutes=5)
 
     @classmethod
-    def _get_cached_employees(cls):
+    async def _get_cached_employees(cls):
         """Получить whitelist с автообновлением кэша каждые 5 минут."""
         now = datetime.now()
         
         if cls._cache_time is None or (now - cls._cache_time) > cls._cache_duration:
             logger.info("🔄 Обновление whitelist (кэш истёк или первый запуск)...")
-            cls._cache = get_employees_from_sheet()
+            cls._cache = await run_sheets(get_employees_from_sheet)
             cls._cache_time = now
             logger.info(f"✅ Whitelist обновлён: {len(cls._cache)} пользователей")
         else:
@@ -51,7 +52,7 @@ class AuthMiddleware(BaseMiddleware):
         # Команда /start доступна всем (для первого контакта с ботом)
         if event.text and event.text.startswith("/start"):
             logger.info(f"ℹ️ Команда /start от {user_id} ({username})")
-            employees = self._get_cached_employees()
+            employees = await self._get_cached_employees()
             
             if user_id not in employees:
                 # Пользователь не в whitelist - пропускаем в handler с минимальными данными
@@ -87,7 +88,7 @@ class AuthMiddleware(BaseMiddleware):
                 return await handler(event, data)
         
         # Для всех остальных команд проверяем whitelist
-        employees = self._get_cached_employees()
+        employees = await self._get_cached_employees()
         
         if user_id not in employees:
             logger.warning(f"❌ Доступ запрещён: {user_id} ({username}) - не в whitelist")
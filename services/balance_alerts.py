@@ -0,0 +1,119 @@
+"""
+Состояние уведомлений о нулевом/отрицательном балансе (SQLite).
+
+Раньше check_zero_balances каждые два часа отправлял одно и то же
+уведомление всем, у кого баланс ≤ 0, пока баланс не восстановится.
+Теперь для каждого сотрудника хранится, что он уже уведомлён:
+сообщение уходит только при переходе баланса в зону ≤ 0 и, если
+включено (BALANCE_ALERT_REMINDER_HOURS), как напоминание не чаще
+указанного интервала. При восстановлении баланса состояние сбрасывается.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import BALANCE_ALERT_REMINDER_HOURS, SCHEDULER_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+
+def needs_alert(balance: float) -> bool:
+    """Баланс, о котором нужно предупредить сотрудника."""
+    return balance <= 0
+
+
+class BalanceAlertStore:
+    """Кто из сотрудников уже уведомлён. Методы блокирующие и потокобезопасные."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS balance_alerts (
+                telegram_id INTEGER PRIMARY KEY,
+                balance REAL NOT NULL,
+                since TEXT NOT NULL,
+                notified_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def notified(self) -> Dict[int, datetime]:
+        """Уведомлённые сотрудники и время последнего уведомления."""
+        with self._lock:
+            rows = self._conn.execute("SELECT telegram_id, notified_at FROM balance_alerts").fetchall()
+        return {row[0]: datetime.strptime(row[1], _TIME_FORMAT) for row in rows}
+
+    def mark_notified(self, balances: Dict[int, float], when: Optional[datetime] = None):
+        """Запомнить, что сотрудники уведомлены (since сохраняется с первого уведомления)."""
+        if not balances:
+            return
+        moment = (when or datetime.now()).strftime(_TIME_FORMAT)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO balance_alerts (telegram_id, balance, since, notified_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(telegram_id) DO UPDATE SET balance = excluded.balance, notified_at = excluded.notified_at",
+                [(telegram_id, balance, moment, moment) for telegram_id, balance in balances.items()],
+            )
+            self._conn.commit()
+
+    def clear(self, telegram_ids: Iterable[int]):
+        """Сбросить состояние сотрудников, у которых баланс восстановился."""
+        ids = [(telegram_id,) for telegram_id in telegram_ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM balance_alerts WHERE telegram_id = ?", ids)
+            self._conn.commit()
+
+
+def plan_balance_alerts(
+    balances: Dict[int, float],
+    notified: Dict[int, datetime],
+    now: datetime,
+    reminder_hours: int = BALANCE_ALERT_REMINDER_HOURS,
+) -> Tuple[List[int], List[int]]:
+    """
+    Кого уведомить и чьё состояние сбросить.
+
+    Args:
+        balances: {telegram_id: баланс} проверяемых сотрудников
+        notified: Состояние из BalanceAlertStore.notified()
+        reminder_hours: Интервал напоминаний (0 — только при переходе)
+
+    Returns:
+        ([кого уведомить], [у кого баланс восстановился])
+    """
+    remind_after = timedelta(hours=reminder_hours) if reminder_hours > 0 else None
+    to_notify = []
+    recovered = []
+    for telegram_id, balance in balances.items():
+        last = notified.get(telegram_id)
+        if not needs_alert(balance):
+            if last is not None:
+                recovered.append(telegram_id)
+        elif last is None or (remind_after is not None and now - last >= remind_after):
+            to_notify.append(telegram_id)
+    return to_notify, recovered
+
+
+_store: Optional[BalanceAlertStore] = None
+_store_lock = threading.Lock()
+
+
+def get_balance_alert_store() -> BalanceAlertStore:
+    """Получить общее хранилище состояния (база открывается при первом обращении)."""
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = BalanceAlertStore(SCHEDULER_DB_PATH)
+        return _store
@@ -0,0 +1,188 @@
+"""
+Рассылка сообщений в Telegram с учётом ограничений Bot API.
+
+Раньше отчёты и уведомления отправлялись по одному через
+bot.send_message: большой список получателей рассылался минутами,
+а ответ 429 (RetryAfter) записывался в лог как ошибка, и получатель
+отчёт не получал. Здесь сообщения отправляются параллельно (не больше
+BROADCAST_CONCURRENCY сразу), но не чаще BROADCAST_PER_SECOND в секунду
+на бота и BROADCAST_CHAT_INTERVAL в один чат. После RetryAfter пауза
+соблюдается всеми отправками, сетевые сбои и 5xx повторяются,
+а результат рассылки — число доставленных и недоставленных сообщений.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from config.settings import (
+    BROADCAST_CONCURRENCY,
+    BROADCAST_PER_SECOND,
+    BROADCAST_CHAT_INTERVAL,
+    BROADCAST_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед первым повтором и максимальная пауза (секунды)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class BroadcastResult:
+    """Итог рассылки: сколько доставлено и почему не доставлены остальные."""
+
+    def __init__(self):
+        self.delivered = 0
+        self.failed: List[Tuple[int, str]] = []  # (chat_id, последняя ошибка)
+
+    @property
+    def total(self) -> int:
+        return self.delivered + len(self.failed)
+
+    def __str__(self) -> str:
+        return f"доставлено {self.delivered} из {self.total}"
+
+
+class SendRateLimiter:
+    """
+    Расписание отправок: общий темп бота, пауза между сообщениями в чат
+    и общая пауза после RetryAfter.
+
+    Работает в event loop бота; общий для всех рассылок процесса.
+    """
+
+    def __init__(self, per_second: float, chat_interval: float):
+        self._interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._chat_interval = chat_interval
+        self._next = 0.0
+        self._paused_until = 0.0
+        self._chat_next: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        """Дождаться очереди отправки сообщения в чат."""
+        while True:
+            # Пока чат или весь бот на паузе, общий темп не занимаем
+            now = time.monotonic()
+            ready = max(self._paused_until, self._chat_next.get(chat_id, 0.0))
+            if ready > now:
+                await asyncio.sleep(ready - now)
+                continue
+
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+            self._chat_next[chat_id] = slot + self._chat_interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            # За время ожидания Telegram мог попросить паузу
+            if time.monotonic() >= self._paused_until:
+                return
+
+    def pause(self, seconds: float):
+        """Приостановить все отправки (после RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def forget_idle_chats(self):
+        """Удалить чаты, для которых пауза уже истекла."""
+        now = time.monotonic()
+        self._chat_next = {chat: at for chat, at in self._chat_next.items() if at > now}
+
+
+_limiter = SendRateLimiter(BROADCAST_PER_SECOND, BROADCAST_CHAT_INTERVAL)
+
+
+async def send_with_retries(bot: Bot, chat_id: int, text: str, parse_mode: Optional[str] = "HTML") -> Optional[str]:
+    """
+    Отправить одно сообщение с учётом ограничений и повторами.
+
+    Returns:
+        None при успехе или текст последней ошибки
+    """
+    error: Optional[Exception] = None
+    for attempt in range(BROADCAST_MAX_RETRIES + 1):
+        await _limiter.wait(chat_id)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return None
+        except TelegramRetryAfter as e:
+            error = e
+            logger.warning(f"⏳ Telegram просит паузу {e.retry_after} с (чат {chat_id})")
+            _limiter.pause(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            error = e
+            if attempt < BROADCAST_MAX_RETRIES:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        except TelegramAPIError as e:
+            # Бот заблокирован, чат не найден, ошибка разметки — повтор не поможет
+            return str(e)
+        except Exception as e:
+            return str(e)
+    return str(error)
+
+
+async def broadcast(
+    bot: Bot,
+    messages: Iterable[Tuple[int, str]],
+    parse_mode: Optional[str] = "HTML",
+    name: str = "рассылка",
+) -> BroadcastResult:
+    """
+    Разослать сообщения.
+
+    Сообщения в один чат отправляются по порядку, в разные чаты — параллельно.
+
+    Args:
+        bot: Бот, от имени которого отправлять
+        messages: [(chat_id, текст), ...]
+        parse_mode: Разметка сообщений
+        name: Название рассылки для логов
+
+    Returns:
+        BroadcastResult
+    """
+    by_chat: Dict[int, List[str]] = {}
+    for chat_id, text in messages:
+        by_chat.setdefault(chat_id, []).append(text)
+
+    result = BroadcastResult()
+    if not by_chat:
+        return result
+
+    semaphore = asyncio.Semaphore(max(1, BROADCAST_CONCURRENCY))
+
+    async def deliver(chat_id: int, texts: List[str]):
+        async with semaphore:
+            for text in texts:
+                error = await send_with_retries(bot, chat_id, text, parse_mode)
+                if error is None:
+                    result.delivered += 1
+                else:
+                    result.failed.append((chat_id, error))
+                    logger.error(f"❌ {name}: не удалось отправить сообщение {chat_id}: {error}")
+
+    await asyncio.gather(*(deliver(chat_id, texts) for chat_id, texts in by_chat.items()))
+    _limiter.forget_idle_chats()
+
+    logger.info(f"✅ {name}: {result}")
+    return result
+
+
+async def broadcast_text(
+    bot: Bot,
+    chat_ids: Iterable[int],
+    text: str,
+    parse_mode: Optional[str] = "HTML",
+    name: str = "рассылка",
+) -> BroadcastResult:
+    """Разослать один текст нескольким получателям (см. broadcast)."""
+    return await broadcast(bot, ((chat_id, text) for chat_id in chat_ids), parse_mode, name)
@@ -0,0 +1,97 @@
+"""
+История запусков задач планировщика отчётов (SQLite).
+
+Хранится в той же базе, что и задачи APScheduler (SCHEDULER_DB_PATH):
+по каждой задаче видно, когда она должна была выполниться, когда
+выполнилась и чем закончилась, а также какие окна были пропущены.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+STATUS_MISSED = "missed"
+STATUS_CATCH_UP = "catch_up"
+
+_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+
+def _format(moment: Optional[datetime]) -> str:
+    return moment.strftime(_TIME_FORMAT) if moment else ""
+
+
+class JobHistory:
+    """Журнал запусков. Методы блокирующие и потокобезопасные."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                scheduled_at TEXT NOT NULL,
+                started_at TEXT NOT NULL DEFAULT '',
+                finished_at TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                note TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS job_runs_job ON job_runs (job_id, scheduled_at)")
+        self._conn.commit()
+
+    def _insert(
+        self,
+        job_id: str,
+        scheduled_at: datetime,
+        status: str,
+        started: bool = False,
+        error: str = "",
+        note: str = "",
+    ):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_runs (job_id, scheduled_at, started_at, status, error, note) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, _format(scheduled_at), _format(datetime.now()) if started else "", status, error, note),
+            )
+            self._conn.commit()
+
+    def started(self, job_id: str, scheduled_at: datetime):
+        """Задача передана на выполнение."""
+        self._insert(job_id, scheduled_at, STATUS_RUNNING, started=True)
+
+    def finished(self, job_id: str, scheduled_at: datetime, error: str = ""):
+        """Задача завершилась (успешно, если error пустой)."""
+        self._finish(job_id, scheduled_at, STATUS_ERROR if error else STATUS_DONE, error)
+
+    def missed(self, job_id: str, scheduled_at: datetime):
+        """Окно пропущено: бот был остановлен дольше SCHEDULER_MISFIRE_GRACE_TIME."""
+        self._finish(job_id, scheduled_at, STATUS_MISSED)
+
+    def _finish(self, job_id: str, scheduled_at: datetime, status: str, error: str = ""):
+        # Обновляем запись о передаче на выполнение, а если её нет — добавляем новую
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job_runs SET finished_at = ?, status = ?, error = ? WHERE id = ("
+                "SELECT MAX(id) FROM job_runs WHERE job_id = ? AND scheduled_at = ? AND status = ?)",
+                (_format(datetime.now()), status, error, job_id, _format(scheduled_at), STATUS_RUNNING),
+            )
+            self._conn.commit()
+        if not cursor.rowcount:
+            self._insert(job_id, scheduled_at, status, error=error)
+
+    def catch_up(self, job_id: str, scheduled_at: datetime, run_at: datetime):
+        """Пропущенное окно будет выполнено после перезапуска."""
+        self._insert(job_id, scheduled_at, STATUS_CATCH_UP, note=f"запуск в {_format(run_at)}")
@@ -0,0 +1,309 @@
+"""
+Фоновый перенос локального журнала изменений в Google Sheets.
+
+Записи применяются строго по порядку. Каждая запись состоит из шагов
+(баланс, строка расхода или аванса, запрос на компенсацию); прогресс шагов
+сохраняется в журнале, поэтому после сбоя повтор не списывает баланс
+и не добавляет строку второй раз.
+
+Временные сбои (сеть, квота, 5xx) повторяются с паузой. Запись, которую
+повтор не исправит (4xx, неразбираемые данные, нет листа), или не
+прошедшая за JOURNAL_MAX_ATTEMPTS попыток, снимается с очереди, чтобы не
+задерживать следующие, а администраторы получают уведомление.
+"""
+import asyncio
+import html
+import logging
+
+import gspread
+
+from config.settings import JOURNAL_MAX_ATTEMPTS, JOURNAL_RETRY_MAX_DELAY
+from utils.decorators import ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER
+from utils.google_sheets import get_employees_from_sheet, get_worksheet
+from utils.sheets_extended import (
+    SHEET_EXPENSES,
+    SHEET_COMPENSATIONS,
+    JOURNAL_ADVANCE,
+    JOURNAL_EXPENSE,
+    build_compensation_row,
+)
+from utils.balance_service import EmployeeNotFound, change_balance
+from utils.expense_store import get_expense_table, mark_expenses_stale
+from utils.sheets_gateway import run_sheets
+from utils.sheets_limiter import is_permanent_error
+from utils.sheets_write_queue import enqueue_append
+from utils.write_journal import JournalEntry, get_journal, wait_for_entries
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять журнал, если новых записей нет (секунды)
+IDLE_CHECK_INTERVAL = 60
+
+
+class JournalRejected(Exception):
+    """Запись невозможно применить — повторять бессмысленно."""
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Ошибка, которую повтор записи не исправит."""
+    if isinstance(error, (ValueError, TypeError, KeyError, gspread.WorksheetNotFound)):
+        return True
+    return is_permanent_error(error)
+
+
+# ============ БЛОКИРУЮЩИЕ ШАГИ ============
+
+def _expense_row_exists(telegram_id: int, timestamp: str, amount: float) -> bool:
+    """
+    Есть ли уже в "Расходы" строка этого сотрудника с тем же временем и суммой.
+
+    Сравнивается telegram_id (колонка K), а не имя: у двух сотрудников
+    расходы в одну секунду — обычное дело в часы пик.
+    """
+    mark_expenses_stale()
+    table = get_expense_table()
+    telegram_id = str(telegram_id)
+    for i in range(len(table) - 1, -1, -1):
+        if (
+            table.telegram_ids[i] == telegram_id
+            and table.rows[i][2] == timestamp
+            and table.amounts[i] is not None
+            and abs(table.amounts[i] - amount) < 0.005
+        ):
+            return True
+    return False
+
+
+def _compensation_request_exists(employee_id: int, created_at: str) -> bool:
+    """Есть ли уже запрос на компенсацию сотрудника с этой датой создания."""
+    rows = get_worksheet(SHEET_COMPENSATIONS).get_all_values()[1:]
+    return any(
+        len(row) > 5 and row[1] == str(employee_id) and row[5] == created_at
+        for row in rows
+    )
+
+
+# ============ ПРИМЕНЕНИЕ ЗАПИСЕЙ ============
+
+async def _save_state(entry: JournalEntry):
+    await asyncio.to_thread(get_journal().save_state, entry)
+
+
+async def _apply_balance_delta(entry: JournalEntry, delta: float) -> float:
+    """
+    Изменить баланс сотрудника на delta.
+
+    Перед записью ожидаемый результат сохраняется в журнал: если при повторе
+    баланс уже равен ему, значит прошлая попытка дошла до Sheets.
+
+    Returns:
+        float: Новый баланс
+    """
+    async def remember(new_balance: float):
+        entry.state['balance_after'] = new_balance
+        await _save_state(entry)
+
+    try:
+        return await change_balance(
+            entry.payload['user_id'],
+            delta,
+            expected_after=entry.state.get('balance_after'),
+            before_write=remember,
+        )
+    except EmployeeNotFound as e:
+        raise JournalRejected(str(e))
+
+
+async def _append_expense_row_once(entry: JournalEntry, row: list):
+    """Добавить строку операции в "Расходы", если прошлая попытка её не записала."""
+    state = entry.state
+    if state.get('expense_row_done'):
+        return
+
+    exists = state.get('expense_row_sent') and await run_sheets(
+        _expense_row_exists, entry.payload['user_id'], row[2], entry.payload['amount']
+    )
+    if not exists:
+        state['expense_row_sent'] = True
+        await _save_state(entry)
+        await enqueue_append(SHEET_EXPENSES, row)
+    state['expense_row_done'] = True
+    await _save_state(entry)
+
+
+async def _apply_expense(entry: JournalEntry):
+    """Перенести сохранённый расход: баланс, строку расхода, запрос на компенсацию."""
+    payload = entry.payload
+    state = entry.state
+    user_id = payload['user_id']
+    amount = payload['amount']
+
+    # 1. Списываем с баланса
+    if 'new_balance' not in state:
+        state['new_balance'] = await _apply_balance_delta(entry, -amount)
+        await _save_state(entry)
+    new_balance = state['new_balance']
+
+    # 2. Сохраняем расход
+    await _append_expense_row_once(entry, payload['row'] + [
+        payload['project_id'],
+        "ожидает" if new_balance <= 0 else "не_требуется",
+        "расход",
+        str(user_id),
+    ])
+
+    # 3. Если баланс <= 0, создаём запрос на компенсацию
+    if new_balance <= 0 and not state.get('compensation_done'):
+        exists = state.get('compensation_sent') and await run_sheets(
+            _compensation_request_exists, user_id, entry.created_at
+        )
+        if not exists:
+            state['compensation_sent'] = True
+            await _save_state(entry)
+            await enqueue_append(SHEET_COMPENSATIONS, build_compensation_row(
+                user_id,
+                abs(new_balance),
+                "автоматический",
+                f"Автоматический запрос при отрицательном балансе после расхода {amount}",
+                entry.created_at,
+            ))
+        state['compensation_done'] = True
+        await _save_state(entry)
+
+
+async def _apply_advance(entry: JournalEntry):
+    """Перенести аванс: пополнение баланса и строку "аванс" в "Расходы"."""
+    if 'new_balance' not in entry.state:
+        entry.state['new_balance'] = await _apply_balance_delta(entry, entry.payload['amount'])
+        await _save_state(entry)
+
+    await _append_expense_row_once(entry, entry.payload['row'])
+
+
+_APPLIERS = {
+    JOURNAL_EXPENSE: _apply_expense,
+    JOURNAL_ADVANCE: _apply_advance,
+}
+
+
+class JournalReplayer:
+    """Переносит записи журнала в Google Sheets по порядку, с повторами."""
+
+    def __init__(self, bot=None):
+        """
+        Args:
+            bot: Бот для уведомления администраторов о снятых с очереди записях
+        """
+        self._bot = bot
+        self._task = None
+
+    def start(self):
+        """Запустить фоновую задачу (внутри event loop)."""
+        self._task = asyncio.create_task(self._run())
+        logger.info("🚀 Перенос журнала изменений в Google Sheets запущен")
+
+    async def stop(self):
+        """Остановить фоновую задачу; неперенесённые записи останутся в журнале."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("🛑 Перенос журнала изменений остановлен")
+
+    async def _run(self):
+        journal = get_journal()
+        while True:
+            try:
+                entries = await asyncio.to_thread(journal.pending)
+                if not entries:
+                    await wait_for_entries(IDLE_CHECK_INTERVAL)
+                    continue
+
+                for entry in entries:
+                    if not await self._replay(entry):
+                        # Порядок важен: следующие записи ждут, пока пройдёт эта
+                        delay = min(JOURNAL_RETRY_MAX_DELAY, 2 ** min(entry.attempts, 16))
+                        logger.warning(f"⚠️ Повтор записи журнала {entry.id} через {delay} с")
+                        await asyncio.sleep(delay)
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка переноса журнала: {e}")
+                await asyncio.sleep(IDLE_CHECK_INTERVAL)
+
+    async def _replay(self, entry: JournalEntry) -> bool:
+        """
+        Применить одну запись.
+
+        Returns:
+            bool: False, если запись нужно повторить позже
+        """
+        journal = get_journal()
+        applier = _APPLIERS.get(entry.kind)
+        try:
+            if applier is None:
+                raise JournalRejected(f"Неизвестный тип записи: {entry.kind}")
+            await applier(entry)
+        except JournalRejected as e:
+            await self._reject(entry, str(e))
+            return True
+        except Exception as e:
+            if _is_permanent(e):
+                await self._reject(entry, f"{type(e).__name__}: {e}")
+                return True
+
+            logger.warning(f"⚠️ Запись журнала {entry.id} не перенесена (попытка {entry.attempts + 1}): {e}")
+            await asyncio.to_thread(journal.mark_failed_attempt, entry, str(e))
+            if entry.attempts >= JOURNAL_MAX_ATTEMPTS:
+                await self._reject(entry, f"не перенесена за {entry.attempts} попыток, последняя ошибка: {e}")
+                return True
+            return False
+
+        await asyncio.to_thread(journal.mark_done, entry)
+        logger.info(f"✅ Запись журнала {entry.id} перенесена в Google Sheets")
+        return True
+
+    async def _reject(self, entry: JournalEntry, error: str):
+        """Снять запись с очереди и уведомить администраторов."""
+        logger.error(f"❌ Запись журнала {entry.id} отклонена: {error}")
+        await asyncio.to_thread(get_journal().mark_failed, entry, error)
+        await self._alert_admins(entry, error)
+
+    async def _alert_admins(self, entry: JournalEntry, error: str):
+        """Сообщить владельцу и главбуху, что запись нужно перенести вручную."""
+        if self._bot is None:
+            return
+
+        from services.broadcast import broadcast_text
+
+        steps = [
+            label for key, label in (
+                ('new_balance', "баланс изменён"),
+                ('expense_row_done', "строка расхода записана"),
+                ('compensation_done', "запрос на компенсацию создан"),
+            )
+            if entry.state.get(key, False) is not False
+        ]
+        payload = entry.payload
+        text = (
+            f"🚨 <b>Запись журнала {entry.id} не перенесена в Google Sheets</b>\n\n"
+            f"Операция: {html.escape(entry.kind)}\n"
+            f"Сотрудник ID: {payload.get('user_id')}\n"
+            f"Сумма: {payload.get('amount')} руб\n"
+            f"Создана: {entry.created_at}\n"
+            f"Выполнено: {', '.join(steps) or 'ничего'}\n"
+            f"Ошибка: {html.escape(error)}\n\n"
+            f"Проверьте баланс сотрудника и таблицу и внесите операцию вручную."
+        )
+        try:
+            employees = await run_sheets(get_employees_from_sheet)
+            admins = [
+                emp_id for emp_id, emp in employees.items()
+                if emp.get('role') in [ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER]
+            ]
+            await broadcast_text(self._bot, admins, text, name=f"Отклонённая запись журнала {entry.id}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось уведомить администраторов о записи журнала {entry.id}: {e}")
@@ -1,18 +1,31 @@
 """
 Scheduler service for automated reports.
 """
+import asyncio
 import logging
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
+from typing import Optional
 
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
 
-from config.settings import TELEGRAM_TOKEN
+from config.settings import (
+    TELEGRAM_TOKEN,
+    SCHEDULER_DB_PATH,
+    SCHEDULER_MISFIRE_GRACE_TIME,
+    SCHEDULER_CATCHUP_STAGGER,
+)
+from services.broadcast import broadcast, broadcast_text
+from services.balance_alerts import get_balance_alert_store, plan_balance_alerts
+from services.job_history import JobHistory
 from utils.google_sheets import get_employees_from_sheet
+from utils.sheets_gateway import sheets_async
 from utils.sheets_extended import (
-    get_expenses_by_employee_and_period,
-    get_employee_balance,
+    get_employee_period_reports,
     get_negative_balances,
     get_expenses_by_project,
     get_employees_with_subscription,
@@ -35,72 +48,212 @@ ROLE_CONTROLLER = "контролер"
 ROLE_EMPLOYEE = "подотчетник"
 
 
+class AdminReportSnapshot:
+    """
+    Данные для отчётов администрации, собранные один раз на окно запуска.
+    
+    По понедельникам в 8:00 одновременно срабатывают daily_admin и
+    weekly_admin, 1-го числа — ещё и monthly_admin. Снимок содержит
+    расходы с начала самого длинного из их периодов по вчерашний день
+    (упорядоченные по дню) и отрицательные балансы; каждый отчёт берёт
+    свой период срезом по бинарному поиску.
+    """
+    
+    def __init__(self, window: datetime, expenses: list, negative_balances: list):
+        self.window = window
+        self.expenses = sorted(expenses, key=lambda e: e['day'])
+        self._days = [e['day'] for e in self.expenses]
+        self.negative_balances = negative_balances
+    
+    def expenses_between(self, start_date: datetime, end_date: datetime) -> list:
+        """Расходы за дни с start_date по end_date включительно."""
+        start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.expenses[bisect_left(self._days, start):bisect_right(self._days, end)]
+
+
+def admin_snapshot_window(now: datetime) -> datetime:
+    """Окно запуска: задачи, сработавшие в один час, используют общий снимок."""
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+async def build_admin_report_snapshot(window: datetime) -> AdminReportSnapshot:
+    """Собрать снимок для отчётов администрации за окно запуска."""
+    today = window.replace(hour=0)
+    last_week_start = today - timedelta(days=today.weekday() + 7)
+    last_month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    start_date = min(last_week_start, last_month_start)
+    end_date = today - timedelta(days=1)
+    
+    expenses = await get_all_expenses_extended(start_date, end_date)
+    negative = await get_negative_balances()
+    logger.info(
+        f"✅ Снимок для отчётов администрации {window.strftime('%d.%m.%Y %H:00')}: "
+        f"{len(expenses)} расходов с {start_date.strftime('%d.%m.%Y')}"
+    )
+    return AdminReportSnapshot(window, expenses, negative)
+
+
+# Задачи планировщика: (id, метод ReportScheduler, расписание)
+REPORT_JOBS = [
+    # Подотчётники: понедельник 9:00
+    ("weekly_employee", "send_weekly_employee_report", dict(day_of_week="mon", hour=9, minute=0)),
+    # Подотчётники: 1-го числа 9:00
+    ("monthly_employee", "send_monthly_employee_report", dict(day=1, hour=9, minute=0)),
+    # Финансист/Директор: ежедневно 8:00
+    ("daily_admin", "send_daily_admin_report", dict(hour=8, minute=0)),
+    # Финансист/Директор: понедельник 8:00
+    ("weekly_admin", "send_weekly_admin_report", dict(day_of_week="mon", hour=8, minute=0)),
+    # Финансист/Директор: 1-го числа 8:00
+    ("monthly_admin", "send_monthly_admin_report", dict(day=1, hour=8, minute=0)),
+    # Проверка нулевого баланса каждые 2 часа
+    ("check_balances", "check_zero_balances", dict(hour="*/2")),
+]
+
+# Запущенный планировщик: задачи в базе хранят ссылку на run_report_job,
+# а не на метод объекта (его нельзя сохранить)
+_active_scheduler: Optional["ReportScheduler"] = None
+
+
+async def run_report_job(method_name: str):
+    """Выполнить задачу планировщика отчётов по имени метода ReportScheduler."""
+    if _active_scheduler is None:
+        logger.warning(f"⚠️ Планировщик не запущен, задача {method_name} пропущена")
+        return
+    await getattr(_active_scheduler, method_name)()
+
+
+def _latest_missed_run(job, now: datetime) -> Optional[datetime]:
+    """Последнее время запуска задачи, которое уже прошло (None — не пропущено)."""
+    run_time = job.next_run_time
+    if run_time is None or run_time > now:
+        return None
+    while True:
+        following = job.trigger.get_next_fire_time(run_time, now)
+        if following is None or following > now or following <= run_time:
+            return run_time
+        run_time = following
+
+
 class ReportScheduler:
-    """Manages scheduled report delivery."""
+    """
+    Manages scheduled report delivery.
+    
+    Задачи хранятся в SQLite (SCHEDULER_DB_PATH), поэтому перезапуск бота
+    около 8:00–9:00 не теряет отчёт: пропущенное окно, если с него прошло
+    не больше SCHEDULER_MISFIRE_GRACE_TIME, выполняется один раз
+    (несколько пропущенных запусков склеиваются), а догоняющие задачи
+    запускаются с паузой SCHEDULER_CATCHUP_STAGGER, чтобы не нагружать
+    Sheets одновременно. История запусков — services/job_history.py.
+    """
     
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.scheduler = AsyncIOScheduler(timezone='Europe/Moscow')
+        self.history = JobHistory(SCHEDULER_DB_PATH)
+        self.scheduler = AsyncIOScheduler(
+            jobstores={'default': SQLAlchemyJobStore(url=f"sqlite:///{SCHEDULER_DB_PATH}")},
+            job_defaults={
+                'coalesce': True,
+                'max_instances': 1,
+                'misfire_grace_time': SCHEDULER_MISFIRE_GRACE_TIME,
+            },
+            timezone='Europe/Moscow'
+        )
+        self._admin_snapshot: Optional[AdminReportSnapshot] = None
+        self._admin_snapshot_lock = asyncio.Lock()
     
     def start(self):
         """Start the scheduler."""
+        global _active_scheduler
+        
         logger.info("🚀 Запуск планировщика отчётов...")
+        _active_scheduler = self
         
-        # Подотчётники: понедельник 9:00
-        self.scheduler.add_job(
-            self.send_weekly_employee_report,
-            CronTrigger(day_of_week="mon", hour=9, minute=0),
-            id="weekly_employee",
-            replace_existing=True
-        )
+        self.scheduler.add_listener(self._on_submitted, EVENT_JOB_SUBMITTED)
+        self.scheduler.add_listener(self._on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        self.scheduler.add_listener(self._on_missed, EVENT_JOB_MISSED)
         
-        # Подотчётники: 1-го числа 9:00
-        self.scheduler.add_job(
-            self.send_monthly_employee_report,
-            CronTrigger(day=1, hour=9, minute=0),
-            id="monthly_employee",
-            replace_existing=True
-        )
+        # Задачи из базы загружаются, но не выполняются, пока не разобраны пропуски
+        self.scheduler.start(paused=True)
         
-        # Финансист/Директор: ежедневно 8:00
-        self.scheduler.add_job(
-            self.send_daily_admin_report,
-            CronTrigger(hour=8, minute=0),
-            id="daily_admin",
-            replace_existing=True
-        )
+        for job_id, method_name, schedule in REPORT_JOBS:
+            self._ensure_job(job_id, method_name, CronTrigger(**schedule))
+        self._stagger_missed_jobs()
         
-        # Финансист/Директор: понедельник 8:00
-        self.scheduler.add_job(
-            self.send_weekly_admin_report,
-            CronTrigger(day_of_week="mon", hour=8, minute=0),
-            id="weekly_admin",
-            replace_existing=True
-        )
+        self.scheduler.resume()
+        logger.info("✅ Планировщик отчётов запущен")
+    
+    def stop(self):
+        """Stop the scheduler."""
+        global _active_scheduler
         
-        # Финансист/Директор: 1-го числа 8:00
-        self.scheduler.add_job(
-            self.send_monthly_admin_report,
-            CronTrigger(day=1, hour=8, minute=0),
-            id="monthly_admin",
-            replace_existing=True
-        )
+        self.scheduler.shutdown()
+        _active_scheduler = None
+        logger.info("🛑 Планировщик остановлен")
+    
+    def _ensure_job(self, job_id: str, method_name: str, trigger: CronTrigger):
+        """
+        Добавить задачу, если её нет в базе или у неё изменилось расписание.
+        
+        Сохранённую задачу с тем же расписанием не заменяем: замена
+        пересчитала бы время запуска и потеряла пропущенное окно.
+        """
+        job = self.scheduler.get_job(job_id)
+        if job is not None and str(job.trigger) == str(trigger) and list(job.args) == [method_name]:
+            if job.misfire_grace_time != SCHEDULER_MISFIRE_GRACE_TIME or not job.coalesce:
+                job.modify(misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME, coalesce=True)
+            return
         
-        # Проверка нулевого баланса каждые 2 часа
         self.scheduler.add_job(
-            self.check_zero_balances,
-            CronTrigger(hour="*/2"),
-            id="check_balances",
+            run_report_job,
+            trigger,
+            args=[method_name],
+            id=job_id,
             replace_existing=True
         )
+    
+    def _stagger_missed_jobs(self):
+        """Назначить пропущенным окнам по одному запуску с паузой между ними."""
+        now = datetime.now(self.scheduler.timezone)
+        missed = []
+        for job in self.scheduler.get_jobs():
+            run_time = _latest_missed_run(job, now)
+            if run_time is None:
+                continue
+            if (now - run_time).total_seconds() > SCHEDULER_MISFIRE_GRACE_TIME:
+                # Слишком давно: APScheduler отметит окно пропущенным (EVENT_JOB_MISSED)
+                continue
+            missed.append((run_time, job))
         
-        self.scheduler.start()
-        logger.info("✅ Планировщик отчётов запущен")
+        missed.sort(key=lambda item: item[0])
+        for k, (run_time, job) in enumerate(missed):
+            run_at = now + timedelta(seconds=k * SCHEDULER_CATCHUP_STAGGER)
+            job.modify(next_run_time=run_at)
+            self.history.catch_up(job.id, run_time, run_at)
+            logger.warning(
+                f"⏳ Задача {job.id} пропустила запуск {run_time.strftime('%d.%m.%Y %H:%M')}, "
+                f"выполним в {run_at.strftime('%H:%M:%S')}"
+            )
     
-    def stop(self):
-        """Stop the scheduler."""
-        self.scheduler.shutdown()
-        logger.info("🛑 Планировщик остановлен")
+    # ============ ИСТОРИЯ ЗАПУСКОВ ============
+    
+    def _on_submitted(self, event):
+        for run_time in event.scheduled_run_times:
+            self._record(self.history.started, event.job_id, run_time)
+    
+    def _on_finished(self, event):
+        error = f"{type(event.exception).__name__}: {event.exception}" if event.exception else ""
+        self._record(self.history.finished, event.job_id, event.scheduled_run_time, error)
+    
+    def _on_missed(self, event):
+        logger.warning(f"⚠️ Задача {event.job_id} пропустила запуск {event.scheduled_run_time}")
+        self._record(self.history.missed, event.job_id, event.scheduled_run_time)
+    
+    def _record(self, method, *args):
+        try:
+            method(*args)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи истории планировщика: {e}")
     
     # ============ ОТЧЁТЫ ДЛЯ ПОДОТЧЁТНИКОВ ============
     
@@ -116,13 +269,7 @@ class ReportScheduler:
             start_date = now - timedelta(days=now.weekday() + 7)  # Прошлый понедельник
             end_date = start_date + timedelta(days=6)
             
-            for emp_id in subscribers:
-                try:
-                    await self._send_employee_period_report(
-                        emp_id, start_date, end_date, 'weekly'
-                    )
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки отчёта сотруднику {emp_id}: {e}")
+            await self._send_employee_period_reports(subscribers, start_date, end_date, 'weekly')
                     
         except Exception as e:
             logger.error(f"❌ Ошибка в send_weekly_employee_report: {e}")
@@ -144,113 +291,140 @@ class ReportScheduler:
             
             end_date = now.replace(day=1) - timedelta(days=1)
             
-            for emp_id in subscribers:
-                try:
-                    await self._send_employee_period_report(
-                        emp_id, start_date, end_date, 'monthly'
-                    )
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки отчёта сотруднику {emp_id}: {e}")
+            await self._send_employee_period_reports(subscribers, start_date, end_date, 'monthly')
                     
         except Exception as e:
             logger.error(f"❌ Ошибка в send_monthly_employee_report: {e}")
     
-    async def _send_employee_period_report(self, emp_id: int, start_date: datetime, end_date: datetime, period_type: str):
-        """Отправить отчёт сотруднику за период."""
-        try:
-            # Получаем расходы
-            expenses = await get_expenses_by_employee_and_period(emp_id, start_date, end_date)
-            
-            if not expenses:
+    async def _send_employee_period_reports(self, subscribers: list, start_date: datetime, end_date: datetime, period_type: str):
+        """Отправить отчёты за период всем подписчикам по одному снимку данных."""
+        if not subscribers:
+            return
+        
+        # Расходы и балансы всех подписчиков — за одно чтение листов
+        reports = await get_employee_period_reports(subscribers, start_date, end_date)
+        
+        messages = []
+        for emp_id in subscribers:
+            report = reports.get(emp_id)
+            if not report or not report['expenses']:
                 logger.info(f"ℹ️ Нет расходов для сотрудника {emp_id}")
-                return
+                continue
             
-            # Считаем статистику
-            total_count = len(expenses)
-            total_amount = sum(e['amount'] for e in expenses)
-            balance = await get_employee_balance(emp_id)
-            
-            # Группируем по категориям
-            categories = {}
-            for e in expenses:
-                cat = e['category']
-                categories[cat] = categories.get(cat, 0) + e['amount']
-            
-            categories_text = "\n".join([
-                f"  • {cat}: {amount:.2f}₽"
-                for cat, amount in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]
-            ])
-            
-            # Предупреждение о балансе
-            warning = ""
-            if balance < 0:
-                warning = f"\n⚠️ Внимание! Отрицательный баланс: {balance:.2f}₽"
-            
-            # Формируем текст
-            if period_type == 'weekly':
-                text = EMPLOYEE_WEEKLY_TEMPLATE.format(
-                    start_date=start_date.strftime("%d.%m.%Y"),
-                    end_date=end_date.strftime("%d.%m.%Y"),
-                    total_count=total_count,
-                    total_amount=total_amount,
-                    balance=balance,
-                    categories=categories_text,
-                    warning=warning
-                )
-            else:
-                pending = sum(e['amount'] for e in expenses if e.get('compensation_status') == "ожидает")
-                text = EMPLOYEE_MONTHLY_TEMPLATE.format(
-                    month=end_date.strftime("%B"),
-                    year=end_date.year,
-                    total_count=total_count,
-                    total_amount=total_amount,
-                    balance=balance,
-                    pending=pending,
-                    categories=categories_text,
-                    warning=warning
-                )
-            
-            await self.bot.send_message(chat_id=emp_id, text=text, parse_mode="HTML")
-            logger.info(f"✅ Отчёт отправлен сотруднику {emp_id}")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка формирования отчёта для {emp_id}: {e}")
+            try:
+                messages.append((emp_id, self._render_employee_period_report(report, start_date, end_date, period_type)))
+            except Exception as e:
+                logger.error(f"❌ Ошибка формирования отчёта для {emp_id}: {e}")
+        
+        await broadcast(self.bot, messages, name=f"Отчёты сотрудникам ({period_type})")
+    
+    def _render_employee_period_report(self, report: dict, start_date: datetime, end_date: datetime, period_type: str) -> str:
+        """Текст отчёта сотруднику из {expenses, balance} (см. get_employee_period_reports)."""
+        expenses = report['expenses']
+        balance = report['balance']
+        
+        # Считаем статистику
+        total_count = len(expenses)
+        total_amount = sum(e['amount'] for e in expenses)
+        
+        # Группируем по категориям
+        categories = {}
+        for e in expenses:
+            cat = e['category']
+            categories[cat] = categories.get(cat, 0) + e['amount']
+        
+        categories_text = "\n".join([
+            f"  • {cat}: {amount:.2f}₽"
+            for cat, amount in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]
+        ])
+        
+        # Предупреждение о балансе
+        warning = ""
+        if balance < 0:
+            warning = f"\n⚠️ Внимание! Отрицательный баланс: {balance:.2f}₽"
+        
+        # Формируем текст
+        if period_type == 'weekly':
+            text = EMPLOYEE_WEEKLY_TEMPLATE.format(
+                start_date=start_date.strftime("%d.%m.%Y"),
+                end_date=end_date.strftime("%d.%m.%Y"),
+                total_count=total_count,
+                total_amount=total_amount,
+                balance=balance,
+                categories=categories_text,
+                warning=warning
+            )
+        else:
+            pending = sum(e['amount'] for e in expenses if e.get('compensation_status') == "ожидает")
+            text = EMPLOYEE_MONTHLY_TEMPLATE.format(
+                month=end_date.strftime("%B"),
+                year=end_date.year,
+                total_count=total_count,
+                total_amount=total_amount,
+                balance=balance,
+                pending=pending,
+                categories=categories_text,
+                warning=warning
+            )
+        
+        return text
     
     async def check_zero_balances(self):
-        """Проверить нулевые/отрицательные балансы и отправить уведомления."""
+        """
+        Уведомить подписчиков, чей баланс перешёл в зону ≤ 0.
+        
+        Балансы и расходы за 7 дней берутся одним проходом по снимкам
+        листов; повторно уведомляется только тот, чей баланс успел
+        восстановиться (или по интервалу BALANCE_ALERT_REMINDER_HOURS).
+        """
         try:
             # Получаем сотрудников с подпиской на уведомления о балансе
             subscribers = await get_employees_with_subscription('balance_alert')
+            if not subscribers:
+                return
             
-            for emp_id in subscribers:
-                try:
-                    balance = await get_employee_balance(emp_id)
-                    
-                    # Если баланс <= 0, отправляем уведомление
-                    if balance <= 0:
-                        # Получаем расходы за последние 7 дней
-                        now = datetime.now()
-                        start_date = now - timedelta(days=7)
-                        expenses = await get_expenses_by_employee_and_period(emp_id, start_date, now)
-                        
-                        total_expenses = sum(e['amount'] for e in expenses)
-                        
-                        text = LOW_BALANCE_TEMPLATE.format(
-                            balance=balance,
-                            expenses=f"{total_expenses:.2f}₽"
-                        )
-                        
-                        await self.bot.send_message(chat_id=emp_id, text=text, parse_mode="HTML")
-                        logger.info(f"⚠️ Уведомление о нулевом балансе отправлено {emp_id}")
-                        
-                except Exception as e:
-                    logger.error(f"❌ Ошибка проверки баланса {emp_id}: {e}")
+            # Балансы и расходы за последние 7 дней — за одно чтение листов
+            now = datetime.now()
+            reports = await get_employee_period_reports(subscribers, now - timedelta(days=7), now)
+            balances = {emp_id: report['balance'] for emp_id, report in reports.items()}
+            
+            store = get_balance_alert_store()
+            notified = await asyncio.to_thread(store.notified)
+            to_notify, recovered = plan_balance_alerts(balances, notified, now)
+            
+            if recovered:
+                await asyncio.to_thread(store.clear, recovered)
+                logger.info(f"✅ Баланс восстановился у {len(recovered)} сотрудников")
+            
+            messages = []
+            for emp_id in to_notify:
+                total_expenses = sum(e['amount'] for e in reports[emp_id]['expenses'])
+                text = LOW_BALANCE_TEMPLATE.format(
+                    balance=balances[emp_id],
+                    expenses=f"{total_expenses:.2f}₽"
+                )
+                messages.append((emp_id, text))
+            
+            result = await broadcast(self.bot, messages, name="Уведомления о нулевом балансе")
+            
+            # Недоставленные уведомления повторятся при следующей проверке
+            failed = {chat_id for chat_id, _ in result.failed}
+            delivered = {emp_id: balances[emp_id] for emp_id in to_notify if emp_id not in failed}
+            await asyncio.to_thread(store.mark_notified, delivered, now)
                     
         except Exception as e:
             logger.error(f"❌ Ошибка в check_zero_balances: {e}")
     
     # ============ ОТЧЁТЫ ДЛЯ АДМИНИСТРАЦИИ ============
     
+    async def _get_admin_snapshot(self) -> AdminReportSnapshot:
+        """Снимок текущего окна запуска; первая задача окна его строит, остальные ждут."""
+        window = admin_snapshot_window(datetime.now())
+        async with self._admin_snapshot_lock:
+            if self._admin_snapshot is None or self._admin_snapshot.window != window:
+                self._admin_snapshot = await build_admin_report_snapshot(window)
+            return self._admin_snapshot
+    
     async def send_daily_admin_report(self):
         """Отправить ежедневный отчёт финансистам/директорам (8:00)."""
         logger.info("📊 Отправка ежедневного отчёта администрации...")
@@ -264,17 +438,9 @@ class ReportScheduler:
             start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
             end_date = yesterday.replace(hour=23, minute=59, second=59)
             
-            # Получаем все расходы
-            all_expenses = await get_all_expenses_extended()
-            yesterday_expenses = []
-            
-            for exp in all_expenses:
-                try:
-                    exp_date = datetime.strptime(exp['date'].split()[0], "%d.%m.%Y")
-                    if start_date.date() <= exp_date.date() <= end_date.date():
-                        yesterday_expenses.append(exp)
-                except:
-                    continue
+            # Расходы за вчера
+            snapshot = await self._get_admin_snapshot()
+            yesterday_expenses = snapshot.expenses_between(start_date, end_date)
             
             if not yesterday_expenses:
                 logger.info("ℹ️ Нет расходов за вчера")
@@ -299,7 +465,7 @@ class ReportScheduler:
             ])
             
             # Проверяем отрицательные балансы
-            negative = await get_negative_balances()
+            negative = snapshot.negative_balances
             alerts = f"{len(negative)} сотрудников с отриц. балансом" if negative else "Нет"
             
             text = ADMIN_DAILY_TEMPLATE.format(
@@ -311,13 +477,7 @@ class ReportScheduler:
                 alerts=alerts
             )
             
-            for admin_id in subscribers:
-                try:
-                    await self.bot.send_message(chat_id=admin_id, text=text, parse_mode="HTML")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки отчёта админу {admin_id}: {e}")
-            
-            logger.info(f"✅ Ежедневный отчёт отправлен {len(subscribers)} администраторам")
+            await broadcast_text(self.bot, subscribers, text, name="Ежедневный отчёт администрации")
             
         except Exception as e:
             logger.error(f"❌ Ошибка в send_daily_admin_report: {e}")
@@ -335,13 +495,7 @@ class ReportScheduler:
             
             text = await self._generate_admin_period_report(start_date, end_date, 'weekly')
             
-            for admin_id in subscribers:
-                try:
-                    await self.bot.send_message(chat_id=admin_id, text=text, parse_mode="HTML")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки отчёта админу {admin_id}: {e}")
-            
-            logger.info(f"✅ Недельный отчёт отправлен {len(subscribers)} администраторам")
+            await broadcast_text(self.bot, subscribers, text, name="Недельный отчёт администрации")
             
         except Exception as e:
             logger.error(f"❌ Ошибка в send_weekly_admin_report: {e}")
@@ -363,13 +517,7 @@ class ReportScheduler:
             
             text = await self._generate_admin_period_report(start_date, end_date, 'monthly')
             
-            for admin_id in subscribers:
-                try:
-                    await self.bot.send_message(chat_id=admin_id, text=text, parse_mode="HTML")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки отчёта админу {admin_id}: {e}")
-            
-            logger.info(f"✅ Месячный отчёт отправлен {len(subscribers)} администраторам")
+            await broadcast_text(self.bot, subscribers, text, name="Месячный отчёт администрации")
             
         except Exception as e:
             logger.error(f"❌ Ошибка в send_monthly_admin_report: {e}")
@@ -377,17 +525,9 @@ class ReportScheduler:
     async def _generate_admin_period_report(self, start_date: datetime, end_date: datetime, period_type: str) -> str:
         """Сгенерировать отчёт администрации за период."""
         try:
-            # Получаем все расходы за период
-            all_expenses = await get_all_expenses_extended()
-            period_expenses = []
-            
-            for exp in all_expenses:
-                try:
-                    exp_date = datetime.strptime(exp['date'].split()[0], "%d.%m.%Y")
-                    if start_date.date() <= exp_date.date() <= end_date.date():
-                        period_expenses.append(exp)
-                except:
-                    continue
+            # Получаем расходы за период
+            snapshot = await self._get_admin_snapshot()
+            period_expenses = snapshot.expenses_between(start_date, end_date)
             
             if not period_expenses:
                 return f"📊 <b>Нет данных за период</b>\n{start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}"
@@ -438,45 +578,48 @@ class ReportScheduler:
             return "❌ Ошибка формирования отчёта"
 
 
-async def get_all_expenses_extended() -> list:
+@sheets_async
+def get_all_expenses_extended(start_date: datetime = None, end_date: datetime = None) -> list:
     """
     Получить все расходы с расширенной информацией.
     
+    Args:
+        start_date, end_date: Границы периода по дням, включительно
+                              (время суток не учитывается); None — без границы
+    
     Returns:
-        list: [{date, amount, category, employee_name, project, compensation_status}, ...]
+        list: [{date, day, amount, category, employee_name, project, compensation_status}, ...]
     """
     try:
-        from utils.google_sheets import get_sheets_client
-        from utils.sheets_extended import SHEET_EXPENSES
-        from config.settings import SPREADSHEET_ID
-        
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
+        from utils.expense_store import get_expense_table
+        from utils.sheets_extended import get_project_index
         
-        rows = sheet.get_all_values()[1:]
+        table = get_expense_table()
+        project_index = get_project_index()
         expenses = []
         
-        for row in rows:
-            if len(row) >= 7:
-                # Получаем название проекта
-                project_name = ""
-                if len(row) > 7 and row[7]:
-                    from utils.sheets_extended import get_all_projects
-                    projects = get_all_projects()
-                    for p in projects:
-                        if p['id'] == row[7]:
-                            project_name = p['name']
-                            break
-                
-                expenses.append({
-                    'date': row[2],
-                    'amount': float(row[3]) if row[3] else 0.0,
-                    'category': row[4],
-                    'employee_name': f"{row[0]} {row[1]}",
-                    'project': project_name or row[5],
-                    'compensation_status': row[8] if len(row) > 8 else ""
-                })
+        if start_date is not None:
+            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if end_date is not None:
+            end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        for i in table.select(start=start_date, end=end_date):
+            if table.amounts[i] is None:
+                continue
+            
+            # Получаем название проекта
+            project_id = table.project_ids[i]
+            project_name = project_index.get(project_id, "") if project_id else ""
+            
+            expenses.append({
+                'date': table.rows[i][2],
+                'day': table.days[i],
+                'amount': table.amounts[i],
+                'category': table.categories[i],
+                'employee_name': f"{table.first_names[i]} {table.last_names[i]}",
+                'project': project_name or table.objects[i],
+                'compensation_status': table.compensation_statuses[i]
+            })
         
         return expenses
         
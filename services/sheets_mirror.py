@@ -0,0 +1,109 @@
+"""
+Зеркалирование локального хранилища в Google Sheets (STORAGE_BACKEND=sqlite).
+
+Изменения переносятся в том порядке, в каком были сделаны локально.
+Подряд идущие добавления строк в один лист уходят одним append_rows,
+подряд идущие правки ячеек одного листа — одним batch_update.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from config.settings import JOURNAL_RETRY_MAX_DELAY
+from utils.google_sheets import get_remote_worksheet, add_remote_worksheet, patch_rows
+from utils.local_storage import get_local_storage
+from utils.sheets_gateway import run_sheets
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять очередь зеркалирования (секунды)
+MIRROR_INTERVAL = 5
+
+# Размер нового листа в Google Sheets
+NEW_SHEET_ROWS = 1000
+NEW_SHEET_COLS = 20
+
+
+def _group(changes: list) -> List[tuple]:
+    """
+    Склеить подряд идущие однотипные изменения одного листа.
+
+    Returns:
+        list: [(последний_id, лист, операция, данные), ...]
+    """
+    groups = []
+    for change_id, title, op, payload in changes:
+        if groups and groups[-1][1] == title and groups[-1][2] == op and op != "add_worksheet":
+            _, _, _, merged = groups[-1]
+            if op == "append":
+                merged['rows'].extend(payload['rows'])
+            else:
+                merged['cells'].extend(payload['cells'])
+            groups[-1] = (change_id, title, op, merged)
+        else:
+            groups.append((change_id, title, op, payload))
+    return groups
+
+
+def _push(title: str, op: str, payload: dict):
+    """Перенести одну группу изменений в Google Sheets (блокирующая часть)."""
+    if op == "add_worksheet":
+        try:
+            get_remote_worksheet(title)
+        except Exception:
+            add_remote_worksheet(title, NEW_SHEET_ROWS, NEW_SHEET_COLS)
+        return
+
+    sheet = get_remote_worksheet(title)
+    if op == "append":
+        sheet.append_rows(payload['rows'], value_input_option="USER_ENTERED")
+    elif op == "update":
+        patches: Dict[int, Dict[int, str]] = {}
+        for row, col, value in payload['cells']:
+            patches.setdefault(row, {})[col] = value
+        patch_rows(sheet, patches)
+    else:
+        logger.error(f"❌ Неизвестная операция зеркалирования: {op}")
+
+
+class SheetsMirror:
+    """Фоновая задача, переносящая изменения локального хранилища в Google Sheets."""
+
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        """Запустить фоновую задачу (внутри event loop)."""
+        self._task = asyncio.create_task(self._run())
+        logger.info("🚀 Зеркалирование в Google Sheets запущено")
+
+    async def stop(self):
+        """Остановить зеркалирование; оставшиеся изменения перенесутся при следующем запуске."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("🛑 Зеркалирование в Google Sheets остановлено")
+
+    async def _run(self):
+        storage = get_local_storage()
+        failures = 0
+        while True:
+            try:
+                changes = await asyncio.to_thread(storage.pending_mirror)
+                for last_id, title, op, payload in _group(changes):
+                    await run_sheets(_push, title, op, payload)
+                    await asyncio.to_thread(storage.ack_mirror, last_id)
+                if changes:
+                    logger.info(f"✅ В Google Sheets перенесено изменений: {len(changes)}")
+                failures = 0
+                delay = MIRROR_INTERVAL
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(JOURNAL_RETRY_MAX_DELAY, MIRROR_INTERVAL * 2 ** min(failures, 10))
+                logger.warning(f"⚠️ Ошибка зеркалирования в Google Sheets: {e}. Повтор через {delay} с")
+            await asyncio.sleep(delay)
@@ -0,0 +1,52 @@
+"""Поиск ячеек в имитации Google Sheets (utils/fake_sheets.py)."""
+import os
+
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("SPREADSHEET_ID", "test")
+os.environ.setdefault("FAKE_SHEETS_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_SHEETS_JITTER_MS", "0")
+
+import pytest
+
+from utils.fake_sheets import FakeSpreadsheet
+
+
+@pytest.fixture
+def sheet():
+    sheet = FakeSpreadsheet("test").add_worksheet("Сотрудники")
+    sheet.append_rows([
+        ["ID", "Имя", "Фамилия"],
+        ["111", "Иван", "Петров"],
+        ["222", "111", "Сидоров"],
+    ])
+    return sheet
+
+
+def test_find_without_column(sheet):
+    cell = sheet.find("111")
+    assert (cell.row, cell.col, cell.value) == (2, 1, "111")
+    assert sheet.find("Смирнов") is None
+
+
+def test_find_in_column(sheet):
+    cell = sheet.find("111", in_column=2)
+    assert (cell.row, cell.col, cell.value) == (3, 2, "111")
+    assert sheet.find("Иван", in_column=1) is None
+    assert sheet.find("111", in_column=10) is None
+
+
+def test_find_in_row(sheet):
+    cell = sheet.find("111", in_row=3)
+    assert (cell.row, cell.col) == (3, 2)
+    assert sheet.find("Петров", in_row=3) is None
+
+
+def test_load_seed_inline_and_file(tmp_path):
+    from utils.fake_sheets import _load_seed
+
+    data = {"Проекты": [["ID", "Название"], ["1", "Дом"]]}
+    assert _load_seed('{"Проекты": [["ID", "Название"], ["1", "Дом"]]}') == data
+
+    path = tmp_path / "seed.json"
+    path.write_text('{"Проекты": [["ID", "Название"], ["1", "Дом"]]}', encoding="utf-8")
+    assert _load_seed(str(path)) == data
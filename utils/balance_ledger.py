@@ -0,0 +1,264 @@
+"""
+Балансы сотрудников, выведенные из журнала операций.
+
+Баланс — это итог операций: авансов и расходов листа "Расходы"
+(Тип_операции "аванс" / "расход") и выплаченных компенсаций листа
+"Компенсации". Колонка H листа "Сотрудники" хранит этот итог готовым
+(по ней работают все чтения), но она может расходиться с операциями:
+из-за сбоев между списанием баланса и записью строки, случавшихся до
+журнала изменений, или из-за правок колонки вручную. Пересчитать её
+можно было только полным перебором листов.
+
+Здесь итоги по сотрудникам хранятся в памяти: при дозаписи "Расходы"
+учитываются только новые строки, полный пересчёт — один векторный проход
+pandas. find_balance_drift сверяет колонку H с операциями,
+repair_balance_drift исправляет расхождения — только подтверждённые
+администратором: начальные остатки и ручные корректировки, внесённые
+прямо в колонку H, в операциях не видны. Сотрудники, чью историю нельзя
+однозначно приписать (старые строки без telegram_id у однофамильцев),
+не исправляются.
+
+Итоги операций служат только для сверки: балансы по-прежнему читаются из
+колонки H (через снимок листа и индекс сотрудников — без перебора), потому
+что начальные остатки и ручные корректировки есть только в ней.
+"""
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utils.bulk_parse import parse_amount
+from utils.expense_store import ExpenseTable, get_expense_table
+
+logger = logging.getLogger(__name__)
+
+SHEET_COMPENSATIONS = "Компенсации"
+
+# Знак операции листа "Расходы" для баланса
+OPERATION_SIGNS = {
+    "аванс": 1.0,
+    "расход": -1.0,
+}
+
+# Статус компенсации, увеличившей баланс
+COMPENSATION_PAID = "выплачено"
+
+# Расхождение меньше этого считается погрешностью округления
+DRIFT_EPSILON = 0.01
+
+
+def _owner(table: ExpenseTable, i: int):
+    """Ключ итогов для строки: telegram_id, а у старых строк без него — (Имя, Фамилия)."""
+    return table.telegram_ids[i] or (table.first_names[i], table.last_names[i])
+
+
+def _sum_expense_operations(table: ExpenseTable) -> Dict[object, float]:
+    """Итоги операций "Расходы" по сотрудникам за один векторный проход."""
+    if not len(table):
+        return {}
+
+    frame = pd.DataFrame({
+        'telegram_id': table.telegram_ids,
+        'first_name': table.first_names,
+        'last_name': table.last_names,
+        'sign': pd.Series(table.operation_types).map(OPERATION_SIGNS),
+        'amount': pd.to_numeric(pd.Series(table.amounts, dtype=object), errors='coerce'),
+    })
+    frame['delta'] = frame['sign'] * frame['amount']
+    grouped = frame.dropna(subset=['delta']).groupby(['telegram_id', 'first_name', 'last_name'])['delta'].sum()
+
+    totals: Dict[object, float] = {}
+    for (telegram_id, first_name, last_name), value in grouped.items():
+        key = telegram_id or (first_name, last_name)
+        totals[key] = totals.get(key, 0.0) + float(value)
+    return totals
+
+
+def _sum_paid_compensations(rows: List[List[str]]) -> Dict[str, float]:
+    """Итоги выплаченных компенсаций по ID сотрудника."""
+    totals: Dict[str, float] = {}
+    for row in rows[1:]:
+        if len(row) < 5 or row[4] != COMPENSATION_PAID:
+            continue
+        amount = parse_amount(row[2])
+        if amount is None:
+            continue
+        totals[row[1]] = totals.get(row[1], 0.0) + amount
+    return totals
+
+
+class BalanceLedger:
+    """
+    Итоги операций по сотрудникам, обновляемые вместе со снимками листов.
+
+    Все методы блокирующие (читают снимки через ExpenseStore и sheets_cache).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[ExpenseTable] = None
+        self._expense_totals: Dict[object, float] = {}  # telegram_id или (Имя, Фамилия) -> итог
+        self._compensation_rows: Optional[List[List[str]]] = None
+        self._compensation_totals: Dict[str, float] = {}
+
+    def refresh(self):
+        """Учесть изменения листов с прошлого обращения."""
+        from utils.sheets_cache import get_sheet_values
+
+        table = get_expense_table()
+        compensation_rows = get_sheet_values(SHEET_COMPENSATIONS)
+
+        with self._lock:
+            if table is not self._table:
+                self._apply_table(table)
+            if compensation_rows is not self._compensation_rows:
+                self._compensation_totals = _sum_paid_compensations(compensation_rows)
+                self._compensation_rows = compensation_rows
+
+    def recompute(self):
+        """Пересчитать итоги с нуля."""
+        with self._lock:
+            self._table = None
+            self._compensation_rows = None
+        self.refresh()
+
+    def balance(self, telegram_id: int, first_name: str, last_name: str) -> float:
+        """Баланс сотрудника по операциям (после refresh)."""
+        with self._lock:
+            return (
+                self._expense_totals.get(str(telegram_id), 0.0)
+                + self._expense_totals.get((first_name, last_name), 0.0)
+                + self._compensation_totals.get(str(telegram_id), 0.0)
+            )
+
+    def has_rows_by_name(self, first_name: str, last_name: str) -> bool:
+        """Есть ли строки без telegram_id с таким именем (после refresh)."""
+        with self._lock:
+            return (first_name, last_name) in self._expense_totals
+
+    def _apply_table(self, table: ExpenseTable):
+        known = table.appended_since(self._table)
+        if known is not None:
+            totals = self._expense_totals
+            for i in range(known, len(table)):
+                sign = OPERATION_SIGNS.get(table.operation_types[i])
+                amount = table.amounts[i]
+                if sign is None or amount is None:
+                    continue
+                key = _owner(table, i)
+                totals[key] = totals.get(key, 0.0) + sign * amount
+            logger.debug(f"🔄 Итоги балансов: учтено новых строк {len(table) - known}")
+        else:
+            self._expense_totals = _sum_expense_operations(table)
+            logger.info(f"🔄 Итоги балансов пересчитаны по {len(table)} строкам")
+
+        self._table = table
+
+
+_ledger = BalanceLedger()
+
+
+def find_balance_drift(recompute: bool = False) -> List[dict]:
+    """
+    Сотрудники, у которых колонка H расходится с операциями (блокирующий вызов).
+
+    Расход, который ещё переносится из журнала в Sheets, может на короткое
+    время давать расхождение — перед исправлением стоит проверить ещё раз.
+
+    Если строки без telegram_id с именем сотрудника есть, а имя носят
+    несколько сотрудников, итог по операциям ненадёжен: такое расхождение
+    помечается ambiguous и не исправляется.
+
+    Args:
+        recompute: Пересчитать итоги с нуля, а не по изменениям
+
+    Returns:
+        list: [{telegram_id, name, balance, ledger_balance, ambiguous}, ...]
+    """
+    from utils.balance_service import parse_balance
+    from utils.sheets_cache import get_sheet_values
+    from utils.employee_index import EMPLOYEES_SHEET
+
+    if recompute:
+        _ledger.recompute()
+    else:
+        _ledger.refresh()
+
+    employees = [
+        row for row in get_sheet_values(EMPLOYEES_SHEET)[1:]
+        if len(row) >= 3 and row[0].strip().isdigit()
+    ]
+    namesakes = Counter((row[1], row[2]) for row in employees)
+
+    drift = []
+    for row in employees:
+        try:
+            balance = parse_balance(row)
+        except ValueError:
+            balance = None
+
+        telegram_id = int(row[0].strip())
+        ledger_balance = _ledger.balance(telegram_id, row[1], row[2])
+        if balance is None or abs(balance - ledger_balance) >= DRIFT_EPSILON:
+            drift.append({
+                'telegram_id': telegram_id,
+                'name': f"{row[1]} {row[2]}".strip(),
+                'balance': balance,
+                'ledger_balance': ledger_balance,
+                'ambiguous': namesakes[(row[1], row[2])] > 1 and _ledger.has_rows_by_name(row[1], row[2]),
+            })
+    return drift
+
+
+def _same_drift(seen: dict, current: dict) -> bool:
+    """Расхождение не изменилось с тех пор, как его показали администратору."""
+    if (seen['balance'] is None) != (current['balance'] is None):
+        return False
+    if seen['balance'] is not None and abs(seen['balance'] - current['balance']) >= DRIFT_EPSILON:
+        return False
+    return abs(seen['ledger_balance'] - current['ledger_balance']) < DRIFT_EPSILON
+
+
+async def repair_balance_drift(confirmed: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Записать в колонку H балансы по операциям там, где они расходятся.
+
+    Без confirmed ничего не записывается: возвращается план исправления,
+    который нужно показать администратору. Записываются только
+    расхождения из подтверждённого плана, которые с тех пор не изменились;
+    неоднозначные (ambiguous) в план не попадают.
+
+    Args:
+        confirmed: План, подтверждённый администратором
+
+    Returns:
+        list: План или исправленные расхождения (как у find_balance_drift)
+    """
+    from utils.balance_service import set_balance
+    from utils.sheets_gateway import run_sheets
+
+    drift = await run_sheets(find_balance_drift, True)
+    planned = [item for item in drift if not item['ambiguous']]
+    if confirmed is None:
+        return planned
+
+    approved = {item['telegram_id']: item for item in confirmed}
+    repaired = []
+    for item in planned:
+        seen = approved.get(item['telegram_id'])
+        if seen is None:
+            continue
+        if not _same_drift(seen, item):
+            logger.info(f"ℹ️ Расхождение баланса {item['telegram_id']} изменилось после подтверждения, пропускаем")
+            continue
+        try:
+            await set_balance(item['telegram_id'], item['ledger_balance'])
+            repaired.append(item)
+        except Exception as e:
+            logger.error(f"❌ Не удалось исправить баланс {item['telegram_id']}: {e}")
+
+    if repaired:
+        logger.info(f"✅ Исправлено расхождений балансов: {len(repaired)}")
+    return repaired
@@ -0,0 +1,206 @@
+"""
+Изменение балансов сотрудников (колонка H листа "Сотрудники").
+
+Раньше update_employee_balance читал строку, считал новый баланс в Python
+и записывал его обратно: два одновременных расхода одного сотрудника могли
+потерять одно списание, а сохранение расхода после записи ещё раз читало
+лист, чтобы узнать результат. Теперь изменения баланса одного
+сотрудника выполняются строго по очереди (asyncio.Lock по telegram_id),
+новый баланс возвращает сама операция, а записи балансов разных
+сотрудников за окно SHEETS_WRITE_BATCH_WINDOW уходят одним batch_update.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config.settings import SHEETS_WRITE_BATCH_WINDOW
+from utils.bulk_parse import parse_amount_strict
+from utils.employee_index import EMPLOYEES_SHEET, fetch_employee_row
+from utils.sheets_gateway import run_sheets
+
+logger = logging.getLogger(__name__)
+
+# Колонка баланса (H), нумерация с 1
+BALANCE_COLUMN = 8
+
+# Баланс, равный ожидаемому с этой точностью, считается уже записанным
+BALANCE_EPSILON = 0.005
+
+# Число блокировок: сотрудник получает блокировку по telegram_id % LOCK_STRIPES
+LOCK_STRIPES = 256
+
+
+class EmployeeNotFound(LookupError):
+    """Сотрудника нет в листе "Сотрудники"."""
+
+
+def parse_balance(row: list) -> float:
+    """
+    Баланс из строки листа "Сотрудники" (пустая ячейка — 0).
+
+    Raises:
+        ValueError: если в ячейке не число
+    """
+    return parse_amount_strict(row[7]) if len(row) > 7 and row[7].strip() else 0.0
+
+
+def _read_balance(telegram_id: int) -> Tuple[int, float]:
+    """Номер строки и актуальный баланс сотрудника (блокирующая часть)."""
+    from utils.google_sheets import get_worksheet
+
+    found = fetch_employee_row(get_worksheet(EMPLOYEES_SHEET), telegram_id)
+    if not found:
+        raise EmployeeNotFound(f"Сотрудник {telegram_id} не найден")
+    row_number, row = found
+    return row_number, parse_balance(row)
+
+
+def _write_balances(balances: Dict[int, float]):
+    """Записать балансы нескольких строк одним запросом (блокирующая часть)."""
+    from utils.google_sheets import get_worksheet, patch_rows
+    from utils.sheets_cache import invalidate_sheet_values
+
+    patch_rows(
+        get_worksheet(EMPLOYEES_SHEET),
+        {row_number: {BALANCE_COLUMN: str(balance)} for row_number, balance in balances.items()},
+    )
+    invalidate_sheet_values(EMPLOYEES_SHEET)
+
+
+class BalanceService:
+    """
+    Последовательные изменения баланса по сотруднику и пакетная запись колонки.
+
+    Работает в event loop бота; запросы к Sheets идут через run_sheets.
+    Перед каждой записью ячейка баланса перечитывается под блокировкой
+    сотрудника, поэтому правка баланса вручную в таблице не затирается.
+    Блокировок не больше LOCK_STRIPES: сотрудники с одинаковым остатком
+    telegram_id % LOCK_STRIPES изменяются по очереди.
+    """
+
+    def __init__(self, window: float):
+        self._window = window
+        self._locks: Dict[int, asyncio.Lock] = {}  # telegram_id % LOCK_STRIPES -> блокировка
+        self._pending: Dict[int, Tuple[float, asyncio.Future]] = {}  # строка -> (баланс, future)
+        self._timer: Optional[asyncio.Task] = None
+
+    async def apply(
+        self,
+        telegram_id: int,
+        delta: float,
+        expected_after: Optional[float] = None,
+        before_write: Optional[Callable[[float], Awaitable[None]]] = None,
+    ) -> float:
+        """
+        Изменить баланс сотрудника на delta и дождаться записи.
+
+        Args:
+            telegram_id: ID сотрудника
+            delta: Изменение (расход — отрицательное)
+            expected_after: Баланс, который должна была дать прошлая попытка
+                            этой же операции; если он уже такой, запись не нужна
+            before_write: Вызывается с новым балансом перед записью
+                          (например, чтобы сохранить его в журнал)
+
+        Returns:
+            float: Новый баланс
+
+        Raises:
+            EmployeeNotFound: если сотрудника нет
+            Exception: ошибка чтения или записи в Sheets
+        """
+        async with self._lock_for(telegram_id):
+            row_number, current = await self._current(telegram_id)
+            if expected_after is not None and abs(current - expected_after) < BALANCE_EPSILON:
+                return current
+
+            new_balance = current + delta
+            if before_write:
+                await before_write(new_balance)
+
+            await self._commit(telegram_id, row_number, current, new_balance)
+            return new_balance
+
+    async def reset(self, telegram_id: int, balance: float) -> float:
+        """
+        Записать баланс сотрудника целиком (исправление расхождения).
+
+        Returns:
+            float: Записанный баланс
+        """
+        async with self._lock_for(telegram_id):
+            row_number, current = await self._current(telegram_id)
+            await self._commit(telegram_id, row_number, current, balance)
+            return balance
+
+    async def flush(self):
+        """Немедленно записать накопленные балансы (при остановке бота)."""
+        if self._timer and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        await self._flush()
+
+    def _lock_for(self, telegram_id: int) -> asyncio.Lock:
+        stripe = telegram_id % LOCK_STRIPES
+        lock = self._locks.get(stripe)
+        if lock is None:
+            lock = self._locks[stripe] = asyncio.Lock()
+        return lock
+
+    async def _commit(self, telegram_id: int, row_number: int, current: float, new_balance: float):
+        await self._write(row_number, new_balance)
+        logger.info(f"✅ Баланс сотрудника {telegram_id} обновлен: {current} -> {new_balance}")
+
+    async def _current(self, telegram_id: int) -> Tuple[int, float]:
+        """Номер строки и баланс, перечитанный из таблицы (одна строка)."""
+        return await run_sheets(_read_balance, telegram_id)
+
+    async def _write(self, row_number: int, balance: float):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[row_number] = (balance, future)
+        if self._timer is None:
+            self._timer = loop.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self._window)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        try:
+            await run_sheets(_write_balances, {row: balance for row, (balance, _) in batch.items()})
+        except Exception as e:
+            logger.error(f"❌ Не удалось записать балансы ({len(batch)}): {e}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch.values():
+            if not future.done():
+                future.set_result(None)
+        logger.info(f"✅ Балансы записаны одним запросом: {len(batch)}")
+
+
+_service = BalanceService(SHEETS_WRITE_BATCH_WINDOW)
+
+
+async def change_balance(telegram_id: int, delta: float, **kwargs) -> float:
+    """Изменить баланс сотрудника через общий сервис (см. BalanceService.apply)."""
+    return await _service.apply(telegram_id, delta, **kwargs)
+
+
+async def set_balance(telegram_id: int, balance: float) -> float:
+    """Записать баланс сотрудника целиком через общий сервис (см. BalanceService.reset)."""
+    return await _service.reset(telegram_id, balance)
+
+
+async def flush_balance_writes():
+    """Дописать накопленные балансы (при завершении бота)."""
+    await _service.flush()
@@ -0,0 +1,181 @@
+"""
+Разбор дат и сумм из ячеек Google Sheets.
+
+Ячейки приходят строками в том виде, в каком их показывает таблица после
+записи с USER_ENTERED: "17.10.2026 09:15:00", "1500", "1 500,00".
+Раньше каждая строка разбиралась через strptime и float(), а ошибки
+глушились голым except. Здесь даты разбираются быстрым путём: день
+по префиксу "ДД.ММ.ГГГГ" берётся из кэша (в листе расходов дней намного
+меньше, чем строк), время — срезами строки; суммы тоже кэшируются.
+parse_rows разбирает колонки целиком и возвращает номера отклонённых строк.
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Пробелы, которыми таблица разделяет разряды (включая неразрывные)
+_GROUP_SEPARATORS = re.compile(r"\s")
+
+# Сколько различных значений помнить
+DAY_CACHE_SIZE = 8192
+TIME_CACHE_SIZE = 86400
+AMOUNT_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=DAY_CACHE_SIZE)
+def parse_day(value: str) -> Optional[datetime]:
+    """
+    День из "ДД.ММ.ГГГГ" (время после пробела игнорируется).
+
+    Returns:
+        datetime (полночь) или None, если дата не разбирается
+    """
+    prefix = value.strip().split(" ", 1)[0]
+    try:
+        return datetime.strptime(prefix, "%d.%m.%Y")
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def _time_offset(value: str) -> Optional[timedelta]:
+    """Смещение от полуночи для "ЧЧ:ММ:СС" или None."""
+    if len(value) != 8 or value[2] != ":" or value[5] != ":":
+        return None
+    try:
+        hours, minutes, seconds = int(value[:2]), int(value[3:5]), int(value[6:])
+    except ValueError:
+        return None
+    if hours > 23 or minutes > 59 or seconds > 59:
+        return None
+    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+
+def parse_datetime(value: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    День и время из "ДД.ММ.ГГГГ ЧЧ:ММ:СС".
+
+    Returns:
+        (день, дата_время); если время не разбирается, дата_время = день,
+        если не разбирается день — (None, None)
+    """
+    # Быстрый путь: формат, в котором бот пишет дату
+    if len(value) == 19 and value[10] == " ":
+        day = parse_day(value[:10])
+        if day is not None:
+            offset = _time_offset(value[11:])
+            return day, day + offset if offset is not None else day
+
+    day = parse_day(value)
+    if day is None:
+        return None, None
+
+    parts = value.split()
+    if len(parts) > 1:
+        for time_format in ("%H:%M:%S", "%H:%M"):
+            try:
+                moment = datetime.strptime(parts[1], time_format)
+            except ValueError:
+                continue
+            return day, day.replace(hour=moment.hour, minute=moment.minute, second=moment.second)
+    return day, day
+
+
+@lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def parse_amount(value: str) -> Optional[float]:
+    """
+    Сумма из ячейки: "1500", "1500.5", "1 500,00", "1,500.00".
+
+    Returns:
+        float или None, если ячейка пустая или не разбирается
+    """
+    text = _GROUP_SEPARATORS.sub("", value)
+    if not text:
+        return None
+
+    comma = text.rfind(",")
+    dot = text.rfind(".")
+    if comma >= 0 and dot >= 0:
+        # Десятичный разделитель — тот, что правее
+        if comma > dot:
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif comma >= 0:
+        text = text.replace(",", ".") if text.count(",") == 1 else text.replace(",", "")
+
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_amount_strict(value: str) -> float:
+    """
+    Как parse_amount, но для строки, которая обязана содержать сумму.
+
+    Raises:
+        ValueError: если сумма не разбирается
+    """
+    amount = parse_amount(value)
+    if amount is None:
+        raise ValueError(f"Не удалось разобрать сумму: {value!r}")
+    return amount
+
+
+def parse_rows(
+    rows: List[List[str]],
+    date_col: int,
+    amount_col: int,
+) -> Tuple[List[tuple], List[int]]:
+    """
+    Разобрать колонки даты и суммы у всех строк за один проход.
+
+    Пустая сумма считается нулём; пустая дата — отсутствием даты
+    (такие строки не отклоняются).
+
+    Returns:
+        ([(день, дата_время, сумма), ...], [индексы отклонённых строк])
+    """
+    parsed = []
+    rejected = []
+    append = parsed.append
+    # Локальные имена и встроенный быстрый путь parse_datetime — это
+    # основной цикл при полной перечитке листа
+    day_of = parse_day
+    offset_of = _time_offset
+    amount_of = parse_amount
+    min_size = max(date_col, amount_col) + 1
+    for i, row in enumerate(rows):
+        if len(row) >= min_size:
+            date_str = row[date_col]
+            amount_str = row[amount_col]
+        else:
+            date_str = row[date_col] if len(row) > date_col else ""
+            amount_str = row[amount_col] if len(row) > amount_col else ""
+
+        day = timestamp = None
+        if date_str:
+            if len(date_str) == 19 and date_str[10] == " ":
+                day = day_of(date_str[:10])
+                offset = offset_of(date_str[11:])
+                timestamp = day + offset if day is not None and offset is not None else day
+            if day is None:
+                day, timestamp = parse_datetime(date_str)
+
+        amount = amount_of(amount_str) if amount_str else 0.0
+
+        if (date_str and day is None) or amount is None:
+            rejected.append(i)
+        append((day, timestamp, amount))
+    return parsed, rejected
+
+
+def format_row_numbers(numbers: List[int], limit: int = 20) -> str:
+    """Номера строк для лога: первые limit и сколько ещё."""
+    shown = ", ".join(str(n) for n in numbers[:limit])
+    if len(numbers) > limit:
+        shown += f" и ещё {len(numbers) - limit}"
+    return shown
+
@@ -7,6 +7,7 @@ from typing import List
 from aiogram.types import Message
 
 from utils.google_sheets import get_employees_from_sheet
+from utils.sheets_gateway import run_sheets
 
 
 # Константы ролей
@@ -52,7 +53,7 @@ def role_required(required_roles: List[str]):
         @wraps(handler)
         async def wrapper(message: Message, *args, **kwargs):
             user_id = message.from_user.id
-            user_role = get_user_role(user_id)
+            user_role = await run_sheets(get_user_role, user_id)
             
             if not has_role(user_role, required_roles):
                 await message.answer(
@@ -80,7 +81,7 @@ def min_access_level(level: int):
         @wraps(handler)
         async def wrapper(message: Message, *args, **kwargs):
             user_id = message.from_user.id
-            user_role = get_user_role(user_id)
+            user_role = await run_sheets(get_user_role, user_id)
             user_level = ACCESS_LEVELS.get(user_role, 0)
             
             if user_level < level:
@@ -0,0 +1,87 @@
+"""
+Индекс Telegram ID -> номер строки листа "Сотрудники".
+
+Раньше каждая точечная операция (баланс, лимит, подписки) скачивала весь
+лист и искала сотрудника перебором, а block_employee использовал
+sheet.find, который ищет по всем ячейкам и мог найти число в чужой
+колонке. Индекс строится по колонке ID из снимка листа (utils.sheets_cache)
+и перестраивается вместе со снимком, когда лист меняется.
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEES_SHEET = "Сотрудники"
+
+_lock = threading.Lock()
+_indexed_rows: Optional[List[List[str]]] = None  # снимок, по которому построен индекс
+_index: Dict[str, int] = {}
+
+
+def _get_index() -> Tuple[List[List[str]], Dict[str, int]]:
+    """Снимок листа и индекс по нему (индекс перестраивается при смене снимка)."""
+    from utils.sheets_cache import get_sheet_values
+
+    global _indexed_rows, _index
+
+    rows = get_sheet_values(EMPLOYEES_SHEET)
+    with _lock:
+        if rows is not _indexed_rows:
+            index = {}
+            for row_number, row in enumerate(rows[1:], start=2):
+                if row and row[0]:
+                    index.setdefault(row[0].strip(), row_number)
+            _indexed_rows, _index = rows, index
+            logger.debug(f"🔄 Индекс сотрудников перестроен: {len(index)} записей")
+        return _indexed_rows, _index
+
+
+def find_employee_row(telegram_id: int) -> Optional[int]:
+    """
+    Номер строки сотрудника в листе.
+
+    Returns:
+        int или None, если сотрудника нет
+    """
+    _, index = _get_index()
+    return index.get(str(telegram_id))
+
+
+def get_employee_row(telegram_id: int) -> Optional[List[str]]:
+    """
+    Строка сотрудника из снимка листа (для чтения).
+
+    Возвращаемый список общий для всех вызывающих — не изменяйте его.
+    """
+    rows, index = _get_index()
+    row_number = index.get(str(telegram_id))
+    return rows[row_number - 1] if row_number else None
+
+
+def fetch_employee_row(sheet, telegram_id: int) -> Optional[Tuple[int, List[str]]]:
+    """
+    Прочитать из Sheets актуальную строку сотрудника (для изменения).
+
+    Читается только одна строка. Если в ней оказался другой сотрудник
+    (строки переставили вручную), снимок сбрасывается и поиск повторяется.
+
+    Returns:
+        (номер_строки, значения) или None, если сотрудника нет
+    """
+    from utils.sheets_cache import invalidate_sheet_values
+
+    for attempt in range(2):
+        row_number = find_employee_row(telegram_id)
+        if row_number is None:
+            return None
+
+        row = sheet.row_values(row_number)
+        if row and row[0].strip() == str(telegram_id):
+            return row_number, row
+
+        logger.info(f"🔄 Строка {row_number} больше не принадлежит {telegram_id}, перестраиваем индекс")
+        invalidate_sheet_values(EMPLOYEES_SHEET)
+
+    return None
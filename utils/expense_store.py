@@ -0,0 +1,484 @@
+"""
+Типизированное хранилище листа "Расходы" в памяти.
+
+Раньше каждый отчёт заново скачивал весь лист и для каждой строки заново
+делал strptime по дате и float() по сумме. Здесь лист хранится колонками
+с уже разобранными значениями, а при обновлении разбираются только
+изменившиеся и новые строки.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import SHEETS_CACHE_TTL, SHEETS_FULL_RELOAD_INTERVAL
+from utils.bulk_parse import format_row_numbers, parse_rows
+
+logger = logging.getLogger(__name__)
+
+# Колонки листа "Расходы"
+COL_FIRST_NAME = 0
+COL_LAST_NAME = 1
+COL_DATETIME = 2
+COL_AMOUNT = 3
+COL_CATEGORY = 4
+COL_OBJECT = 5
+COL_FILE_ID = 6
+COL_PROJECT_ID = 7
+COL_COMPENSATION_STATUS = 8
+COL_OPERATION_TYPE = 9
+COL_TELEGRAM_ID = 10
+
+# Последняя колонка листа для чтения хвоста диапазоном
+LAST_COLUMN = "K"
+
+
+def _parse_rows(title: str, rows: List[List[str]], positions: List[int]) -> List[tuple]:
+    """
+    Разобрать строки листа (rows[k] — строка на позиции positions[k]).
+
+    Returns:
+        [(день, дата_время, сумма), ...] — None там, где значение не разбирается
+    """
+    parsed, rejected = parse_rows(rows, COL_DATETIME, COL_AMOUNT)
+    if rejected:
+        numbers = [positions[k] + 2 for k in rejected]
+        logger.warning(
+            f"⚠️ Лист '{title}': не разобраны дата или сумма в строках {format_row_numbers(numbers)}"
+        )
+    return parsed
+
+
+def _extended(index: Dict[object, List[int]], items: Iterable[tuple]) -> Dict[object, List[int]]:
+    """
+    Копия индекса {ключ: позиции} с добавленными (ключ, позиция).
+
+    Списки копируются только у затронутых ключей — прежний индекс не меняется.
+    """
+    result = dict(index)
+    copied = set()
+    for key, position in items:
+        if key not in copied:
+            result[key] = list(result.get(key, ()))
+            copied.add(key)
+        result[key].append(position)
+    return result
+
+
+def _cell(row: List[str], col: int) -> str:
+    return row[col] if len(row) > col else ""
+
+
+def _trim(row: List[str]) -> List[str]:
+    """Отбросить пустые ячейки в конце строки (API их не возвращает)."""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+class ExpenseTable:
+    """
+    Неизменяемый снимок листа "Расходы" в виде колонок.
+
+    Позиция i соответствует строке листа i + 2 (строка 1 — заголовок).
+    Строки сотрудника находятся по индексу telegram_id -> позиции; строки
+    без telegram_id (ещё не заполненные backfill_expense_telegram_ids) —
+    по индексу (Имя, Фамилия). Строки проекта — по индексу project_id.
+    Запросы за период ищут границы бинарным поиском по позициям,
+    упорядоченным по дню (всей таблицы, сотрудника или проекта).
+    Индексы строятся при первом обращении; дочитанная таблица продолжает
+    индексы прежней, а не строит их заново.
+    """
+
+    def __init__(self, rows: List[List[str]], parsed: List[tuple], base: Optional["ExpenseTable"] = None):
+        self.rows = rows
+        self.days: List[Optional[datetime]] = [p[0] for p in parsed]
+        self.timestamps: List[Optional[datetime]] = [p[1] for p in parsed]
+        self.amounts: List[Optional[float]] = [p[2] for p in parsed]
+        self.first_names = [_cell(r, COL_FIRST_NAME) for r in rows]
+        self.last_names = [_cell(r, COL_LAST_NAME) for r in rows]
+        self.categories = [_cell(r, COL_CATEGORY) for r in rows]
+        self.objects = [_cell(r, COL_OBJECT) for r in rows]
+        self.project_ids = [_cell(r, COL_PROJECT_ID) for r in rows]
+        self.compensation_statuses = [_cell(r, COL_COMPENSATION_STATUS) for r in rows]
+        self.operation_types = [_cell(r, COL_OPERATION_TYPE) for r in rows]
+        self.telegram_ids = [_cell(r, COL_TELEGRAM_ID).strip() for r in rows]
+        self._parsed = parsed
+        self._index_lock = threading.Lock()
+        self._by_owner: Optional[Dict[object, List[int]]] = None  # telegram_id / (Имя, Фамилия)
+        self._by_project: Optional[Dict[str, List[int]]] = None
+        self._time_all: Optional[Tuple[List[datetime], List[int]]] = None
+        self._time_sub: Dict[tuple, Tuple[List[datetime], List[int]]] = {}
+        if base is not None:
+            self._extend_index(base)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def row_number(position: int) -> int:
+        """Номер строки в листе для позиции в таблице."""
+        return position + 2
+
+    def appended_since(self, older: Optional["ExpenseTable"]) -> Optional[int]:
+        """
+        Позиция, с которой начинаются строки, дописанные после снимка older.
+
+        Returns:
+            int или None, если лист с тех пор перечитывался (строки могли
+            измениться) — тогда итоги нужно пересчитать целиком
+        """
+        if older is None or not len(older) or len(self) < len(older):
+            return None
+        # Дочитанная таблица переиспользует объекты строк прежней
+        if self.rows[len(older) - 1] is not older.rows[-1]:
+            return None
+        return len(older)
+
+    def _owner_key(self, i: int):
+        """Ключ строки в индексе сотрудников: telegram_id, а без него — (Имя, Фамилия)."""
+        return self.telegram_ids[i] or (self.first_names[i], self.last_names[i])
+
+    def _extend_index(self, base: "ExpenseTable"):
+        """Продолжить индексы прежней таблицы новыми строками."""
+        new = range(len(base), len(self))
+        if base._by_owner is not None:
+            self._by_owner = _extended(base._by_owner, ((self._owner_key(i), i) for i in new))
+            self._by_project = _extended(base._by_project, ((self.project_ids[i], i) for i in new))
+
+        if base._time_all is not None:
+            days, positions = base._time_all
+            added = [(self.days[i], i) for i in new if self.days[i] is not None]
+            # Обычно строки дописываются по времени; иначе индекс построится заново
+            if all(a[0] <= b[0] for a, b in zip(added, added[1:])) and (
+                not added or not days or days[-1] <= added[0][0]
+            ):
+                self._time_all = (days + [d for d, _ in added], positions + [i for _, i in added])
+
+    def _groups(self) -> Tuple[Dict[object, List[int]], Dict[str, List[int]]]:
+        """Индексы сотрудник -> позиции и проект -> позиции."""
+        if self._by_owner is None:
+            with self._index_lock:
+                if self._by_owner is None:
+                    by_owner: Dict[object, List[int]] = {}
+                    by_project: Dict[str, List[int]] = {}
+                    for i in range(len(self.rows)):
+                        by_owner.setdefault(self._owner_key(i), []).append(i)
+                        by_project.setdefault(self.project_ids[i], []).append(i)
+                    self._by_project = by_project
+                    self._by_owner = by_owner
+        return self._by_owner, self._by_project
+
+    def employee_positions(self, telegram_id: int, name: Optional[Tuple[str, str]] = None) -> List[int]:
+        """
+        Позиции строк сотрудника в порядке листа.
+
+        Args:
+            telegram_id: ID сотрудника
+            name: (Имя, Фамилия) — чтобы учесть строки без telegram_id
+        """
+        by_owner, _ = self._groups()
+        positions = by_owner.get(str(telegram_id), [])
+        legacy = by_owner.get(name, []) if name is not None else []
+        if legacy:
+            positions = sorted(positions + legacy)
+        return positions
+
+    def project_positions(self, project_id: str) -> List[int]:
+        """Позиции строк проекта в порядке листа."""
+        _, by_project = self._groups()
+        return by_project.get(project_id, [])
+
+    def positions_between(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        telegram_id: Optional[int] = None,
+        employee: Optional[Tuple[str, str]] = None,
+        project_id: Optional[str] = None,
+    ) -> List[int]:
+        """
+        Позиции строк, чей день попадает в [start, end], за O(log n + k).
+
+        С telegram_id (и employee для строк без telegram_id) поиск идёт по
+        индексу времени только этого сотрудника, с project_id — проекта.
+
+        Returns:
+            list: Позиции по возрастанию дня; строки без даты не попадают
+        """
+        if telegram_id is not None:
+            key = ("employee", str(telegram_id), employee)
+        elif project_id is not None:
+            key = ("project", project_id)
+        else:
+            key = None
+
+        days, positions = self._time_index(key)
+        lo = bisect_left(days, start) if start is not None else 0
+        hi = bisect_right(days, end) if end is not None else len(days)
+        return positions[lo:hi]
+
+    def _time_index(self, key: Optional[tuple]) -> Tuple[List[datetime], List[int]]:
+        index = self._time_all if key is None else self._time_sub.get(key)
+        if index is not None:
+            return index
+
+        if key is None:
+            candidates: Iterable[int] = range(len(self.rows))
+        elif key[0] == "employee":
+            candidates = self.employee_positions(key[1], key[2])
+        else:
+            candidates = self.project_positions(key[1])
+
+        dated = sorted((self.days[i], i) for i in candidates if self.days[i] is not None)
+        index = ([day for day, _ in dated], [i for _, i in dated])
+        with self._index_lock:
+            if key is None:
+                self._time_all = index
+            else:
+                self._time_sub[key] = index
+        return index
+
+    def select(
+        self,
+        employee: Optional[Tuple[str, str]] = None,
+        project_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        statuses: Optional[Iterable[str]] = None,
+        exclude_statuses: Optional[Iterable[str]] = None,
+        min_columns: int = 7,
+        telegram_id: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Отобрать позиции строк по условиям.
+
+        Args:
+            employee: (Имя, Фамилия)
+            telegram_id: ID сотрудника; вместе с employee учитываются и строки
+                         без telegram_id с этими именем и фамилией
+            project_id: ID проекта
+            start, end: Границы периода (включительно) по дню расхода;
+                        строки с неразобранной датой при этом отбрасываются
+            statuses: Допустимые статусы компенсации
+            exclude_statuses: Исключаемые статусы компенсации
+            min_columns: Минимальное число заполненных колонок в строке
+
+        Returns:
+            list: Позиции строк в порядке листа
+        """
+        statuses = set(statuses) if statuses is not None else None
+        exclude_statuses = set(exclude_statuses) if exclude_statuses is not None else None
+        check_period = start is not None or end is not None
+
+        if check_period:
+            candidates = sorted(self.positions_between(start, end, telegram_id, employee, project_id))
+        elif telegram_id is not None:
+            candidates = self.employee_positions(telegram_id, employee)
+        elif project_id is not None:
+            candidates = self.project_positions(project_id)
+        else:
+            candidates = range(len(self.rows))
+        if telegram_id is not None:
+            employee = None
+
+        positions = []
+        for i in candidates:
+            row = self.rows[i]
+            if len(row) < min_columns:
+                continue
+            if employee is not None and (self.first_names[i], self.last_names[i]) != employee:
+                continue
+            if project_id is not None and self.project_ids[i] != project_id:
+                continue
+            if check_period:
+                day = self.days[i]
+                if day is None:
+                    continue
+                if start is not None and day < start:
+                    continue
+                if end is not None and day > end:
+                    continue
+            if statuses is not None and self.compensation_statuses[i] not in statuses:
+                continue
+            if exclude_statuses is not None and self.compensation_statuses[i] in exclude_statuses:
+                continue
+            positions.append(i)
+        return positions
+
+    def total(self, positions: Iterable[int]) -> float:
+        """Сумма расходов по позициям (неразобранные суммы пропускаются)."""
+        amounts = self.amounts
+        return sum(amounts[i] for i in positions if amounts[i] is not None)
+
+    def group_sum(self, positions: Iterable[int], column: List[str]) -> Dict[str, float]:
+        """
+        Сумма расходов по значениям колонки.
+
+        Example:
+            table.group_sum(positions, table.categories)
+        """
+        amounts = self.amounts
+        result: Dict[str, float] = {}
+        for i in positions:
+            if amounts[i] is not None:
+                result[column[i]] = result.get(column[i], 0.0) + amounts[i]
+        return result
+
+    def group_count(self, positions: Iterable[int], column: List[str]) -> Dict[str, int]:
+        """Количество строк по значениям колонки."""
+        result: Dict[str, int] = {}
+        for i in positions:
+            result[column[i]] = result.get(column[i], 0) + 1
+        return result
+
+
+class ExpenseStore:
+    """
+    Держит актуальный ExpenseTable и обновляет его инкрементально.
+
+    Таблица обновляется, если прошло больше SHEETS_CACHE_TTL секунд
+    или процесс сам записал что-то в лист (mark_stale). Обычно лист только
+    дописывается, поэтому при обновлении читается лишь хвост начиная с
+    последней известной строки. Если эта строка изменилась (правка или
+    удаление вручную), а также раз в SHEETS_FULL_RELOAD_INTERVAL секунд
+    лист перечитывается целиком.
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        self._lock = threading.Lock()
+        self._table = ExpenseTable([], [])
+        self._loaded_at: Optional[float] = None
+        self._full_loaded_at: Optional[float] = None
+        self._stale = True
+        self._needs_full_reload = True
+
+    def mark_stale(self, full_reload: bool = False):
+        """
+        Пометить таблицу устаревшей (после записи в лист).
+
+        Args:
+            full_reload: True, если изменялись существующие строки,
+                         а не только дописывались новые
+        """
+        if full_reload:
+            self._needs_full_reload = True
+        self._stale = True
+
+    def get_table(self) -> ExpenseTable:
+        """Получить актуальную таблицу, при необходимости обновив её."""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not self._stale
+                and self._loaded_at is not None
+                and now - self._loaded_at < SHEETS_CACHE_TTL
+            ):
+                return self._table
+
+            from utils.google_sheets import get_worksheet
+
+            full_reload = (
+                self._needs_full_reload
+                or not self._table.rows
+                or self._full_loaded_at is None
+                or now - self._full_loaded_at >= SHEETS_FULL_RELOAD_INTERVAL
+            )
+            self._stale = False
+            self._needs_full_reload = False
+
+            try:
+                sheet = get_worksheet(self.title)
+                table = None if full_reload else self._sync_tail(sheet)
+                if table is None:
+                    table = self._build(sheet.get_all_values()[1:])
+                    self._full_loaded_at = now
+            except Exception:
+                self._stale = True
+                self._needs_full_reload = self._needs_full_reload or full_reload
+                raise
+
+            self._table = table
+            self._loaded_at = now
+            return self._table
+
+    def _sync_tail(self, sheet) -> Optional[ExpenseTable]:
+        """
+        Дочитать новые строки, начиная с последней известной.
+
+        Returns:
+            ExpenseTable или None, если нужна полная перечитка
+        """
+        old = self._table
+        known = len(old.rows)
+
+        # Последняя известная строка листа читается повторно как контрольная
+        tail = sheet.get_values(f"A{known + 1}:{LAST_COLUMN}")
+        if not tail or _trim(tail[0]) != _trim(old.rows[-1]):
+            logger.info(f"🔄 Лист '{self.title}' изменён вручную, перечитываем целиком")
+            return None
+
+        new_rows = tail[1:]
+        if not new_rows:
+            return old
+
+        width = len(old.rows[-1])
+        new_rows = [row + [""] * (width - len(row)) for row in new_rows]
+        logger.debug(f"🔄 Лист '{self.title}': дочитано {len(new_rows)} новых строк")
+        return ExpenseTable(
+            old.rows + new_rows,
+            old._parsed + _parse_rows(self.title, new_rows, list(range(known, known + len(new_rows)))),
+            base=old,
+        )
+
+    def _build(self, rows: List[List[str]]) -> ExpenseTable:
+        """Собрать новую таблицу, разбирая только изменившиеся строки."""
+        old = self._table
+        parsed = []
+        changed = []
+        for i, row in enumerate(rows):
+            if i < len(old.rows) and old.rows[i] == row:
+                parsed.append(old._parsed[i])
+            else:
+                parsed.append(None)
+                changed.append(i)
+
+        for i, item in zip(changed, _parse_rows(self.title, [rows[i] for i in changed], changed)):
+            parsed[i] = item
+
+        logger.debug(f"🔄 Лист '{self.title}': {len(rows)} строк, разобрано заново {len(changed)}")
+        return ExpenseTable(rows, parsed)
+
+
+_store: Optional[ExpenseStore] = None
+_store_lock = threading.Lock()
+
+
+def get_expense_store() -> ExpenseStore:
+    """Получить общее хранилище листа "Расходы"."""
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            from utils.sheets_extended import SHEET_EXPENSES
+            _store = ExpenseStore(SHEET_EXPENSES)
+        return _store
+
+
+def get_expense_table() -> ExpenseTable:
+    """Получить актуальный снимок листа "Расходы" (блокирующий вызов)."""
+    return get_expense_store().get_table()
+
+
+def mark_expenses_stale(full_reload: bool = False):
+    """
+    Сообщить хранилищу, что лист "Расходы" изменён этим процессом.
+
+    Args:
+        full_reload: True, если изменялись существующие строки
+    """
+    get_expense_store().mark_stale(full_reload)
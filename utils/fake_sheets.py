@@ -0,0 +1,288 @@
+"""
+Имитация Google Sheets в памяти процесса для нагрузочных замеров (FAKE_SHEETS=1).
+
+Реализует ту часть gspread, которой пользуется бот: open_by_key, worksheet,
+worksheets, add_worksheet, sheet1 и у листа get_all_values, get_values,
+row_values, col_values, cell, find, append_row(s), update, update_cell,
+batch_update. Каждый вызов получает задержку, может завершиться 429,
+учитывается в поминутных квотах чтения и записи и попадает в счётчики.
+Так производительность любой подсистемы можно измерить без реальных квот.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+import gspread
+
+from config.settings import (
+    FAKE_SHEETS_LATENCY_MS,
+    FAKE_SHEETS_JITTER_MS,
+    FAKE_SHEETS_ERROR_RATE,
+    FAKE_SHEETS_READS_PER_MINUTE,
+    FAKE_SHEETS_WRITES_PER_MINUTE,
+    FAKE_SHEETS_SEED,
+)
+from utils.local_storage import LocalCell, LocalWorksheet
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+
+class _FakeResponse:
+    """Ответ API, из которого gspread.exceptions.APIError берёт код и текст ошибки."""
+
+    def __init__(self, code: int, message: str):
+        self.status_code = code
+        self._error = {"error": {"code": code, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+        self.text = json.dumps(self._error)
+
+    def json(self) -> dict:
+        return self._error
+
+
+class FakeSheetsStats:
+    """Счётчики вызовов и поминутные окна квот."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._windows = {READ: deque(), WRITE: deque()}
+
+    def acquire(self, method: str, kind: str) -> Optional[str]:
+        """
+        Учесть вызов.
+
+        Returns:
+            str: Причина отказа (429) или None
+        """
+        limit = FAKE_SHEETS_READS_PER_MINUTE if kind == READ else FAKE_SHEETS_WRITES_PER_MINUTE
+        now = time.monotonic()
+        with self._lock:
+            self.calls[method] += 1
+            self.calls[kind] += 1
+
+            window = self._windows[kind]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if limit and len(window) >= limit:
+                self.errors[kind] += 1
+                return f"Quota exceeded for quota metric '{kind} requests' per minute"
+            if FAKE_SHEETS_ERROR_RATE and random.random() < FAKE_SHEETS_ERROR_RATE:
+                self.errors[kind] += 1
+                return "Injected rate limit error"
+            window.append(now)
+            return None
+
+    def snapshot(self) -> dict:
+        """Текущие значения счётчиков."""
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'errors': dict(self.errors),
+                'reads_last_minute': len(self._windows[READ]),
+                'writes_last_minute': len(self._windows[WRITE]),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            for window in self._windows.values():
+                window.clear()
+
+
+_stats = FakeSheetsStats()
+
+
+def _api_call(method: str, kind: str):
+    """Задержка, квоты и счётчики одного вызова API."""
+    delay = FAKE_SHEETS_LATENCY_MS + random.uniform(-FAKE_SHEETS_JITTER_MS, FAKE_SHEETS_JITTER_MS)
+    if delay > 0:
+        time.sleep(delay / 1000)
+
+    reason = _stats.acquire(method, kind)
+    if reason:
+        raise gspread.exceptions.APIError(_FakeResponse(429, reason))
+
+
+class _MemoryStorage:
+    """Данные листов в памяти; тот же интерфейс, что у LocalStorage, без зеркалирования."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sheets: Dict[str, List[List[str]]] = {}
+
+    def create(self, title: str, rows: List[List[str]] = None):
+        with self._lock:
+            self._sheets.setdefault(title, [list(row) for row in rows or []])
+
+    def titles(self) -> List[str]:
+        with self._lock:
+            return list(self._sheets)
+
+    def read_rows(self, title: str, first_row: int = 1, last_row: Optional[int] = None) -> List[List[str]]:
+        with self._lock:
+            rows = self._sheets[title]
+            return [list(row) for row in rows[first_row - 1:last_row]]
+
+    def find(self, title: str, query: str, in_column: Optional[int] = None) -> Optional[LocalCell]:
+        with self._lock:
+            for row_number, row in enumerate(self._sheets[title], start=1):
+                if in_column is not None:
+                    if len(row) >= in_column and row[in_column - 1] == query:
+                        return LocalCell(row_number, in_column, query)
+                elif query in row:
+                    return LocalCell(row_number, row.index(query) + 1, query)
+        return None
+
+    def append_rows(self, title: str, rows: List[List[str]]):
+        with self._lock:
+            self._sheets[title].extend(list(row) for row in rows)
+
+    def update_cells(self, title: str, cells: dict):
+        with self._lock:
+            rows = self._sheets[title]
+            for (row_number, col), value in cells.items():
+                while len(rows) < row_number:
+                    rows.append([])
+                row = rows[row_number - 1]
+                if len(row) < col:
+                    row.extend([""] * (col - len(row)))
+                row[col - 1] = value
+
+
+class FakeWorksheet(LocalWorksheet):
+    """Лист имитации: поведение LocalWorksheet плюс задержка, квоты и счётчики."""
+
+    def get_all_values(self, **kwargs):
+        _api_call("get_all_values", READ)
+        return super().get_all_values()
+
+    def get_values(self, range_name: str = None, **kwargs):
+        _api_call("get_values", READ)
+        if range_name is None:
+            return LocalWorksheet.get_all_values(self)
+        return super().get_values(range_name)
+
+    def row_values(self, row: int, **kwargs):
+        _api_call("row_values", READ)
+        return super().row_values(row)
+
+    def col_values(self, col: int, **kwargs):
+        _api_call("col_values", READ)
+        return super().col_values(col)
+
+    def cell(self, row: int, col: int, **kwargs):
+        _api_call("cell", READ)
+        values = LocalWorksheet.row_values(self, row)
+        return LocalCell(row, col, values[col - 1] if len(values) >= col else None)
+
+    def find(self, query: str, **kwargs):
+        _api_call("find", READ)
+        return super().find(query, **kwargs)
+
+    def append_row(self, values: list, **kwargs):
+        _api_call("append_row", WRITE)
+        LocalWorksheet.append_rows(self, [values])
+
+    def append_rows(self, values: List[list], **kwargs):
+        _api_call("append_rows", WRITE)
+        super().append_rows(values)
+
+    def batch_update(self, data: List[dict], **kwargs):
+        _api_call("batch_update", WRITE)
+        super().batch_update(data)
+
+    def update(self, range_name, values=None, **kwargs):
+        _api_call("update", WRITE)
+        LocalWorksheet.batch_update(self, [{'range': range_name, 'values': values}])
+
+    def update_cell(self, row: int, col: int, value):
+        _api_call("update_cell", WRITE)
+        super().update_cell(row, col, value)
+
+
+class FakeSpreadsheet:
+    """Таблица имитации."""
+
+    def __init__(self, key: str):
+        self.id = key
+        self._storage = _MemoryStorage()
+        self._worksheets: Dict[str, FakeWorksheet] = {}
+
+    def _sheet(self, title: str) -> FakeWorksheet:
+        return self._worksheets.setdefault(title, FakeWorksheet(self._storage, title))
+
+    def seed(self, data: Dict[str, List[List[str]]]):
+        """Заполнить листы начальными данными (без учёта в счётчиках)."""
+        for title, rows in data.items():
+            self._storage.create(title, rows)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        _api_call("worksheet", READ)
+        if title not in self._storage.titles():
+            raise gspread.WorksheetNotFound(title)
+        return self._sheet(title)
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        _api_call("worksheets", READ)
+        return [self._sheet(title) for title in self._storage.titles()]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        _api_call("add_worksheet", WRITE)
+        self._storage.create(title)
+        return self._sheet(title)
+
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        _api_call("sheet1", READ)
+        titles = self._storage.titles()
+        if not titles:
+            self._storage.create("Лист1")
+            titles = self._storage.titles()
+        return self._sheet(titles[0])
+
+
+def _load_seed(value: str) -> Dict[str, List[List[str]]]:
+    """Начальные данные из FAKE_SHEETS_SEED: JSON прямо в значении или путь к JSON-файлу."""
+    if value.lstrip().startswith("{"):
+        return json.loads(value)
+    with open(value, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeSheetsClient:
+    """Клиент имитации: вместо gspread.authorize(...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spreadsheets: Dict[str, FakeSpreadsheet] = {}
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        _api_call("open_by_key", READ)
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(key)
+            if spreadsheet is None:
+                spreadsheet = FakeSpreadsheet(key)
+                if FAKE_SHEETS_SEED:
+                    spreadsheet.seed(_load_seed(FAKE_SHEETS_SEED))
+                    logger.info("✅ Имитация Google Sheets заполнена начальными данными")
+                self._spreadsheets[key] = spreadsheet
+            return spreadsheet
+
+
+def get_fake_sheets_stats() -> dict:
+    """Счётчики вызовов имитации: {'calls': {...}, 'errors': {...}, ...}."""
+    return _stats.snapshot()
+
+
+def reset_fake_sheets_stats():
+    """Обнулить счётчики и окна квот имитации."""
+    _stats.reset()
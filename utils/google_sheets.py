@@ -1,52 +1,287 @@
 """Google Sheets integration utilities."""
 from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 import gspread
 import json
 import os
 import logging
+import threading
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
-from config.settings import SPREADSHEET_ID
+from config.settings import SPREADSHEET_ID, STORAGE_BACKEND, FAKE_SHEETS
+from utils.sheets_cache import get_sheet_values, invalidate_sheet_values
+from utils.employee_index import fetch_employee_row
+from utils.expense_store import get_expense_table
+from utils.local_storage import (
+    get_local_worksheet,
+    list_local_worksheets,
+    add_local_worksheet,
+)
+from utils.sheets_gateway import run_sheets
+from utils.sheets_limiter import READ, WRITE, LimitedWorksheet, limited_call
+from utils.sheets_write_queue import enqueue_append
 
 logger = logging.getLogger(__name__)
 
-def get_sheets_client():
+# ============ РЕЕСТР КЛИЕНТА (ДОБАВЛЕНО) ============
+# Клиент, таблица и листы создаются один раз на процесс и переиспользуются.
+# Раньше каждый вызов заново читал credentials, делал gspread.authorize,
+# open_by_key и worksheet() — 3-4 лишних HTTP-запроса на одно действие.
+# Листы отдаются обёрнутыми в LimitedWorksheet: каждый запрос к ним
+# проходит через ограничитель квоты (utils.sheets_limiter).
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+# За сколько до истечения токена обновлять его заранее
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+_registry_lock = threading.RLock()
+_credentials = None
+_client = None
+_spreadsheet = None
+_worksheets: Dict[str, "gspread.Worksheet"] = {}
+_first_worksheet = None
+
+
+def _load_credentials() -> Credentials:
     """
-    Получить авторизованный клиент Google Sheets.
+    Прочитать credentials сервисного аккаунта.
     Поддерживает авторизацию через JSON из переменной окружения или файл.
     """
+    # Приоритет 1: JSON из переменной окружения (для Bothost)
+    credentials_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON")
+    
+    if credentials_json:
+        logger.info("✅ Используется GOOGLE_SHEETS_CREDENTIALS_JSON из переменной окружения")
+        try:
+            creds_dict = json.loads(credentials_json)
+            return Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Ошибка парсинга JSON credentials: {e}")
+            raise
+    
+    # Приоритет 2: Файл (для локальной разработки)
+    credentials_file = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "service_account.json")
+    
+    if os.path.exists(credentials_file):
+        logger.info(f"✅ Используется файл credentials: {credentials_file}")
+        return Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    
+    logger.error("❌ Не найдены credentials (ни JSON, ни файл)")
+    raise ValueError("Google Sheets credentials не найдены")
+
+
+def _refresh_token_if_needed():
+    """Обновить access token заранее, не дожидаясь 401 от API."""
+    if _credentials is None:
+        return
+    
+    expiry = _credentials.expiry  # naive UTC
+    if _credentials.token and expiry and expiry - datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+        return
+    
     try:
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-        
-        # Приоритет 1: JSON из переменной окружения (для Bothost)
-        credentials_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON")
-        
-        if credentials_json:
-            logger.info("✅ Используется GOOGLE_SHEETS_CREDENTIALS_JSON из переменной окружения")
-            try:
-                creds_dict = json.loads(credentials_json)
-                credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-                return gspread.authorize(credentials)
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ Ошибка парсинга JSON credentials: {e}")
-                raise
-        
-        # Приоритет 2: Файл (для локальной разработки)
-        credentials_file = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "service_account.json")
-        
-        if os.path.exists(credentials_file):
-            logger.info(f"✅ Используется файл credentials: {credentials_file}")
-            credentials = Credentials.from_service_account_file(credentials_file, scopes=scopes)
-            return gspread.authorize(credentials)
-        
-        logger.error("❌ Не найдены credentials (ни JSON, ни файл)")
-        raise ValueError("Google Sheets credentials не найдены")
-        
+        _credentials.refresh(Request())
+        logger.info("🔄 Токен Google Sheets обновлён")
     except Exception as e:
-        logger.error(f"❌ Ошибка авторизации Google Sheets: {type(e).__name__}: {e}")
-        raise
+        # AuthorizedSession всё равно попробует обновить токен при запросе
+        logger.warning(f"⚠️ Не удалось заранее обновить токен: {e}")
+
+
+def get_sheets_client():
+    """
+    Получить авторизованный клиент Google Sheets.
+    Клиент создаётся один раз на процесс, токен обновляется до истечения.
+    """
+    global _credentials, _client
+    
+    with _registry_lock:
+        try:
+            if _client is None:
+                if FAKE_SHEETS:
+                    from utils.fake_sheets import FakeSheetsClient
+                    _client = FakeSheetsClient()
+                    logger.warning("⚠️ Используется имитация Google Sheets (FAKE_SHEETS)")
+                    return _client
+                _credentials = _load_credentials()
+                _client = gspread.authorize(_credentials)
+                logger.info("✅ Клиент Google Sheets авторизован")
+            
+            _refresh_token_if_needed()
+            return _client
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка авторизации Google Sheets: {type(e).__name__}: {e}")
+            raise
+
+
+def get_spreadsheet():
+    """Получить закэшированный объект таблицы SPREADSHEET_ID."""
+    global _spreadsheet
+    
+    with _registry_lock:
+        client = get_sheets_client()
+        if _spreadsheet is None:
+            _spreadsheet = limited_call(READ, "open_by_key", client.open_by_key, SPREADSHEET_ID)
+            logger.info(f"✅ Таблица открыта: {SPREADSHEET_ID}")
+        return _spreadsheet
+
+
+def get_worksheet(title: str):
+    """
+    Получить лист по названию из выбранного хранилища (STORAGE_BACKEND).
+    
+    Raises:
+        gspread.WorksheetNotFound: если листа нет
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return get_local_worksheet(title)
+    return get_remote_worksheet(title)
+
+
+def get_first_worksheet():
+    """Получить первый лист (аналог doc.sheet1) из выбранного хранилища."""
+    if STORAGE_BACKEND == "sqlite":
+        return list_local_worksheets()[0]
+    return get_first_remote_worksheet()
+
+
+def list_worksheets() -> list:
+    """Получить все листы выбранного хранилища."""
+    if STORAGE_BACKEND == "sqlite":
+        return list_local_worksheets()
+    return list_remote_worksheets()
+
+
+def add_worksheet(title: str, rows: int, cols: int):
+    """Создать лист в выбранном хранилище."""
+    if STORAGE_BACKEND == "sqlite":
+        return add_local_worksheet(title)
+    return add_remote_worksheet(title, rows, cols)
+
+
+def get_remote_worksheet(title: str):
+    """
+    Получить закэшированный лист Google Sheets по названию.
+    
+    Raises:
+        gspread.WorksheetNotFound: если листа нет
+    """
+    with _registry_lock:
+        sheet = _worksheets.get(title)
+        if sheet is None:
+            spreadsheet = get_spreadsheet()
+            sheet = LimitedWorksheet(limited_call(READ, "worksheet", spreadsheet.worksheet, title))
+            _worksheets[title] = sheet
+        return sheet
+
+
+def get_first_remote_worksheet():
+    """Получить закэшированный первый лист таблицы (аналог doc.sheet1)."""
+    global _first_worksheet
+    
+    with _registry_lock:
+        if _first_worksheet is None:
+            spreadsheet = get_spreadsheet()
+            _first_worksheet = LimitedWorksheet(
+                limited_call(READ, "sheet1", lambda: spreadsheet.sheet1)
+            )
+        return _first_worksheet
+
+
+def list_remote_worksheets() -> list:
+    """
+    Получить все листы таблицы одним запросом метаданных
+    и заодно заполнить ими кэш листов.
+    """
+    with _registry_lock:
+        spreadsheet = get_spreadsheet()
+        sheets = [LimitedWorksheet(sheet) for sheet in limited_call(READ, "worksheets", spreadsheet.worksheets)]
+        for sheet in sheets:
+            _worksheets[sheet.title] = sheet
+        return sheets
+
+
+def add_remote_worksheet(title: str, rows: int, cols: int):
+    """Создать лист Google Sheets и сразу положить его в кэш."""
+    with _registry_lock:
+        spreadsheet = get_spreadsheet()
+        sheet = LimitedWorksheet(limited_call(
+            WRITE, "add_worksheet", spreadsheet.add_worksheet, title=title, rows=rows, cols=cols
+        ))
+        _worksheets[title] = sheet
+        return sheet
+
+
+def invalidate_sheets_cache(title: Optional[str] = None):
+    """
+    Сбросить закэшированные объекты.
+    
+    Args:
+        title: Название листа. None — сбросить таблицу и все листы
+               (например, после переименования или удаления листов вручную).
+    """
+    global _spreadsheet, _first_worksheet
+    
+    with _registry_lock:
+        if title is None:
+            _spreadsheet = None
+            _first_worksheet = None
+            _worksheets.clear()
+            logger.info("🔄 Кэш таблицы и листов сброшен")
+        else:
+            _worksheets.pop(title, None)
+            _first_worksheet = None
+
+
+# ============ ТОЧЕЧНАЯ ЗАПИСЬ ЯЧЕЕК (ДОБАВЛЕНО) ============
+
+def patch_rows(sheet, patches: Dict[int, Dict[int, str]]):
+    """
+    Записать ячейки нескольких строк одним batch_update.
+    
+    Соседние колонки одной строки объединяются в один диапазон.
+    
+    Args:
+        sheet: Лист gspread
+        patches: {номер_строки: {номер_колонки: значение}}, нумерация с 1
+    
+    Example:
+        patch_rows(sheet, {2: {6: "5000", 7: "месяц"}, 5: {8: "-120.0"}})
+    """
+    data = []
+    for row, values in patches.items():
+        columns = sorted(values)
+        start = 0
+        while start < len(columns):
+            end = start
+            while end + 1 < len(columns) and columns[end + 1] == columns[end] + 1:
+                end += 1
+            first = gspread.utils.rowcol_to_a1(row, columns[start])
+            last = gspread.utils.rowcol_to_a1(row, columns[end])
+            data.append({
+                'range': first if first == last else f"{first}:{last}",
+                'values': [[values[col] for col in columns[start:end + 1]]],
+            })
+            start = end + 1
+    
+    if data:
+        sheet.batch_update(data, value_input_option="USER_ENTERED")
+
+
+def patch_row(sheet, row: int, values: Dict[int, str]):
+    """
+    Записать несколько ячеек одной строки одним запросом.
+    
+    Args:
+        sheet: Лист gspread
+        row: Номер строки (с 1)
+        values: {номер_колонки: значение}, нумерация с 1
+    """
+    patch_rows(sheet, {row: values})
 
 
 def get_employees_from_sheet() -> Dict[int, dict]:
@@ -57,28 +292,24 @@ def get_employees_from_sheet() -> Dict[int, dict]:
         dict: {telegram_id: {"first_name": "Имя", "last_name": "Фамилия", "status": "Активен", "role": "Админ"}}
     """
     try:
-        logger.info("🔄 Загрузка whitelist из Google Sheets...")
-        
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        logger.info(f"✅ Таблица открыта: {SPREADSHEET_ID}")
+        logger.debug("🔄 Загрузка whitelist из Google Sheets...")
         
         try:
-            sheet = doc.worksheet("Сотрудники")
-            logger.info("✅ Лист 'Сотрудники' найден")
+            values = get_sheet_values("Сотрудники")
         except gspread.WorksheetNotFound:
             logger.error("❌ Лист 'Сотрудники' не найден!")
-            logger.info(f"Доступные листы: {[ws.title for ws in doc.worksheets()]}")
+            logger.info(f"Доступные листы: {[ws.title for ws in list_worksheets()]}")
             
             # Создаём лист если его нет
-            sheet = doc.add_worksheet(title="Сотрудники", rows=100, cols=5)
+            sheet = add_worksheet("Сотрудники", rows=100, cols=5)
             sheet.update("A1:E1", [["ID", "Имя", "Фамилия", "Статус", "Роль"]])
+            invalidate_sheet_values("Сотрудники")
             logger.warning("⚠️ Лист 'Сотрудники' создан. Добавьте сотрудников вручную!")
             return {}
         
         # Читаем данные (пропускаем заголовок)
-        rows = sheet.get_all_values()[1:]
-        logger.info(f"✅ Прочитано {len(rows)} строк")
+        rows = values[1:]
+        logger.debug(f"✅ Прочитано {len(rows)} строк")
         
         employees = {}
         for idx, row in enumerate(rows, start=2):
@@ -96,14 +327,14 @@ def get_employees_from_sheet() -> Dict[int, dict]:
                 }
                 
                 employees[emp_id] = emp_data
-                logger.info(f"  ✅ {emp_id} - {emp_data['first_name']} {emp_data['last_name']} ({emp_data['role']}, {emp_data['status']})")
+                logger.debug(f"  ✅ {emp_id} - {emp_data['first_name']} {emp_data['last_name']} ({emp_data['role']}, {emp_data['status']})")
                 
             except (ValueError, IndexError) as e:
                 logger.warning(f"⚠️ Строка {idx} пропущена (ошибка парсинга): {row}, ошибка: {e}")
                 continue
         
-        logger.info(f"✅ Whitelist загружен: {len(employees)} пользователей")
-        logger.info(f"📋 ID пользователей: {list(employees.keys())}")
+        logger.debug(f"✅ Whitelist загружен: {len(employees)} пользователей")
+        logger.debug(f"📋 ID пользователей: {list(employees.keys())}")
         
         return employees
         
@@ -114,12 +345,11 @@ def get_employees_from_sheet() -> Dict[int, dict]:
         return {}
 
 
-def append_expense_row(data: list) -> bool:
+async def append_expense_row(data: list) -> bool:
     """Добавить строку расходов в первый лист таблицы."""
     try:
-        client = get_sheets_client()
-        sheet = client.open_by_key(SPREADSHEET_ID).sheet1
-        sheet.append_row(data, value_input_option="USER_ENTERED")
+        sheet = await run_sheets(get_first_worksheet)
+        await enqueue_append(sheet.title, data)
         logger.info(f"✅ Расход добавлен: {data}")
         return True
     except Exception as e:
@@ -130,22 +360,29 @@ def append_expense_row(data: list) -> bool:
 def get_all_expenses() -> Optional[List[List[str]]]:
     """Получить все расходы из первого листа."""
     try:
-        client = get_sheets_client()
-        sheet = client.open_by_key(SPREADSHEET_ID).sheet1
+        sheet = get_first_worksheet()
         return sheet.get_all_values()[1:]  # Пропускаем заголовок
     except Exception as e:
         logger.error(f"❌ Ошибка чтения расходов: {e}")
         return None
 
 
-def check_photo_ownership(file_id: str, first_name: str, last_name: str) -> bool:
-    """Проверить владельца фото по file_id."""
-    expenses = get_all_expenses()
-    if not expenses:
+def check_photo_ownership(file_id: str, telegram_id: int, first_name: str, last_name: str) -> bool:
+    """
+    Проверить владельца фото по file_id.
+    
+    Просматриваются только строки сотрудника (индекс по telegram_id);
+    имя и фамилия нужны для старых строк без telegram_id.
+    """
+    try:
+        table = get_expense_table()
+    except Exception as e:
+        logger.error(f"❌ Ошибка чтения расходов: {e}")
         return False
     
-    for row in expenses:
-        if len(row) >= 7 and row[6] == file_id and row[0] == first_name and row[1] == last_name:
+    for i in table.employee_positions(telegram_id, (first_name, last_name)):
+        row = table.rows[i]
+        if len(row) >= 7 and row[6] == file_id:
             return True
     
     return False
@@ -154,16 +391,14 @@ def check_photo_ownership(file_id: str, first_name: str, last_name: str) -> bool
 def add_employee_to_sheet(telegram_id: int, first_name: str, last_name: str, role: str = "Сотрудник") -> bool:
     """Добавить сотрудника в лист 'Сотрудники'."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        
         try:
-            sheet = doc.worksheet("Сотрудники")
+            sheet = get_worksheet("Сотрудники")
         except gspread.WorksheetNotFound:
-            sheet = doc.add_worksheet(title="Сотрудники", rows=100, cols=5)
+            sheet = add_worksheet("Сотрудники", rows=100, cols=5)
             sheet.update("A1:E1", [["ID", "Имя", "Фамилия", "Статус", "Роль"]])
         
         sheet.append_row([str(telegram_id), first_name, last_name, "Активен", role], value_input_option="USER_ENTERED")
+        invalidate_sheet_values("Сотрудники")
         logger.info(f"✅ Сотрудник добавлен: {telegram_id} - {first_name} {last_name} ({role})")
         return True
         
@@ -175,13 +410,12 @@ def add_employee_to_sheet(telegram_id: int, first_name: str, last_name: str, rol
 def block_employee(telegram_id: int) -> bool:
     """Заблокировать сотрудника (установить статус 'Заблокирован')."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet("Сотрудники")
+        sheet = get_worksheet("Сотрудники")
         
-        cell = sheet.find(str(telegram_id))
-        if cell:
-            sheet.update_cell(cell.row, 4, "Заблокирован")
+        found = fetch_employee_row(sheet, telegram_id)
+        if found:
+            patch_row(sheet, found[0], {4: "Заблокирован"})
+            invalidate_sheet_values("Сотрудники")
             logger.info(f"✅ Сотрудник {telegram_id} заблокирован")
             return True
         
@@ -0,0 +1,468 @@
+"""
+Локальное хранилище листов на SQLite (STORAGE_BACKEND=sqlite).
+
+В этом режиме источник данных — локальная база: сотрудники, проекты,
+статьи, расходы, компенсации и подписки хранятся в тех же листах и с теми
+же колонками, что и в Google Sheets, поэтому весь остальной код работает
+без изменений через get_worksheet(). Каждое изменение в той же транзакции
+попадает в очередь зеркалирования, которую services/sheets_mirror.py
+переносит в таблицу для бухгалтерии.
+
+При первом запуске листы импортируются из Google Sheets. Лист, которого
+нет локально, создаётся пустым только после того, как Google подтвердил,
+что его нет и в таблице; сбой сети или квоты при импорте — ошибка, а не
+«листа нет». Правки, внесённые в таблицу вручную, обратно не импортируются.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import gspread
+
+from config.settings import LOCAL_STORAGE_PATH
+from utils.expense_store import COL_TELEGRAM_ID
+
+logger = logging.getLogger(__name__)
+
+_RANGE_RE = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+# Индексируемая колонка листа (нумерация с 1) — та, по которой ищут строки:
+# в "Расходы" это telegram_id, в остальных листах — ID в колонке A
+_KEY_COLUMNS = {"Расходы": COL_TELEGRAM_ID + 1}
+
+# Версия схемы базы (PRAGMA user_version): 1 — ключ по _KEY_COLUMNS
+_SCHEMA_VERSION = 1
+
+
+class LocalWorksheetNotFound(gspread.WorksheetNotFound):
+    """Листа нет ни в локальной базе, ни в Google Sheets."""
+
+
+def _column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def _parse_range(a1: str) -> Tuple[int, int, Optional[int], Optional[int]]:
+    """
+    Разобрать диапазон в нотации A1 ("F2", "F2:G2", "A5:J", "A1:O1").
+
+    Returns:
+        (первая_строка, первая_колонка, последняя_строка, последняя_колонка);
+        None — до конца листа
+    """
+    match = _RANGE_RE.match(a1.split("!")[-1].replace("$", ""))
+    if not match:
+        raise ValueError(f"Неподдерживаемый диапазон: {a1}")
+    col1, row1, col2, row2 = match.groups()
+    first_row = int(row1) if row1 else 1
+    first_col = _column_number(col1) if col1 else 1
+    if col2 is None and row2 is None:
+        return first_row, first_col, first_row, first_col
+    last_row = int(row2) if row2 else None
+    last_col = _column_number(col2) if col2 else None
+    return first_row, first_col, last_row, last_col
+
+
+def _key_column(title: str) -> int:
+    return _KEY_COLUMNS.get(title, 1)
+
+
+def _row_key(title: str, row: List[str]) -> str:
+    column = _key_column(title)
+    return row[column - 1].strip() if len(row) >= column else ""
+
+
+def _escape_like(text: str) -> str:
+    """Экранировать % и _ для LIKE ... ESCAPE '\\'."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _pad(rows: List[List[str]]) -> List[List[str]]:
+    """Дополнить строки до одинаковой ширины (как get_all_values в gspread)."""
+    width = max((len(row) for row in rows), default=0)
+    return [row + [""] * (width - len(row)) for row in rows]
+
+
+class LocalCell:
+    """Ячейка, совместимая с gspread.Cell в используемой части."""
+
+    def __init__(self, row: int, col: int, value: Optional[str]):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+class LocalWorksheet:
+    """
+    Лист локального хранилища с тем же набором методов gspread.Worksheet,
+    которым пользуется бот.
+    """
+
+    def __init__(self, storage: "LocalStorage", title: str):
+        self._storage = storage
+        self.title = title
+
+    # ---------- чтение ----------
+
+    def get_all_values(self) -> List[List[str]]:
+        return _pad(self._storage.read_rows(self.title))
+
+    def get_values(self, range_name: str = None, **kwargs) -> List[List[str]]:
+        if range_name is None:
+            return self.get_all_values()
+        first_row, first_col, last_row, last_col = _parse_range(range_name)
+        rows = self._storage.read_rows(self.title, first_row, last_row)
+        return _pad([row[first_col - 1:last_col] for row in rows])
+
+    def row_values(self, row: int, **kwargs) -> List[str]:
+        rows = self._storage.read_rows(self.title, row, row)
+        return _trim(rows[0]) if rows else []
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        values = [row[col - 1] if len(row) >= col else "" for row in self._storage.read_rows(self.title)]
+        return _trim(values)
+
+    def cell(self, row: int, col: int, **kwargs) -> LocalCell:
+        values = self.row_values(row)
+        return LocalCell(row, col, values[col - 1] if len(values) >= col else None)
+
+    def find(self, query: str, in_row: int = None, in_column: int = None, **kwargs) -> Optional[LocalCell]:
+        query = str(query)
+        if in_row is not None:
+            rows = self._storage.read_rows(self.title, in_row, in_row)
+            values = rows[0] if rows else []
+            return LocalCell(in_row, values.index(query) + 1, query) if query in values else None
+        return self._storage.find(self.title, query, in_column)
+
+    # ---------- запись ----------
+
+    def append_row(self, values: list, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, values: List[list], **kwargs):
+        self._storage.append_rows(self.title, [[_text(v) for v in row] for row in values])
+
+    def batch_update(self, data: List[dict], **kwargs):
+        cells = {}
+        for item in data:
+            first_row, first_col, _, _ = _parse_range(item['range'])
+            for r, row_values in enumerate(item['values']):
+                for c, value in enumerate(row_values):
+                    cells[(first_row + r, first_col + c)] = _text(value)
+        self._storage.update_cells(self.title, cells)
+
+    def update(self, range_name, values=None, **kwargs):
+        self.batch_update([{'range': range_name, 'values': values}])
+
+    def update_cell(self, row: int, col: int, value):
+        self._storage.update_cells(self.title, {(row, col): _text(value)})
+
+
+def _text(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _trim(values: List[str]) -> List[str]:
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    return values[:end]
+
+
+class LocalStorage:
+    """
+    База листов. Строка листа хранится как JSON-массив значений;
+    колонка поиска вынесена в индексируемое поле key (ID сотрудника,
+    проекта, запроса на компенсацию, telegram_id в "Расходы").
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS worksheets (
+                title TEXT PRIMARY KEY,
+                position INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sheet_rows (
+                title TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                key TEXT NOT NULL DEFAULT '',
+                data TEXT NOT NULL,
+                PRIMARY KEY (title, row_number)
+            );
+            CREATE INDEX IF NOT EXISTS sheet_rows_key ON sheet_rows (title, key);
+            CREATE TABLE IF NOT EXISTS storage_meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS mirror_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                op TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            self._rebuild_keys()
+
+    def _rebuild_keys(self):
+        """Пересчитать key у всех строк (в старых базах key — всегда колонка A)."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT title, row_number, data FROM sheet_rows").fetchall()
+            self._conn.executemany(
+                "UPDATE sheet_rows SET key = ? WHERE title = ? AND row_number = ?",
+                [(_row_key(title, json.loads(data)), title, row_number) for title, row_number, data in rows],
+            )
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    # ---------- листы ----------
+
+    def titles(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT title FROM worksheets ORDER BY position").fetchall()
+        return [row[0] for row in rows]
+
+    def is_imported(self) -> bool:
+        """Завершён ли первоначальный импорт листов из Google Sheets."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM storage_meta WHERE name = 'imported'"
+            ).fetchone() is not None
+
+    def mark_imported(self):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO storage_meta (name, value) VALUES ('imported', '1')")
+
+    def has_worksheet(self, title: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM worksheets WHERE title = ?", (title,)
+            ).fetchone() is not None
+
+    def create_worksheet(self, title: str, rows: List[List[str]] = None, mirror: bool = True):
+        """
+        Создать лист.
+
+        Args:
+            rows: Начальные данные (при импорте из Google Sheets)
+            mirror: Создать лист и в Google Sheets
+        """
+        with self._lock, self._conn:
+            position = self._conn.execute("SELECT COUNT(*) FROM worksheets").fetchone()[0]
+            self._conn.execute(
+                "INSERT OR IGNORE INTO worksheets (title, position) VALUES (?, ?)", (title, position)
+            )
+            if rows:
+                self._insert_rows(title, 1, rows)
+            if mirror:
+                self._enqueue(title, "add_worksheet", {})
+
+    # ---------- строки ----------
+
+    def read_rows(self, title: str, first_row: int = 1, last_row: Optional[int] = None) -> List[List[str]]:
+        """Строки листа с first_row по last_row включительно (пропуски — пустые строки)."""
+        with self._lock:
+            result = self._conn.execute(
+                "SELECT row_number, data FROM sheet_rows "
+                "WHERE title = ? AND row_number >= ? AND row_number <= ? ORDER BY row_number",
+                (title, first_row, last_row if last_row is not None else 2 ** 62),
+            ).fetchall()
+
+        rows = []
+        expected = first_row
+        for row_number, data in result:
+            rows.extend([] for _ in range(row_number - expected))
+            rows.append(json.loads(data))
+            expected = row_number + 1
+        return rows
+
+    def find(self, title: str, query: str, in_column: Optional[int] = None) -> Optional[LocalCell]:
+        """
+        Первая ячейка листа со значением query (по строкам, затем по колонкам).
+
+        Поиск в индексируемой колонке листа идёт по индексу, остальные —
+        перебором строк, в которых встречается значение.
+        """
+        with self._lock:
+            if in_column is not None and in_column == _key_column(title):
+                result = self._conn.execute(
+                    "SELECT row_number, data FROM sheet_rows WHERE title = ? AND key = ? ORDER BY row_number",
+                    (title, query.strip()),
+                ).fetchall()
+            else:
+                result = self._conn.execute(
+                    "SELECT row_number, data FROM sheet_rows "
+                    "WHERE title = ? AND data LIKE ? ESCAPE '\\' ORDER BY row_number",
+                    (title, f"%{_escape_like(json.dumps(query, ensure_ascii=False))}%"),
+                ).fetchall()
+        for row_number, data in result:
+            values = json.loads(data)
+            if in_column is not None:
+                if len(values) >= in_column and values[in_column - 1] == query:
+                    return LocalCell(row_number, in_column, query)
+            elif query in values:
+                return LocalCell(row_number, values.index(query) + 1, query)
+        return None
+
+    def append_rows(self, title: str, rows: List[List[str]]):
+        with self._lock, self._conn:
+            last = self._conn.execute(
+                "SELECT COALESCE(MAX(row_number), 0) FROM sheet_rows WHERE title = ?", (title,)
+            ).fetchone()[0]
+            self._insert_rows(title, last + 1, rows)
+            self._enqueue(title, "append", {'rows': rows})
+
+    def update_cells(self, title: str, cells: Dict[Tuple[int, int], str]):
+        """Записать ячейки {(строка, колонка): значение}."""
+        by_row: Dict[int, Dict[int, str]] = {}
+        for (row, col), value in cells.items():
+            by_row.setdefault(row, {})[col] = value
+
+        with self._lock, self._conn:
+            for row_number, values in by_row.items():
+                existing = self.read_rows(title, row_number, row_number)
+                row = existing[0] if existing else []
+                width = max(values)
+                row = row + [""] * (width - len(row))
+                for col, value in values.items():
+                    row[col - 1] = value
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sheet_rows (title, row_number, key, data) VALUES (?, ?, ?, ?)",
+                    (title, row_number, _row_key(title, row), json.dumps(row, ensure_ascii=False)),
+                )
+            self._enqueue(title, "update", {
+                'cells': [[row, col, value] for (row, col), value in cells.items()]
+            })
+
+    def _insert_rows(self, title: str, first_row: int, rows: List[List[str]]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sheet_rows (title, row_number, key, data) VALUES (?, ?, ?, ?)",
+            [
+                (title, first_row + i, _row_key(title, row), json.dumps(row, ensure_ascii=False))
+                for i, row in enumerate(rows)
+            ],
+        )
+
+    # ---------- очередь зеркалирования ----------
+
+    def _enqueue(self, title: str, op: str, payload: dict):
+        self._conn.execute(
+            "INSERT INTO mirror_outbox (title, op, payload) VALUES (?, ?, ?)",
+            (title, op, json.dumps(payload, ensure_ascii=False)),
+        )
+
+    def pending_mirror(self, limit: int = 500) -> List[Tuple[int, str, str, dict]]:
+        """Неперенесённые изменения: [(id, лист, операция, данные), ...]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, op, payload FROM mirror_outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    def ack_mirror(self, last_id: int):
+        """Удалить из очереди изменения до last_id включительно."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM mirror_outbox WHERE id <= ?", (last_id,))
+
+
+_storage: Optional[LocalStorage] = None
+_storage_lock = threading.Lock()
+_worksheets: Dict[str, LocalWorksheet] = {}
+
+
+def get_local_storage() -> LocalStorage:
+    """Получить локальное хранилище (база открывается при первом обращении)."""
+    global _storage
+
+    with _storage_lock:
+        if _storage is None:
+            _storage = LocalStorage(LOCAL_STORAGE_PATH)
+            logger.info(f"✅ Локальное хранилище открыто: {LOCAL_STORAGE_PATH}")
+        return _storage
+
+
+def _import_from_sheets(title: str) -> bool:
+    """
+    Импортировать лист из Google Sheets.
+
+    Лист и его строки появляются в базе одной транзакцией — только после
+    того, как лист целиком прочитан.
+
+    Returns:
+        bool: False, если Google подтвердил, что такого листа нет
+
+    Raises:
+        Exception: любая другая ошибка чтения (сеть, квота, 5xx)
+    """
+    from utils.google_sheets import get_remote_worksheet
+
+    try:
+        rows = get_remote_worksheet(title).get_all_values()
+    except gspread.WorksheetNotFound:
+        logger.info(f"ℹ️ Листа '{title}' нет в Google Sheets")
+        return False
+
+    get_local_storage().create_worksheet(title, rows, mirror=False)
+    logger.info(f"✅ Лист '{title}' импортирован из Google Sheets: {len(rows)} строк")
+    return True
+
+
+def get_local_worksheet(title: str) -> LocalWorksheet:
+    """
+    Получить лист локального хранилища.
+
+    Raises:
+        LocalWorksheetNotFound: если листа нет ни локально, ни в Google Sheets
+        Exception: если импортировать лист не удалось (сеть, квота, 5xx)
+    """
+    storage = get_local_storage()
+    with _storage_lock:
+        sheet = _worksheets.get(title)
+        if sheet is not None:
+            return sheet
+
+    if not storage.has_worksheet(title) and not _import_from_sheets(title):
+        raise LocalWorksheetNotFound(title)
+
+    with _storage_lock:
+        return _worksheets.setdefault(title, LocalWorksheet(storage, title))
+
+
+def list_local_worksheets() -> List[LocalWorksheet]:
+    """
+    Все листы хранилища; пока импорт не завершён, сначала импортируются
+    недостающие листы Google Sheets.
+
+    Raises:
+        Exception: если импортировать листы не удалось — иначе недостающие
+                   листы выглядели бы отсутствующими и создались бы пустыми
+    """
+    from utils.google_sheets import list_remote_worksheets
+
+    storage = get_local_storage()
+    if not storage.is_imported():
+        for remote in list_remote_worksheets():
+            if not storage.has_worksheet(remote.title) and not _import_from_sheets(remote.title):
+                raise LocalWorksheetNotFound(remote.title)
+        storage.mark_imported()
+        logger.info("✅ Импорт листов из Google Sheets завершён")
+
+    return [get_local_worksheet(title) for title in storage.titles()]
+
+
+def add_local_worksheet(title: str) -> LocalWorksheet:
+    """Создать лист локально (в Google Sheets он будет создан зеркалированием)."""
+    get_local_storage().create_worksheet(title)
+    return get_local_worksheet(title)
@@ -73,11 +73,8 @@ async def generate_expense_report(data: List[Dict], filename: str) -> Optional[s
                 column_letter = column[0].column_letter
                 
                 for cell in column:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
+                    if cell.value:
+                        max_length = max(max_length, len(str(cell.value)))
                 
                 adjusted_width = min(max_length + 2, 50)  # Максимум 50 символов
                 worksheet.column_dimensions[column_letter].width = adjusted_width
@@ -143,11 +140,8 @@ async def generate_project_report(
                     max_length = 0
                     column_letter = column[0].column_letter
                     for cell in column:
-                        try:
-                            if cell.value:
-                                max_length = max(max_length, len(str(cell.value)))
-                        except:
-                            pass
+                        if cell.value:
+                            max_length = max(max_length, len(str(cell.value)))
                     adjusted_width = min(max_length + 2, 50)
                     worksheet.column_dimensions[column_letter].width = adjusted_width
         
@@ -206,11 +200,8 @@ async def generate_balance_report(
                 max_length = 0
                 column_letter = column[0].column_letter
                 for cell in column:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
+                    if cell.value:
+                        max_length = max(max_length, len(str(cell.value)))
                 adjusted_width = min(max_length + 2, 50)
                 worksheet.column_dimensions[column_letter].width = adjusted_width
         
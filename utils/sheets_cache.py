@@ -0,0 +1,68 @@
+"""
+Кэш снимков небольших справочных листов.
+
+Листы "Сотрудники", "Проекты", "Статьи_расходов" и "Компенсации" читаются
+почти в каждом действии пользователя (в /add — дважды), а меняются редко.
+Снимок листа хранится в памяти SHEETS_CACHE_TTL секунд и сбрасывается
+сразу, когда этот процесс пишет в лист.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config.settings import SHEETS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_snapshots: Dict[str, tuple] = {}  # title -> (время загрузки, строки)
+_generations: Dict[str, int] = {}  # title -> номер поколения (растёт при сбросе)
+_global_generation = 0  # растёт при сбросе всех снимков
+
+
+def get_sheet_values(title: str) -> List[List[str]]:
+    """
+    Получить все значения листа (включая заголовок) из кэша или из Sheets.
+    
+    Возвращаемый список общий для всех вызывающих — не изменяйте его.
+    
+    Raises:
+        gspread.WorksheetNotFound: если листа нет
+    """
+    from utils.google_sheets import get_worksheet
+    
+    with _lock:
+        snapshot = _snapshots.get(title)
+        if snapshot and time.monotonic() - snapshot[0] < SHEETS_CACHE_TTL:
+            return snapshot[1]
+        generation = (_global_generation, _generations.get(title, 0))
+    
+    loaded_at = time.monotonic()
+    rows = get_worksheet(title).get_all_values()
+    
+    with _lock:
+        # Пока шло чтение, лист могли изменить — такой снимок не сохраняем
+        if (_global_generation, _generations.get(title, 0)) == generation:
+            _snapshots[title] = (loaded_at, rows)
+    
+    logger.debug(f"🔄 Снимок листа '{title}' загружен: {len(rows)} строк")
+    return rows
+
+
+def invalidate_sheet_values(title: Optional[str] = None):
+    """
+    Сбросить снимок листа после записи в него.
+    
+    Args:
+        title: Название листа. None — сбросить все снимки.
+    """
+    global _global_generation
+    
+    with _lock:
+        if title is None:
+            _snapshots.clear()
+            _global_generation += 1
+        else:
+            _snapshots.pop(title, None)
+            _generations[title] = _generations.get(title, 0) + 1
@@ -4,10 +4,27 @@
 """
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import logging
 
-from utils.google_sheets import get_sheets_client, get_employees_from_sheet
-from config.settings import SPREADSHEET_ID
+import gspread
+
+from utils.google_sheets import (
+    get_worksheet,
+    list_worksheets,
+    add_worksheet,
+    get_employees_from_sheet,
+    patch_row,
+)
+from utils.sheets_cache import get_sheet_values, invalidate_sheet_values
+from utils.employee_index import fetch_employee_row, get_employee_row
+from utils.balance_service import EmployeeNotFound, change_balance, parse_balance
+from utils.bulk_parse import parse_amount, parse_amount_strict, parse_day
+from utils.expense_store import COL_TELEGRAM_ID, get_expense_table, mark_expenses_stale
+from utils.spend_totals import get_spent_for_period, period_start
+from utils.sheets_gateway import run_sheets, sheets_async
+from utils.sheets_write_queue import enqueue_append, register_batch_preparer
+from utils.write_journal import get_journal, journal_append
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +38,7 @@ __all__ = [
     'SHEET_COMPENSATIONS',
     'get_active_projects',
     'get_all_projects',
+    'get_project_index',
     'add_project',
     'update_project_status',
     'get_expense_categories',
@@ -33,15 +51,17 @@ __all__ = [
     'get_employees_from_sheet',
     # ДОБАВЛЕНО: функции балансов и компенсаций
     'update_employee_balance',
+    'apply_balance_operation',
     'get_employee_balance',
     'check_negative_balance',
-    'process_expense_with_balance',
+    'record_expense',
     'create_compensation_request',
     'get_compensation_requests',
     'update_compensation_status',
     'get_expenses_by_status',
     'get_employee_expenses',
     'get_expenses_by_employee_and_period',
+    'get_employee_period_reports',
     'get_all_employee_balances',
     'get_negative_balances',
     'add_advance_payment',
@@ -65,17 +85,25 @@ SHEET_PROJECTS = "Проекты"
 SHEET_CATEGORIES = "Статьи_расходов"
 SHEET_COMPENSATIONS = "Компенсации"  # ДОБАВЛЕНО: новый лист для компенсаций
 
+# Типы записей локального журнала: сохранение расхода и аванс
+JOURNAL_EXPENSE = "expense"
+JOURNAL_ADVANCE = "advance"
+
+# Сколько ждать баланс для ответа пользователю при сохранении (секунды)
+BALANCE_PEEK_TIMEOUT = 3
+
+# Сколько строк "Расходы" заполнять telegram_id за один batch_update
+BACKFILL_BATCH_ROWS = 1000
+
 
 def ensure_sheets_exist():
     """Проверить и создать необходимые листы при запуске."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        existing_sheets = [ws.title for ws in doc.worksheets()]
+        existing_sheets = [ws.title for ws in list_worksheets()]
         
         # Лист "Сотрудники" (расширенный)
         if SHEET_EMPLOYEES not in existing_sheets:
-            sheet = doc.add_worksheet(title=SHEET_EMPLOYEES, rows=100, cols=15)
+            sheet = add_worksheet(SHEET_EMPLOYEES, rows=100, cols=15)
             sheet.update("A1:O1", [[
                 "ID", "Имя", "Фамилия", "Статус", "Роль", 
                 "Лимит", "Период_лимита", "Баланс",
@@ -88,7 +116,7 @@ def ensure_sheets_exist():
         
         # Лист "Проекты"
         if SHEET_PROJECTS not in existing_sheets:
-            sheet = doc.add_worksheet(title=SHEET_PROJECTS, rows=100, cols=6)
+            sheet = add_worksheet(SHEET_PROJECTS, rows=100, cols=6)
             sheet.update("A1:F1", [[
                 "ID", "Название", "Статус", "Бюджет", "Дата_начала", "Дата_окончания"
             ]])
@@ -96,7 +124,7 @@ def ensure_sheets_exist():
         
         # Лист "Статьи_расходов"
         if SHEET_CATEGORIES not in existing_sheets:
-            sheet = doc.add_worksheet(title=SHEET_CATEGORIES, rows=100, cols=3)
+            sheet = add_worksheet(SHEET_CATEGORIES, rows=100, cols=3)
             sheet.update("A1:C1", [[
                 "ID", "Название", "Родительская_категория"
             ]])
@@ -113,22 +141,24 @@ def ensure_sheets_exist():
         
         # Проверяем/обновляем лист "Расходы"
         if SHEET_EXPENSES not in existing_sheets:
-            sheet = doc.add_worksheet(title=SHEET_EXPENSES, rows=1000, cols=10)
-            sheet.update("A1:J1", [[
+            sheet = add_worksheet(SHEET_EXPENSES, rows=1000, cols=11)
+            sheet.update("A1:K1", [[
                 "Имя", "Фамилия", "Дата_время", "Сумма", "Статья_расходов",
-                "Объект", "File_ID_чека", "project_id", "Статус_компенсации", "Тип_операции"
+                "Объект", "File_ID_чека", "project_id", "Статус_компенсации", "Тип_операции",
+                "telegram_id"
             ]])
             logger.info(f"✅ Создан лист '{SHEET_EXPENSES}'")
         
         # ДОБАВЛЕНО: Лист "Компенсации"
         if SHEET_COMPENSATIONS not in existing_sheets:
-            sheet = doc.add_worksheet(title=SHEET_COMPENSATIONS, rows=1000, cols=8)
+            sheet = add_worksheet(SHEET_COMPENSATIONS, rows=1000, cols=8)
             sheet.update("A1:H1", [[
                 "ID", "Сотрудник_ID", "Сумма", "Тип", "Статус", 
                 "Дата_запроса", "Дата_выплаты", "Комментарий"
             ]])
             logger.info(f"✅ Создан лист '{SHEET_COMPENSATIONS}'")
         
+        invalidate_sheet_values()
         return True
     except Exception as e:
         logger.error(f"❌ Ошибка создания листов: {e}")
@@ -140,10 +170,7 @@ def ensure_sheets_exist():
 def get_active_projects() -> List[Dict]:
     """Получить список активных проектов."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_PROJECTS)
-        rows = sheet.get_all_values()[1:]  # Пропускаем заголовок
+        rows = get_sheet_values(SHEET_PROJECTS)[1:]  # Пропускаем заголовок
         
         projects = []
         for row in rows:
@@ -165,10 +192,7 @@ def get_active_projects() -> List[Dict]:
 def get_all_projects() -> List[Dict]:
     """Получить все проекты."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_PROJECTS)
-        rows = sheet.get_all_values()[1:]
+        rows = get_sheet_values(SHEET_PROJECTS)[1:]
         
         projects = []
         for row in rows:
@@ -187,13 +211,19 @@ def get_all_projects() -> List[Dict]:
         return []
 
 
+def get_project_index() -> Dict[str, str]:
+    """
+    Получить индекс проектов {ID: название}.
+    Строится один раз на запрос вместо поиска по списку проектов на каждую строку.
+    """
+    return {p['id']: p['name'] for p in get_all_projects()}
+
+
 def add_project(name: str, status: str = "активный", budget: str = "", 
                 start_date: str = "", end_date: str = "") -> bool:
     """Добавить новый проект."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_PROJECTS)
+        sheet = get_worksheet(SHEET_PROJECTS)
         
         # Генерируем ID
         rows = sheet.get_all_values()
@@ -202,6 +232,7 @@ def add_project(name: str, status: str = "активный", budget: str = "",
         sheet.append_row([
             project_id, name, status, budget, start_date, end_date
         ], value_input_option="USER_ENTERED")
+        invalidate_sheet_values(SHEET_PROJECTS)
         
         logger.info(f"✅ Проект добавлен: {name} (ID: {project_id})")
         return True
@@ -213,15 +244,14 @@ def add_project(name: str, status: str = "активный", budget: str = "",
 def update_project_status(project_id: str, status: str) -> bool:
     """Обновить статус проекта."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_PROJECTS)
+        sheet = get_worksheet(SHEET_PROJECTS)
         
         # Ищем проект по ID
         rows = sheet.get_all_values()
         for idx, row in enumerate(rows[1:], start=2):
             if row[0] == project_id:
-                sheet.update_cell(idx, 3, status)
+                patch_row(sheet, idx, {3: status})
+                invalidate_sheet_values(SHEET_PROJECTS)
                 logger.info(f"✅ Статус проекта {project_id} изменен на {status}")
                 return True
         
@@ -237,10 +267,7 @@ def update_project_status(project_id: str, status: str) -> bool:
 def get_expense_categories() -> List[Dict]:
     """Получить список статей расходов."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_CATEGORIES)
-        rows = sheet.get_all_values()[1:]
+        rows = get_sheet_values(SHEET_CATEGORIES)[1:]
         
         categories = []
         for row in rows:
@@ -259,14 +286,13 @@ def get_expense_categories() -> List[Dict]:
 def add_expense_category(name: str, parent: str = "") -> bool:
     """Добавить новую статью расходов."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_CATEGORIES)
+        sheet = get_worksheet(SHEET_CATEGORIES)
         
         rows = sheet.get_all_values()
         category_id = str(len(rows))
         
         sheet.append_row([category_id, name, parent], value_input_option="USER_ENTERED")
+        invalidate_sheet_values(SHEET_CATEGORIES)
         logger.info(f"✅ Категория добавлена: {name}")
         return True
     except Exception as e:
@@ -284,16 +310,11 @@ def get_employee_limit(telegram_id: int) -> Tuple[float, str]:
         (лимит, период) - период: день/неделя/месяц
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
-        
-        rows = sheet.get_all_values()[1:]
-        for row in rows:
-            if len(row) >= 1 and row[0] == str(telegram_id):
-                limit = float(row[5]) if len(row) > 5 and row[5] else 0.0
-                period = row[6] if len(row) > 6 and row[6] else "месяц"
-                return limit, period
+        row = get_employee_row(telegram_id)
+        if row is not None:
+            limit = (parse_amount(row[5]) or 0.0) if len(row) > 5 else 0.0
+            period = row[6] if len(row) > 6 and row[6] else "месяц"
+            return limit, period
         
         return 0.0, "месяц"
     except Exception as e:
@@ -304,17 +325,15 @@ def get_employee_limit(telegram_id: int) -> Tuple[float, str]:
 def set_employee_limit(telegram_id: int, limit: float, period: str = "месяц") -> bool:
     """Установить лимит сотруднику."""
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
+        sheet = get_worksheet(SHEET_EMPLOYEES)
         
-        rows = sheet.get_all_values()
-        for idx, row in enumerate(rows[1:], start=2):
-            if row[0] == str(telegram_id):
-                sheet.update_cell(idx, 6, str(limit))
-                sheet.update_cell(idx, 7, period)
-                logger.info(f"✅ Лимит для {telegram_id} установлен: {limit} ({period})")
-                return True
+        found = fetch_employee_row(sheet, telegram_id)
+        if found:
+            idx, _ = found
+            patch_row(sheet, idx, {6: str(limit), 7: period})
+            invalidate_sheet_values(SHEET_EMPLOYEES)
+            logger.info(f"✅ Лимит для {telegram_id} установлен: {limit} ({period})")
+            return True
         
         logger.warning(f"⚠️ Сотрудник {telegram_id} не найден")
         return False
@@ -331,27 +350,26 @@ def get_expenses_for_period(telegram_id: int, period: str) -> float:
         period: "день", "неделя", "месяц"
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        rows = sheet.get_all_values()[1:]
-        
-        # Определяем дату начала периода
-        now = datetime.now()
-        if period == "день":
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == "неделя":
-            start_date = now - timedelta(days=now.weekday())
-            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        else:  # месяц
-            start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        total = 0.0
-        for row in rows:
-            if len(row) >= 3:
-                # Проверяем имя и фамилию (колонки 0 и 1)
-                # Получаем имя сотрудника по ID
-                pass  # TODO: реализовать проверку по имени
+        row = get_employee_row(telegram_id)
+        if row is None or len(row) < 3:
+            return 0.0
+        
+        # Итоги по уже записанным строкам (utils/spend_totals.py)
+        total = get_spent_for_period(telegram_id, (row[1], row[2]), period)
+        
+        # Плюс расходы, которые ещё переносятся из журнала в Sheets
+        start_date = period_start(period)
+        for entry in get_journal().pending(1000):
+            payload = entry.payload
+            if (
+                entry.kind != JOURNAL_EXPENSE
+                or payload['user_id'] != telegram_id
+                or entry.state.get('expense_row_done')
+            ):
+                continue
+            day = parse_day(payload['row'][2]) if len(payload['row']) > 2 else None
+            if day is not None and day >= start_date:
+                total += payload['amount']
         
         return total
     except Exception as e:
@@ -387,11 +405,12 @@ def check_limit_status(telegram_id: int, new_amount: float) -> Tuple[bool, float
 
 # ============ РАСШИРЕННЫЕ РАСХОДЫ ============
 
-def append_expense_row_extended(
+async def append_expense_row_extended(
     data: List[str],
     project_id: str = "",
     compensation_status: str = "ожидает",
-    operation_type: str = "расход"
+    operation_type: str = "расход",
+    telegram_id: Optional[int] = None
 ) -> bool:
     """
     Добавить расход с расширенными полями.
@@ -401,13 +420,14 @@ def append_expense_row_extended(
         project_id: ID проекта
         compensation_status: ожидает/частично_оплачено/оплачено
         operation_type: расход/аванс/возврат
+        telegram_id: ID сотрудника (колонка K)
     """
     try:
-        client = get_sheets_client()
-        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(SHEET_EXPENSES)
-        
-        extended_data = data + [project_id, compensation_status, operation_type]
-        sheet.append_row(extended_data, value_input_option="USER_ENTERED")
+        extended_data = data + [
+            project_id, compensation_status, operation_type,
+            str(telegram_id) if telegram_id else ""
+        ]
+        await enqueue_append(SHEET_EXPENSES, extended_data)
         
         logger.info(f"✅ Расход добавлен (проект: {project_id}): {data}")
         return True
@@ -416,22 +436,17 @@ def append_expense_row_extended(
         return False
 # ============ СИСТЕМА БАЛАНСОВ (ДОБАВЛЕНО) ============
 
-async def get_employee_balance(telegram_id: int) -> float:
+@sheets_async
+def get_employee_balance(telegram_id: int) -> float:
     """
     Получить текущий баланс сотрудника.
     Баланс хранится в колонке H (индекс 7) листа "Сотрудники".
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
-        
-        rows = sheet.get_all_values()[1:]
-        for row in rows:
-            if len(row) >= 1 and row[0] == str(telegram_id):
-                # Баланс в колонке H (индекс 7)
-                balance = float(row[7]) if len(row) > 7 and row[7] else 0.0
-                return balance
+        row = get_employee_row(telegram_id)
+        if row is not None:
+            # Баланс в колонке H (индекс 7)
+            return parse_balance(row)
         
         return 0.0
     except Exception as e:
@@ -439,9 +454,12 @@ async def get_employee_balance(telegram_id: int) -> float:
         return 0.0
 
 
-async def update_employee_balance(telegram_id: int, amount: float, operation: str) -> bool:
+async def apply_balance_operation(telegram_id: int, amount: float, operation: str) -> Optional[float]:
     """
-    Обновить баланс сотрудника.
+    Изменить баланс сотрудника и вернуть новый.
+    
+    Операции одного сотрудника выполняются по очереди (utils/balance_service.py),
+    поэтому одновременные расходы не теряют списаний.
     
     Args:
         telegram_id: ID сотрудника
@@ -449,38 +467,39 @@ async def update_employee_balance(telegram_id: int, amount: float, operation: st
         operation: "expense" (уменьшить), "advance" (увеличить), "compensation" (увеличить)
     
     Returns:
-        bool: Успешно ли обновление
+        float: Новый баланс или None при ошибке
     """
+    if operation == "expense":
+        delta = -amount
+    elif operation in ["advance", "compensation"]:
+        delta = amount
+    else:
+        logger.error(f"❌ Неизвестная операция: {operation}")
+        return None
+    
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
-        
-        rows = sheet.get_all_values()
-        for idx, row in enumerate(rows[1:], start=2):
-            if row[0] == str(telegram_id):
-                # Получаем текущий баланс
-                current_balance = float(row[7]) if len(row) > 7 and row[7] else 0.0
-                
-                # Вычисляем новый баланс
-                if operation == "expense":
-                    new_balance = current_balance - amount
-                elif operation in ["advance", "compensation"]:
-                    new_balance = current_balance + amount
-                else:
-                    logger.error(f"❌ Неизвестная операция: {operation}")
-                    return False
-                
-                # Обновляем баланс в колонке H (8-я колонка)
-                sheet.update_cell(idx, 8, str(new_balance))
-                logger.info(f"✅ Баланс сотрудника {telegram_id} обновлен: {current_balance} -> {new_balance}")
-                return True
-        
+        return await change_balance(telegram_id, delta)
+    except EmployeeNotFound:
         logger.warning(f"⚠️ Сотрудник {telegram_id} не найден")
-        return False
+        return None
     except Exception as e:
         logger.error(f"❌ Ошибка обновления баланса: {e}")
-        return False
+        return None
+
+
+async def update_employee_balance(telegram_id: int, amount: float, operation: str) -> bool:
+    """
+    Обновить баланс сотрудника.
+    
+    Args:
+        telegram_id: ID сотрудника
+        amount: Сумма операции
+        operation: "expense" (уменьшить), "advance" (увеличить), "compensation" (увеличить)
+    
+    Returns:
+        bool: Успешно ли обновление
+    """
+    return await apply_balance_operation(telegram_id, amount, operation) is not None
 
 
 async def check_negative_balance(telegram_id: int) -> bool:
@@ -494,123 +513,117 @@ async def check_negative_balance(telegram_id: int) -> bool:
     return balance <= 0
 
 
-async def process_expense_with_balance(
-    user_id: int, 
-    amount: float, 
+def _read_employee_balance(telegram_id: int) -> Optional[float]:
+    """Баланс из снимка листа "Сотрудники"; в отличие от get_employee_balance, ошибки не скрываются."""
+    row = get_employee_row(telegram_id)
+    if row is None:
+        return None
+    return parse_balance(row)
+
+
+async def _projected_balance(user_id: int) -> Optional[float]:
+    """
+    Ожидаемый баланс с учётом ещё не перенесённых в Sheets расходов и авансов.
+    
+    Returns:
+        float или None, если баланс не удалось узнать за BALANCE_PEEK_TIMEOUT
+    """
+    try:
+        balance = await asyncio.wait_for(
+            run_sheets(_read_employee_balance, user_id), BALANCE_PEEK_TIMEOUT
+        )
+        entries = await asyncio.to_thread(get_journal().pending, 1000)
+    except Exception as e:
+        logger.warning(f"⚠️ Баланс {user_id} сейчас недоступен: {e}")
+        return None
+    
+    if balance is None:
+        return None
+    
+    for entry in entries:
+        payload = entry.payload
+        if payload['user_id'] != user_id or 'new_balance' in entry.state:
+            continue
+        if entry.kind == JOURNAL_EXPENSE:
+            balance -= payload['amount']
+        elif entry.kind == JOURNAL_ADVANCE:
+            balance += payload['amount']
+    return balance
+
+
+async def record_expense(
+    user_id: int,
+    amount: float,
     expense_data: list,
     project_id: str = "",
-    **kwargs
+    limit_status: str = "ok",
+    limit_percentage: float = 0.0
 ) -> dict:
     """
-    Process expense and update balance.
+    Зафиксировать расход в локальном журнале и сразу вернуть результат.
+    
+    Списание с баланса, строка в "Расходы" и автоматический запрос на
+    компенсацию переносятся в Sheets фоновым services/journal_replayer.py.
     
     Args:
         user_id: Telegram ID пользователя
         amount: Сумма расхода
-        expense_data: [Имя, Фамилия, Дата_время, Сумма, Статья_расходов, Объект, File_ID_чека]
+        expense_data: [Имя, Фамилия, Дата_время, Сумма, Статья, Объект, File_ID]
         project_id: ID проекта
+        limit_status, limit_percentage: Результат check_limit_status при вводе суммы
     
-    Returns: 
-        {'success': bool, 'new_balance': float, 'notification_needed': bool}
+    Returns:
+        dict: {'success', 'new_balance', 'notification_needed', 'limit_exceeded',
+               'limit_percentage', 'limit_status'}; new_balance — ожидаемый
+              баланс или None, если он сейчас недоступен
     """
     try:
-        # 1. Проверяем лимит (существующая функция)
-        limit_exceeded, percentage, status = check_limit_status(user_id, amount)
-        
-        # 2. Списываем с баланса
-        balance_updated = await update_employee_balance(user_id, amount, "expense")
-        if not balance_updated:
-            logger.error(f"❌ Не удалось обновить баланс для {user_id}")
-            return {'success': False, 'new_balance': 0.0, 'notification_needed': False}
-        
-        # 3. Получаем новый баланс
-        new_balance = await get_employee_balance(user_id)
-        
-        # 4. Проверяем необходимость уведомления (баланс <= 0)
-        notification_needed = new_balance <= 0
-        
-        # 5. Сохраняем расход
-        saved = append_expense_row_extended(
-            data=expense_data,
-            project_id=project_id,
-            compensation_status="ожидает" if notification_needed else "не_требуется",
-            operation_type="расход"
-        )
-        
-        if not saved:
-            # Откатываем баланс если не удалось сохранить
-            await update_employee_balance(user_id, amount, "advance")
-            return {'success': False, 'new_balance': new_balance, 'notification_needed': False}
-        
-        # 6. Если баланс <= 0, создаём запрос на компенсацию
-        if notification_needed:
-            await create_compensation_request(
-                employee_id=user_id,
-                amount=abs(new_balance),
-                request_type="автоматический",
-                comment=f"Автоматический запрос при отрицательном балансе после расхода {amount}"
-            )
-        
-        return {
-            'success': True, 
-            'new_balance': new_balance, 
-            'notification_needed': notification_needed,
-            'limit_exceeded': limit_exceeded,
-            'limit_percentage': percentage,
-            'limit_status': status
-        }
+        await journal_append(JOURNAL_EXPENSE, {
+            'user_id': user_id,
+            'amount': amount,
+            'row': expense_data,
+            'project_id': project_id,
+        })
     except Exception as e:
-        logger.error(f"❌ Ошибка обработки расхода с балансом: {e}")
+        logger.error(f"❌ Ошибка записи расхода в журнал: {e}")
         return {'success': False, 'new_balance': 0.0, 'notification_needed': False}
+    
+    new_balance = await _projected_balance(user_id)
+    return {
+        'success': True,
+        'new_balance': new_balance,
+        'notification_needed': new_balance is not None and new_balance <= 0,
+        'limit_exceeded': limit_status == "limit_exceeded",
+        'limit_percentage': limit_percentage,
+        'limit_status': limit_status
+    }
 
 
 async def add_advance_payment(telegram_id: int, amount: float, comment: str = "") -> bool:
     """
     Добавить аванс сотруднику (увеличить баланс).
     
+    Как и расход, аванс сначала фиксируется в локальном журнале;
+    пополнение баланса и строку "аванс" в "Расходы" переносит в Sheets
+    services/journal_replayer.py, поэтому баланс не может измениться
+    без строки операции.
+    
     Args:
         telegram_id: ID сотрудника
         amount: Сумма аванса
         comment: Комментарий
     
     Returns:
-        bool: Успешно ли добавление
+        bool: Принят ли аванс в журнал
     """
     try:
-        # Обновляем баланс
-        success = await update_employee_balance(telegram_id, amount, "advance")
-        if not success:
-            return False
-        
-        # Добавляем запись в расходы как операция типа "аванс"
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        
-        # Получаем данные сотрудника
-        employees = get_employees_from_sheet()
-        emp_data = employees.get(telegram_id, {})
-        first_name = emp_data.get("first_name", "")
-        last_name = emp_data.get("last_name", "")
-        
-        now = datetime.now()
-        timestamp = now.strftime("%d.%m.%Y %H:%M:%S")
-        
-        row = [
-            first_name,
-            last_name,
-            timestamp,
-            str(amount),
-            "Аванс",
-            comment or "Пополнение баланса",
-            "",
-            "",
-            "",
-            "аванс"
-        ]
-        
-        sheet.append_row(row, value_input_option="USER_ENTERED")
-        logger.info(f"✅ Аванс {amount} добавлен сотруднику {telegram_id}")
+        row = await run_sheets(_build_advance_row, telegram_id, amount, comment)
+        await journal_append(JOURNAL_ADVANCE, {
+            'user_id': telegram_id,
+            'amount': amount,
+            'row': row,
+        })
+        logger.info(f"✅ Аванс {amount} сотруднику {telegram_id} записан в журнал")
         return True
         
     except Exception as e:
@@ -618,7 +631,36 @@ async def add_advance_payment(telegram_id: int, amount: float, comment: str = ""
         return False
 
 
-async def get_all_employee_balances() -> list:
+def _build_advance_row(telegram_id: int, amount: float, comment: str = "") -> list:
+    """Собрать строку аванса для листа расходов (блокирующая часть add_advance_payment)."""
+    # Получаем данные сотрудника
+    employees = get_employees_from_sheet()
+    emp_data = employees.get(telegram_id, {})
+    first_name = emp_data.get("first_name", "")
+    last_name = emp_data.get("last_name", "")
+    
+    now = datetime.now()
+    timestamp = now.strftime("%d.%m.%Y %H:%M:%S")
+    
+    row = [
+        first_name,
+        last_name,
+        timestamp,
+        str(amount),
+        "Аванс",
+        comment or "Пополнение баланса",
+        "",
+        "",
+        "",
+        "аванс",
+        str(telegram_id)
+    ]
+    
+    return row
+
+
+@sheets_async
+def get_all_employee_balances() -> list:
     """
     Получить балансы всех сотрудников.
     
@@ -626,11 +668,7 @@ async def get_all_employee_balances() -> list:
         list: [{telegram_id, name, balance, role}, ...]
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
-        
-        rows = sheet.get_all_values()[1:]
+        rows = get_sheet_values(SHEET_EMPLOYEES)[1:]
         balances = []
         
         for row in rows:
@@ -640,7 +678,7 @@ async def get_all_employee_balances() -> list:
                     first_name = row[1] if len(row) > 1 else ""
                     last_name = row[2] if len(row) > 2 else ""
                     role = row[4] if len(row) > 4 else ""
-                    balance = float(row[7]) if len(row) > 7 and row[7] else 0.0
+                    balance = parse_balance(row)
                     
                     balances.append({
                         'telegram_id': telegram_id,
@@ -689,28 +727,11 @@ async def create_compensation_request(
         bool: Успешно ли создание
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_COMPENSATIONS)
-        
-        # Генерируем ID
-        rows = sheet.get_all_values()
-        comp_id = str(len(rows))
-        
         now = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        row = build_compensation_row(employee_id, amount, request_type, comment, now)
         
-        row = [
-            comp_id,
-            str(employee_id),
-            str(amount),
-            request_type,
-            "ожидает",
-            now,
-            "",  # Дата выплаты пока пустая
-            comment
-        ]
-        
-        sheet.append_row(row, value_input_option="USER_ENTERED")
+        written = await enqueue_append(SHEET_COMPENSATIONS, row)
+        comp_id = written[0]
         logger.info(f"✅ Создан запрос на компенсацию {comp_id} для {employee_id} на сумму {amount}")
         return True
         
@@ -719,7 +740,39 @@ async def create_compensation_request(
         return False
 
 
-async def get_compensation_requests(
+def build_compensation_row(
+    employee_id: int,
+    amount: float,
+    request_type: str,
+    comment: str,
+    created_at: str
+) -> list:
+    """Собрать строку листа "Компенсации" (ID проставляется при записи пачки)."""
+    return [
+        "",
+        str(employee_id),
+        str(amount),
+        request_type,
+        "ожидает",
+        created_at,
+        "",  # Дата выплаты пока пустая
+        comment
+    ]
+
+
+def _number_compensation_rows(sheet, rows: List[list]) -> List[list]:
+    """Проставить порядковые ID запросам на компенсацию перед записью пачки."""
+    next_id = len(sheet.col_values(1))
+    for offset, row in enumerate(rows):
+        row[0] = str(next_id + offset)
+    return rows
+
+
+register_batch_preparer(SHEET_COMPENSATIONS, _number_compensation_rows)
+
+
+@sheets_async
+def get_compensation_requests(
     status_filter: str = "all",
     employee_id: int = None
 ) -> list:
@@ -734,11 +787,7 @@ async def get_compensation_requests(
         list: [{id, employee_id, amount, type, status, date_request, date_paid, comment}, ...]
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_COMPENSATIONS)
-        
-        rows = sheet.get_all_values()[1:]
+        rows = get_sheet_values(SHEET_COMPENSATIONS)[1:]
         requests = []
         
         for row in rows:
@@ -747,7 +796,7 @@ async def get_compensation_requests(
                     req = {
                         'id': row[0],
                         'employee_id': int(row[1]),
-                        'amount': float(row[2]),
+                        'amount': parse_amount_strict(row[2]),
                         'type': row[3] if len(row) > 3 else "",
                         'status': row[4] if len(row) > 4 else "",
                         'date_request': row[5] if len(row) > 5 else "",
@@ -774,6 +823,90 @@ async def get_compensation_requests(
         return []
 
 
+# Статусы, при которых расход не требует компенсации
+NO_COMPENSATION_STATUSES = ["", "оплачено", "не_требуется"]
+
+
+def _employee_name(telegram_id: int) -> Optional[Tuple[str, str]]:
+    """(Имя, Фамилия) сотрудника — для строк "Расходы" без telegram_id."""
+    row = get_employee_row(telegram_id)
+    if row is None or len(row) < 3:
+        return None
+    return row[1], row[2]
+
+
+def backfill_expense_telegram_ids() -> int:
+    """
+    Заполнить telegram_id (колонка K) у старых строк "Расходы".
+    
+    Сотрудник определяется по имени и фамилии; строки однофамильцев-тёзок
+    и уволенных сотрудников остаются пустыми. Подряд идущие строки пишутся
+    одним диапазоном, до BACKFILL_BATCH_ROWS строк за запрос. Повторный
+    запуск ничего не пишет, если заполнять нечего.
+    
+    Returns:
+        int: Сколько строк заполнено
+    """
+    try:
+        # Колонка и заголовок нужны, даже если заполнять пока нечего
+        sheet = get_worksheet(SHEET_EXPENSES)
+        column = COL_TELEGRAM_ID + 1
+        col_count = getattr(sheet, "col_count", None)
+        if col_count is not None and col_count < column:
+            sheet.add_cols(column - col_count)
+        header = sheet.row_values(1)
+        if len(header) < column or header[column - 1] != "telegram_id":
+            patch_row(sheet, 1, {column: "telegram_id"})
+        
+        ids_by_name: Dict[Tuple[str, str], set] = {}
+        for row in get_sheet_values(SHEET_EMPLOYEES)[1:]:
+            if len(row) >= 3 and row[0].strip():
+                ids_by_name.setdefault((row[1], row[2]), set()).add(row[0].strip())
+        
+        table = get_expense_table()
+        updates = []
+        for i in range(len(table)):
+            if table.telegram_ids[i] or not table.rows[i]:
+                continue
+            ids = ids_by_name.get((table.first_names[i], table.last_names[i]))
+            if ids and len(ids) == 1:
+                updates.append((table.row_number(i), next(iter(ids))))
+        
+        if not updates:
+            return 0
+        
+        letter = gspread.utils.rowcol_to_a1(1, column)[:-1]
+        for start in range(0, len(updates), BACKFILL_BATCH_ROWS):
+            chunk = updates[start:start + BACKFILL_BATCH_ROWS]
+            data = []
+            for row_number, telegram_id in chunk:
+                if data and data[-1]['last'] == row_number - 1:
+                    data[-1]['values'].append([telegram_id])
+                    data[-1]['last'] = row_number
+                else:
+                    data.append({'first': row_number, 'last': row_number, 'values': [[telegram_id]]})
+            sheet.batch_update(
+                [{'range': f"{letter}{d['first']}:{letter}{d['last']}", 'values': d['values']} for d in data],
+                value_input_option="USER_ENTERED"
+            )
+        
+        mark_expenses_stale(full_reload=True)
+        logger.info(f"✅ telegram_id заполнен у строк расходов: {len(updates)}")
+        return len(updates)
+    except Exception as e:
+        logger.error(f"❌ Ошибка заполнения telegram_id в расходах: {e}")
+        return 0
+
+
+def _status_filter_kwargs(status_filter: str) -> dict:
+    """Перевести status_filter в условия ExpenseTable.select."""
+    if status_filter == "all":
+        return {}
+    if status_filter == "no_compensation":
+        return {'exclude_statuses': NO_COMPENSATION_STATUSES}
+    return {'statuses': [status_filter]}
+
+
 def get_expenses_by_status(status_filter: str = "all") -> list:
     """
     Получить расходы по статусу компенсации.
@@ -785,36 +918,22 @@ def get_expenses_by_status(status_filter: str = "all") -> list:
         list: [{row_idx, name, date, amount, category, object, compensation_status, project_id}, ...]
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        
-        rows = sheet.get_all_values()[1:]
+        table = get_expense_table()
         expenses = []
         
-        for idx, row in enumerate(rows, start=2):
-            if len(row) >= 7:
-                comp_status = row[8] if len(row) > 8 else ""
-                
-                # Фильтр по статусу
-                if status_filter != "all":
-                    if status_filter == "no_compensation":
-                        if comp_status in ["", "оплачено", "не_требуется"]:
-                            continue
-                    elif comp_status != status_filter:
-                        continue
-                
-                expenses.append({
-                    'row_idx': idx,
-                    'name': f"{row[0]} {row[1]}",
-                    'date': row[2],
-                    'amount': row[3],
-                    'category': row[4],
-                    'object': row[5],
-                    'file_id': row[6] if len(row) > 6 else "",
-                    'compensation_status': comp_status,
-                    'project_id': row[7] if len(row) > 7 else ""
-                })
+        for i in table.select(**_status_filter_kwargs(status_filter)):
+            row = table.rows[i]
+            expenses.append({
+                'row_idx': table.row_number(i),
+                'name': f"{row[0]} {row[1]}",
+                'date': row[2],
+                'amount': row[3],
+                'category': row[4],
+                'object': row[5],
+                'file_id': row[6],
+                'compensation_status': table.compensation_statuses[i],
+                'project_id': table.project_ids[i]
+            })
         
         return expenses
         
@@ -835,41 +954,26 @@ def get_employee_expenses(telegram_id: int, status_filter: str = "all") -> list:
         list: [{row_idx, name, date, amount, category, object, compensation_status}, ...]
     """
     try:
-        # Получаем имя сотрудника
-        employees = get_employees_from_sheet()
-        emp_data = employees.get(telegram_id, {})
-        first_name = emp_data.get("first_name", "")
-        last_name = emp_data.get("last_name", "")
-        
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        
-        rows = sheet.get_all_values()[1:]
+        table = get_expense_table()
         expenses = []
         
-        for idx, row in enumerate(rows, start=2):
-            if len(row) >= 7 and row[0] == first_name and row[1] == last_name:
-                comp_status = row[8] if len(row) > 8 else ""
-                
-                # Фильтр по статусу
-                if status_filter != "all":
-                    if status_filter == "no_compensation":
-                        if comp_status in ["", "оплачено", "не_требуется"]:
-                            continue
-                    elif comp_status != status_filter:
-                        continue
-                
-                expenses.append({
-                    'row_idx': idx,
-                    'name': f"{row[0]} {row[1]}",
-                    'date': row[2],
-                    'amount': row[3],
-                    'category': row[4],
-                    'object': row[5],
-                    'file_id': row[6] if len(row) > 6 else "",
-                    'compensation_status': comp_status
-                })
+        positions = table.select(
+            telegram_id=telegram_id,
+            employee=_employee_name(telegram_id),
+            **_status_filter_kwargs(status_filter)
+        )
+        for i in positions:
+            row = table.rows[i]
+            expenses.append({
+                'row_idx': table.row_number(i),
+                'name': f"{row[0]} {row[1]}",
+                'date': row[2],
+                'amount': row[3],
+                'category': row[4],
+                'object': row[5],
+                'file_id': row[6],
+                'compensation_status': table.compensation_statuses[i]
+            })
         
         return expenses
         
@@ -899,19 +1003,18 @@ def update_compensation_status(
         bool: Успешно ли обновление
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
+        sheet = get_worksheet(SHEET_EXPENSES)
         
         # Обновляем статус в колонке I (9-я колонка)
-        sheet.update_cell(row_idx, 9, status)
+        values = {9: status}
         
         # Дополнительные поля можно сохранить в комментарии или другом месте
         if comment:
             current_comment = sheet.cell(row_idx, 10).value or ""
-            new_comment = f"{current_comment}; {comment}".strip("; ")
-            sheet.update_cell(row_idx, 10, new_comment)
+            values[10] = f"{current_comment}; {comment}".strip("; ")
         
+        patch_row(sheet, row_idx, values)
+        mark_expenses_stale(full_reload=True)
         logger.info(f"✅ Статус компенсации в строке {row_idx} обновлен на '{status}'")
         return True
         
@@ -920,7 +1023,8 @@ def update_compensation_status(
         return False
 
 
-async def get_expenses_by_employee_and_period(
+@sheets_async
+def get_expenses_by_employee_and_period(
     telegram_id: int,
     start_date: datetime,
     end_date: datetime
@@ -937,47 +1041,19 @@ async def get_expenses_by_employee_and_period(
         list: [{date, amount, category, project, compensation_status}, ...]
     """
     try:
-        # Получаем имя сотрудника
-        employees = get_employees_from_sheet()
-        emp_data = employees.get(telegram_id, {})
-        first_name = emp_data.get("first_name", "")
-        last_name = emp_data.get("last_name", "")
-        
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        
-        rows = sheet.get_all_values()[1:]
+        table = get_expense_table()
+        project_index = get_project_index()
         expenses = []
         
-        for row in rows:
-            if len(row) >= 7 and row[0] == first_name and row[1] == last_name:
-                try:
-                    # Парсим дату из строки формата "DD.MM.YYYY HH:MM:SS"
-                    date_str = row[2].split()[0] if row[2] else ""
-                    row_date = datetime.strptime(date_str, "%d.%m.%Y")
-                    
-                    # Проверяем попадание в период
-                    if start_date <= row_date <= end_date:
-                        # Получаем название проекта
-                        project_id = row[7] if len(row) > 7 else ""
-                        project_name = ""
-                        if project_id:
-                            projects = get_all_projects()
-                            for p in projects:
-                                if p['id'] == project_id:
-                                    project_name = p['name']
-                                    break
-                        
-                        expenses.append({
-                            'date': row[2],
-                            'amount': float(row[3]) if row[3] else 0.0,
-                            'category': row[4],
-                            'project': project_name or row[5],  # Если нет проекта, показываем объект
-                            'compensation_status': row[8] if len(row) > 8 else ""
-                        })
-                except (ValueError, IndexError):
-                    continue
+        positions = table.select(
+            telegram_id=telegram_id,
+            employee=_employee_name(telegram_id),
+            start=start_date,
+            end=end_date
+        )
+        for i in positions:
+            if table.amounts[i] is not None:
+                expenses.append(_employee_expense_item(table, i, project_index))
         
         return expenses
         
@@ -986,7 +1062,92 @@ async def get_expenses_by_employee_and_period(
         return []
 
 
-async def get_expenses_by_project(
+def _employee_expense_item(table, i: int, project_index: Dict[str, str]) -> dict:
+    """Строка "Расходы" в виде {date, amount, category, project, compensation_status}."""
+    project_id = table.project_ids[i]
+    project_name = project_index.get(project_id, "") if project_id else ""
+    
+    return {
+        'date': table.rows[i][2],
+        'amount': table.amounts[i],
+        'category': table.categories[i],
+        'project': project_name or table.objects[i],  # Если нет проекта, показываем объект
+        'compensation_status': table.compensation_statuses[i]
+    }
+
+
+@sheets_async
+def get_employee_period_reports(
+    telegram_ids: List[int],
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[int, dict]:
+    """
+    Расходы за период и балансы сразу для многих сотрудников.
+    
+    Для рассылки отчётов: расходы за период выбираются из одного снимка
+    "Расходы" и раскладываются по сотрудникам за один проход, балансы
+    берутся из одного чтения "Сотрудники" — вместо трёх чтений листов
+    на каждого получателя.
+    
+    Args:
+        telegram_ids: ID сотрудников
+        start_date: Начало периода
+        end_date: Конец периода
+    
+    Returns:
+        dict: {telegram_id: {'expenses': [...как у get_expenses_by_employee_and_period],
+                             'balance': float}} — для каждого найденного сотрудника
+    """
+    try:
+        wanted = {str(telegram_id): telegram_id for telegram_id in telegram_ids}
+        reports: Dict[int, dict] = {}
+        ids_by_name: Dict[Tuple[str, str], List[int]] = {}
+        
+        for row in get_sheet_values(SHEET_EMPLOYEES)[1:]:
+            telegram_id = wanted.get(row[0].strip()) if row else None
+            if telegram_id is None or telegram_id in reports:
+                continue
+            try:
+                balance = parse_balance(row)
+            except ValueError:
+                logger.warning(f"⚠️ Не разобран баланс сотрудника {telegram_id}")
+                balance = 0.0
+            reports[telegram_id] = {'expenses': [], 'balance': balance}
+            if len(row) >= 3:
+                ids_by_name.setdefault((row[1], row[2]), []).append(telegram_id)
+        
+        if not reports:
+            return {}
+        
+        table = get_expense_table()
+        project_index = get_project_index()
+        
+        for i in table.select(start=start_date, end=end_date):
+            if table.amounts[i] is None:
+                continue
+            
+            # Строки без telegram_id относятся к сотруднику по имени
+            owner = table.telegram_ids[i]
+            if owner:
+                owners = [wanted[owner]] if owner in wanted and wanted[owner] in reports else []
+            else:
+                owners = ids_by_name.get((table.first_names[i], table.last_names[i]), [])
+            
+            if owners:
+                item = _employee_expense_item(table, i, project_index)
+                for telegram_id in owners:
+                    reports[telegram_id]['expenses'].append(item)
+        
+        return reports
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка подготовки отчётов сотрудников: {e}")
+        return {}
+
+
+@sheets_async
+def get_expenses_by_project(
     project_id: str = None,
     start_date: datetime = None,
     end_date: datetime = None
@@ -1003,48 +1164,30 @@ async def get_expenses_by_project(
         list: [{employee_name, date, amount, category, project_name}, ...]
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EXPENSES)
-        
-        rows = sheet.get_all_values()[1:]
+        table = get_expense_table()
+        project_index = get_project_index()
         expenses = []
         
-        for row in rows:
-            if len(row) < 7:
-                continue
-            
-            row_project_id = row[7] if len(row) > 7 else ""
-            
-            # Фильтр по проекту
-            if project_id is not None and row_project_id != project_id:
+        # Фильтр по дате применяется, только если заданы обе границы
+        if start_date and end_date:
+            positions = table.select(project_id=project_id, start=start_date, end=end_date)
+        else:
+            positions = table.select(project_id=project_id)
+        
+        for i in positions:
+            if table.amounts[i] is None:
                 continue
             
-            # Фильтр по дате
-            if start_date and end_date and row[2]:
-                try:
-                    date_str = row[2].split()[0]
-                    row_date = datetime.strptime(date_str, "%d.%m.%Y")
-                    if not (start_date <= row_date <= end_date):
-                        continue
-                except ValueError:
-                    continue
-            
             # Получаем название проекта
-            project_name = ""
-            if row_project_id:
-                projects = get_all_projects()
-                for p in projects:
-                    if p['id'] == row_project_id:
-                        project_name = p['name']
-                        break
+            row_project_id = table.project_ids[i]
+            project_name = project_index.get(row_project_id, "") if row_project_id else ""
             
             expenses.append({
-                'employee_name': f"{row[0]} {row[1]}",
-                'date': row[2],
-                'amount': float(row[3]) if row[3] else 0.0,
-                'category': row[4],
-                'project_name': project_name or row[5]
+                'employee_name': f"{table.first_names[i]} {table.last_names[i]}",
+                'date': table.rows[i][2],
+                'amount': table.amounts[i],
+                'category': table.categories[i],
+                'project_name': project_name or table.objects[i]
             })
         
         return expenses
@@ -1069,25 +1212,23 @@ async def notify_limit_warning(telegram_id: int, percentage: float, current: flo
     """
     from aiogram import Bot
     from config.settings import TELEGRAM_TOKEN
+    from services.broadcast import broadcast
     from utils.google_sheets import get_employees_from_sheet
     
     try:
         bot = Bot(TELEGRAM_TOKEN)
-        employees = get_employees_from_sheet()
+        employees = await run_sheets(get_employees_from_sheet)
         emp_data = employees.get(telegram_id, {})
         emp_name = f"{emp_data.get('first_name', '')} {emp_data.get('last_name', '')}".strip()
         
         # Уведомление сотруднику
-        try:
-            text = (
-                f"⚡ <b>Внимание! Приближение к лимиту</b>\n\n"
-                f"Вы использовали {percentage:.1f}% от вашего лимита.\n"
-                f"Текущие расходы: {current:.2f}₽ из {limit:.2f}₽\n\n"
-                f"Будьте внимательны при добавлении новых расходов."
-            )
-            await bot.send_message(chat_id=telegram_id, text=text, parse_mode="HTML")
-        except Exception as e:
-            logger.error(f"❌ Не удалось отправить уведомление сотруднику {telegram_id}: {e}")
+        text = (
+            f"⚡ <b>Внимание! Приближение к лимиту</b>\n\n"
+            f"Вы использовали {percentage:.1f}% от вашего лимита.\n"
+            f"Текущие расходы: {current:.2f}₽ из {limit:.2f}₽\n\n"
+            f"Будьте внимательны при добавлении новых расходов."
+        )
+        messages = [(telegram_id, text)]
         
         # Уведомление контролёрам и владельцу
         text_admin = (
@@ -1099,13 +1240,13 @@ async def notify_limit_warning(telegram_id: int, percentage: float, current: flo
         
         for emp_id, emp in employees.items():
             if emp.get("role") in [ROLE_CONTROLLER, ROLE_OWNER]:
-                try:
-                    await bot.send_message(chat_id=emp_id, text=text_admin, parse_mode="HTML")
-                except Exception as e:
-                    logger.error(f"❌ Не удалось отправить уведомление {emp_id}: {e}")
+                messages.append((emp_id, text_admin))
         
-        await bot.session.close()
-        logger.info(f"✅ Уведомление о лимите 80% отправлено для {telegram_id}")
+        try:
+            result = await broadcast(bot, messages, name=f"Уведомление о лимите 80% ({telegram_id})")
+        finally:
+            await bot.session.close()
+        logger.info(f"✅ Уведомление о лимите 80% для {telegram_id}: {result}")
         
     except Exception as e:
         logger.error(f"❌ Ошибка отправки уведомления о лимите: {e}")
@@ -1124,25 +1265,23 @@ async def notify_limit_exceeded(telegram_id: int, current: float, limit: float,
     """
     from aiogram import Bot
     from config.settings import TELEGRAM_TOKEN
+    from services.broadcast import broadcast
     from utils.google_sheets import get_employees_from_sheet
     
     try:
         bot = Bot(TELEGRAM_TOKEN)
-        employees = get_employees_from_sheet()
+        employees = await run_sheets(get_employees_from_sheet)
         emp_data = employees.get(telegram_id, {})
         emp_name = f"{emp_data.get('first_name', '')} {emp_data.get('last_name', '')}".strip()
         
         # Уведомление сотруднику
-        try:
-            text = (
-                f"🚫 <b>Лимит превышен!</b>\n\n"
-                f"Ваши расходы ({current:.2f}₽) превышают установленный лимит ({limit:.2f}₽).\n"
-                f"Новый расход ({amount:.2f}₽) требует подтверждения главбуха.\n\n"
-                f"Ожидайте решения."
-            )
-            await bot.send_message(chat_id=telegram_id, text=text, parse_mode="HTML")
-        except Exception as e:
-            logger.error(f"❌ Не удалось отправить уведомление сотруднику {telegram_id}: {e}")
+        text = (
+            f"🚫 <b>Лимит превышен!</b>\n\n"
+            f"Ваши расходы ({current:.2f}₽) превышают установленный лимит ({limit:.2f}₽).\n"
+            f"Новый расход ({amount:.2f}₽) требует подтверждения главбуха.\n\n"
+            f"Ожидайте решения."
+        )
+        messages = [(telegram_id, text)]
         
         # Уведомление главбуху и владельцу с запросом подтверждения
         text_admin = (
@@ -1158,13 +1297,13 @@ async def notify_limit_exceeded(telegram_id: int, current: float, limit: float,
         
         for emp_id, emp in employees.items():
             if emp.get("role") in [ROLE_CHIEF_ACCOUNTANT, ROLE_OWNER]:
-                try:
-                    await bot.send_message(chat_id=emp_id, text=text_admin, parse_mode="HTML")
-                except Exception as e:
-                    logger.error(f"❌ Не удалось отправить уведомление {emp_id}: {e}")
+                messages.append((emp_id, text_admin))
         
-        await bot.session.close()
-        logger.info(f"✅ Уведомление о превышении лимита отправлено для {telegram_id}")
+        try:
+            result = await broadcast(bot, messages, name=f"Уведомление о превышении лимита ({telegram_id})")
+        finally:
+            await bot.session.close()
+        logger.info(f"✅ Уведомление о превышении лимита для {telegram_id}: {result}")
         
     except Exception as e:
         logger.error(f"❌ Ошибка отправки уведомления о превышении: {e}")
@@ -1179,7 +1318,8 @@ ROLE_EMPLOYEE = "подотчетник"
 
 # ============ НАСТРОЙКИ ПОДПИСКИ НА ОТЧЁТЫ (ДОБАВЛЕНО) ============
 
-async def get_employees_with_subscription(report_type: str) -> list:
+@sheets_async
+def get_employees_with_subscription(report_type: str) -> list:
     """
     Получить список сотрудников с активной подпиской на отчёт.
     
@@ -1191,11 +1331,7 @@ async def get_employees_with_subscription(report_type: str) -> list:
         list: [telegram_id, ...]
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
-        
-        rows = sheet.get_all_values()
+        rows = get_sheet_values(SHEET_EMPLOYEES)
         
         # Определяем индекс колонки в зависимости от типа подписки
         # Колонки: I=9, J=10, K=11, L=12, M=13, N=14, O=15
@@ -1231,7 +1367,8 @@ async def get_employees_with_subscription(report_type: str) -> list:
         return []
 
 
-async def update_subscription(telegram_id: int, report_type: str, enabled: bool) -> bool:
+@sheets_async
+def update_subscription(telegram_id: int, report_type: str, enabled: bool) -> bool:
     """
     Включить/выключить подписку на отчёт.
     
@@ -1244,9 +1381,7 @@ async def update_subscription(telegram_id: int, report_type: str, enabled: bool)
         bool: Успешно ли обновление
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
+        sheet = get_worksheet(SHEET_EMPLOYEES)
         
         # Определяем индекс колонки
         col_map = {
@@ -1262,15 +1397,16 @@ async def update_subscription(telegram_id: int, report_type: str, enabled: bool)
         col_idx = col_map.get(report_type, 9)
         
         # Ищем сотрудника
-        rows = sheet.get_all_values()
-        for idx, row in enumerate(rows[1:], start=2):
-            if row[0] == str(telegram_id):
-                # Обновляем значение
-                value = "да" if enabled else "нет"
-                sheet.update_cell(idx, col_idx, value)
-                
-                logger.info(f"✅ Подписка '{report_type}' для {telegram_id}: {value}")
-                return True
+        found = fetch_employee_row(sheet, telegram_id)
+        if found:
+            idx, _ = found
+            # Обновляем значение
+            value = "да" if enabled else "нет"
+            patch_row(sheet, idx, {col_idx: value})
+            invalidate_sheet_values(SHEET_EMPLOYEES)
+            
+            logger.info(f"✅ Подписка '{report_type}' для {telegram_id}: {value}")
+            return True
         
         logger.warning(f"⚠️ Сотрудник {telegram_id} не найден")
         return False
@@ -1280,7 +1416,8 @@ async def update_subscription(telegram_id: int, report_type: str, enabled: bool)
         return False
 
 
-async def get_employee_subscriptions(telegram_id: int) -> dict:
+@sheets_async
+def get_employee_subscriptions(telegram_id: int) -> dict:
     """
     Получить статусы всех подписок сотрудника.
     
@@ -1291,26 +1428,21 @@ async def get_employee_subscriptions(telegram_id: int) -> dict:
         dict: {report_type: enabled, ...}
     """
     try:
-        client = get_sheets_client()
-        doc = client.open_by_key(SPREADSHEET_ID)
-        sheet = doc.worksheet(SHEET_EMPLOYEES)
+        row = get_employee_row(telegram_id)
         
-        rows = sheet.get_all_values()
-        
-        for row in rows[1:]:
-            if row[0] == str(telegram_id) and len(row) >= 15:
-                def is_enabled(val):
-                    return val.lower().strip() in ['да', '1', 'true', 'yes', 'вкл'] if val else False
-                
-                return {
-                    'daily': is_enabled(row[8] if len(row) > 8 else ""),
-                    'weekly': is_enabled(row[9] if len(row) > 9 else ""),
-                    'monthly': is_enabled(row[10] if len(row) > 10 else ""),
-                    'daily_admin': is_enabled(row[11] if len(row) > 11 else ""),
-                    'weekly_admin': is_enabled(row[12] if len(row) > 12 else ""),
-                    'monthly_admin': is_enabled(row[13] if len(row) > 13 else ""),
-                    'balance_alert': is_enabled(row[14] if len(row) > 14 else ""),
-                }
+        if row is not None and len(row) >= 15:
+            def is_enabled(val):
+                return val.lower().strip() in ['да', '1', 'true', 'yes', 'вкл'] if val else False
+            
+            return {
+                'daily': is_enabled(row[8] if len(row) > 8 else ""),
+                'weekly': is_enabled(row[9] if len(row) > 9 else ""),
+                'monthly': is_enabled(row[10] if len(row) > 10 else ""),
+                'daily_admin': is_enabled(row[11] if len(row) > 11 else ""),
+                'weekly_admin': is_enabled(row[12] if len(row) > 12 else ""),
+                'monthly_admin': is_enabled(row[13] if len(row) > 13 else ""),
+                'balance_alert': is_enabled(row[14] if len(row) > 14 else ""),
+            }
         
         # По умолчанию - все выключены
         return {
@@ -0,0 +1,107 @@
+"""
+Асинхронный шлюз к Google Sheets.
+
+gspread — синхронная библиотека: прямой вызов из хендлера блокирует
+event loop aiogram, и один медленный запрос к Google останавливает все чаты.
+Все обращения к Sheets из хендлеров, middlewares и планировщика идут через
+ограниченный пул потоков, поэтому задержки разных пользователей перекрываются.
+
+Одинаковые чтения, пришедшие одновременно (десять /balance за секунду,
+планировщик по всем подписчикам), объединяются SingleFlight: HTTP-запрос
+выполняет первый, остальные ждут и получают его результат.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Hashable
+
+from config.settings import SHEETS_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+
+
+async def run_sheets(func: Callable, *args, **kwargs) -> Any:
+    """
+    Выполнить блокирующую функцию работы с Sheets в пуле потоков.
+    
+    Args:
+        func: Синхронная функция (get_all_projects, append_expense_row и т.д.)
+        *args, **kwargs: Аргументы функции
+    
+    Returns:
+        Результат func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+def sheets_async(func: Callable) -> Callable:
+    """
+    Декоратор: превращает синхронную функцию работы с Sheets в корутину,
+    которая выполняется в пуле шлюза.
+    
+    Исходная функция доступна как wrapper.blocking — для вызова из кода,
+    который уже работает внутри пула.
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_sheets(func, *args, **kwargs)
+    
+    wrapper.blocking = func
+    return wrapper
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вызовов (потокобезопасно).
+    
+    Пока вызов с ключом key выполняется, другие вызовы с тем же ключом
+    не выполняют func, а ждут и получают тот же результат или исключение.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.shared = 0  # сколько вызовов получили чужой результат
+    
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнить func или присоединиться к уже идущему вызову с тем же ключом.
+        
+        Returns:
+            tuple: (результат, True если результат получен от чужого вызова)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+        
+        if not leader:
+            return future.result(), True
+        
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            self._calls.pop(key, None)
+        future.set_result(result)
+        return result, False
+
+
+def shutdown_sheets_gateway():
+    """Остановить пул потоков (при завершении бота)."""
+    _executor.shutdown(wait=False)
+    logger.info("🛑 Пул запросов к Google Sheets остановлен")
@@ -0,0 +1,327 @@
+"""
+Ограничитель частоты запросов к Google Sheets.
+
+Google ограничивает число запросов чтения и записи в минуту. Раньше при
+пиковой нагрузке (/report в рабочий день, прогон планировщика) запрос
+падал с 429, ошибка глоталась, и пользователь получал пустой отчёт.
+Теперь каждый запрос проходит через token bucket своего типа (чтение или
+запись), а 429 и 5xx повторяются с экспоненциальной паузой со случайным
+разбросом — пик превращается в небольшую задержку.
+
+Чтение повторяется после любого временного сбоя. Запись — только если
+запрос точно не выполнен (429, соединение не установлено): после таймаута
+или 5xx изменение могло дойти до таблицы. Добавление строк в этом случае
+повторяется, лишь если их нет в конце листа; остальные записи не повторяются.
+"""
+import logging
+import random
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from config.settings import (
+    SHEETS_READS_PER_MINUTE,
+    SHEETS_WRITES_PER_MINUTE,
+    SHEETS_RATE_BURST,
+    SHEETS_MAX_RETRIES,
+)
+from utils.bulk_parse import parse_amount
+from utils.sheets_gateway import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+# Пауза перед первым повтором и максимальная пауза (секунды)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+
+# Методы gspread.Worksheet по типу квоты
+READ_METHODS = {
+    "get_all_values", "get_all_records", "get_values", "get", "batch_get",
+    "row_values", "col_values", "cell", "acell", "find", "findall",
+}
+WRITE_METHODS = {
+    "append_row", "append_rows", "update", "update_cell", "update_acell",
+    "batch_update", "insert_row", "insert_rows", "delete_rows", "clear",
+    "resize", "add_rows", "add_cols",
+}
+APPEND_METHODS = {"append_row", "append_rows"}
+
+
+class TokenBucket:
+    """Token bucket: rate_per_minute токенов в минуту, не больше burst подряд."""
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Взять токен, при необходимости подождав.
+
+        Returns:
+            float: Сколько секунд пришлось ждать
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def available(self) -> float:
+        """Сколько запросов можно сделать прямо сейчас без ожидания."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+# Сколько строк после искомых могли дописать другие, пока ответ терялся
+APPEND_CHECK_SLACK = 50
+
+_buckets = {
+    READ: TokenBucket(SHEETS_READS_PER_MINUTE, SHEETS_RATE_BURST),
+    WRITE: TokenBucket(SHEETS_WRITES_PER_MINUTE, SHEETS_RATE_BURST),
+}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "code", None)
+    if not isinstance(code, int):
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _is_retryable(error: Exception) -> bool:
+    """429, 5xx и сетевые сбои имеет смысл повторить."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    code = _status_code(error)
+    return code is not None and (code == 429 or code >= 500)
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибка Sheets, которую повтор не исправит: 4xx, кроме 429 (неверный диапазон, нет доступа)."""
+    code = _status_code(error)
+    return code is not None and 400 <= code < 500 and code != 429
+
+
+def _not_applied(error: Exception) -> bool:
+    """Запрос точно не выполнен: 429 или соединение не было установлено."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return _status_code(error) == 429
+
+
+def _same_cell(sent, seen: str) -> bool:
+    """Значение, отправленное с USER_ENTERED, и то, как его показывает таблица."""
+    text = "" if sent is None else str(sent).strip()
+    seen = seen.strip()
+    if text == seen:
+        return True
+    if not text or not seen:
+        return False
+    # "1500.0" таблица покажет как "1500", "1500.5" — как "1 500,50"
+    sent_amount, seen_amount = parse_amount(text), parse_amount(seen)
+    return sent_amount is not None and seen_amount is not None and abs(sent_amount - seen_amount) < 0.005
+
+
+def _same_row(sent: list, seen: List[str]) -> bool:
+    for i in range(max(len(sent), len(seen))):
+        if not _same_cell(sent[i] if i < len(sent) else "", seen[i] if i < len(seen) else ""):
+            return False
+    return True
+
+
+def rows_landed(values: List[List[str]], rows: List[list], slack: int = APPEND_CHECK_SLACK) -> bool:
+    """
+    Есть ли строки rows подряд в конце листа.
+
+    Нужно после ошибки append_rows: таймаут или 5xx не означают, что запрос
+    не выполнен, и повторная запись задвоила бы строки.
+
+    Args:
+        values: Содержимое листа (get_all_values)
+        rows: Отправленные строки
+        slack: Сколько строк после них могли дописать другие
+    """
+    count = len(rows)
+    tail = values[-(count + slack):]
+    for start in range(len(tail) - count + 1):
+        if all(_same_row(rows[i], tail[start + i]) for i in range(count)):
+            return True
+    return False
+
+
+def limited_call(kind: str, name: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Выполнить запрос к Sheets с учётом квоты и повторами.
+
+    Args:
+        kind: READ или WRITE
+        name: Название операции (для логов)
+        func: Вызов gspread
+
+    Raises:
+        Исключение последней попытки, если повторы не помогли
+    """
+    retryable = _is_retryable if kind == READ else _not_applied
+    return _call(kind, name, partial(func, *args, **kwargs), retryable)
+
+
+def _call(
+    kind: str,
+    name: str,
+    call: Callable[[], Any],
+    retryable: Callable[[Exception], bool],
+    landed: Optional[Callable[[], bool]] = None,
+) -> Any:
+    """
+    Выполнить запрос с учётом квоты; повторить, если retryable(ошибка).
+
+    Args:
+        landed: Для добавления строк — проверка, что строки уже в листе.
+                После сбоя, при котором запрос мог выполниться, запись
+                считается успешной, если строки найдены, и повторяется,
+                если их нет
+    """
+    bucket = _buckets[kind]
+    attempt = 0
+    while True:
+        waited = bucket.acquire()
+        if waited > 1:
+            logger.info(f"⏳ Квота {kind} исчерпана, {name} ждал {waited:.1f} с")
+        try:
+            return call()
+        except Exception as e:
+            can_retry = retryable(e)
+            if landed is not None and not can_retry and _is_retryable(e):
+                try:
+                    found = landed()
+                except Exception as check_error:
+                    logger.error(f"❌ {name}: не удалось проверить, записаны ли строки: {check_error}")
+                    raise e
+                if found:
+                    logger.warning(f"⚠️ {name}: {e}, но строки уже в листе")
+                    return None
+                can_retry = True
+            if not can_retry or attempt >= SHEETS_MAX_RETRIES:
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            logger.warning(f"⚠️ {name}: {e}. Повтор {attempt}/{SHEETS_MAX_RETRIES} через {delay:.1f} с")
+            time.sleep(delay)
+
+
+def _rows_in_sheet(worksheet, rows: List[list]) -> bool:
+    """Есть ли строки в конце листа (перечитывается весь лист)."""
+    values = limited_call(READ, f"{worksheet.title}.get_all_values", worksheet.get_all_values)
+    return rows_landed(values, rows)
+
+
+_reads = SingleFlight()
+_write_generations: Dict[str, int] = {}  # лист -> счётчик записей (для ключа чтения)
+_generations_lock = threading.Lock()
+
+
+def _bump_write_generation(title: str):
+    with _generations_lock:
+        _write_generations[title] = _write_generations.get(title, 0) + 1
+
+
+def _copy_rows(result):
+    """Копия списка строк для тех, кто присоединился к чужому чтению."""
+    if isinstance(result, list):
+        return [list(item) if isinstance(item, list) else item for item in result]
+    return result
+
+
+def get_quota_headroom() -> dict:
+    """
+    Текущий запас квоты.
+
+    Returns:
+        dict: {'read': запросов_без_ожидания, 'write': ...}
+    """
+    return {kind: int(bucket.available()) for kind, bucket in _buckets.items()}
+
+
+class LimitedWorksheet:
+    """
+    Обёртка листа gspread: методы чтения и записи идут через limited_call,
+    остальные атрибуты (title, id, ...) — напрямую.
+    
+    Одинаковые одновременные чтения одного листа выполняются одним запросом.
+    Запись в лист меняет ключ чтения до и после себя, поэтому вызов, начатый
+    после записи, не получит результат чтения, начатого до неё.
+
+    Запись повторяется только если запрос точно не выполнен; добавление
+    строк после таймаута или 5xx — если строк нет в конце листа.
+    """
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._worksheet, name)
+        if name in READ_METHODS:
+            kind = READ
+        elif name in WRITE_METHODS:
+            kind = WRITE
+        else:
+            return attr
+
+        title = self._worksheet.title
+        label = f"{title}.{name}"
+
+        if kind == WRITE:
+            def write(*args, **kwargs):
+                landed = None
+                if name in APPEND_METHODS:
+                    values = args[0] if args else kwargs.get("values", [])
+                    rows = [values] if name == "append_row" else values
+                    landed = partial(_rows_in_sheet, self._worksheet, rows)
+
+                _bump_write_generation(title)
+                try:
+                    return _call(kind, label, partial(attr, *args, **kwargs), _not_applied, landed)
+                finally:
+                    _bump_write_generation(title)
+
+            return write
+
+        def read(*args, **kwargs):
+            with _generations_lock:
+                generation = _write_generations.get(title, 0)
+            key = (title, generation, name, repr(args), repr(sorted(kwargs.items())))
+            result, shared = _reads.do(key, limited_call, kind, label, attr, *args, **kwargs)
+            if shared:
+                logger.debug(f"🔄 {label}: результат общего запроса")
+                return _copy_rows(result)
+            return result
+
+        return read
+
+    def __repr__(self) -> str:
+        return f"LimitedWorksheet({self._worksheet!r})"
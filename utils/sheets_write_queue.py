@@ -0,0 +1,209 @@
+"""
+Очередь отложенной записи строк в Google Sheets.
+
+В часы пик (конец дня, выплаты) десятки сотрудников сохраняют расходы
+за несколько секунд, и каждый append_row — отдельный запрос к квоте API.
+Здесь добавления в один лист копятся в течение короткого окна
+SHEETS_WRITE_BATCH_WINDOW и уходят одним append_rows. Каждый вызывающий
+ждёт свой future: он завершается, когда строка записана, или ошибкой
+именно этой строки.
+
+Ошибка append_rows (таймаут, 5xx) не означает, что строки не записаны:
+перед повтором конец листа перечитывается, и строки, которые уже в нём,
+второй раз не пишутся.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import SHEETS_WRITE_BATCH_WINDOW, SHEETS_WRITE_BATCH_SIZE
+from utils.sheets_gateway import run_sheets
+from utils.sheets_limiter import rows_landed
+
+logger = logging.getLogger(__name__)
+
+# Подготовка пачки перед записью: (worksheet, rows) -> rows.
+# Нужна, когда значения зависят от содержимого листа (например, порядковые ID).
+BatchPreparer = Callable[[object, List[list]], List[list]]
+
+_preparers: Dict[str, BatchPreparer] = {}
+
+
+class UnconfirmedAppendError(Exception):
+    """Запись не удалась, а проверить, попали ли строки в лист, не получилось."""
+
+
+def register_batch_preparer(title: str, preparer: BatchPreparer):
+    """
+    Зарегистрировать подготовку пачки строк для листа.
+
+    Args:
+        title: Название листа
+        preparer: Функция (worksheet, rows) -> rows, вызывается в пуле
+                  непосредственно перед записью
+    """
+    _preparers[title] = preparer
+
+
+def _after_append(title: str):
+    """Сбросить кэши листа после успешной записи."""
+    from utils.sheets_cache import invalidate_sheet_values
+    from utils.expense_store import get_expense_store
+
+    try:
+        invalidate_sheet_values(title)
+        store = get_expense_store()
+        if store.title == title:
+            store.mark_stale()
+    except Exception as e:
+        # Строки уже в листе — ошибка кэша не должна приводить к повторной записи
+        logger.warning(f"⚠️ Не удалось сбросить кэш листа '{title}': {e}")
+
+
+def _append_rows(title: str, rows: List[list]) -> List[list]:
+    """Записать пачку строк одним запросом (блокирующая часть)."""
+    from utils.google_sheets import get_worksheet
+
+    sheet = get_worksheet(title)
+    preparer = _preparers.get(title)
+    if preparer:
+        rows = preparer(sheet, rows)
+
+    try:
+        sheet.append_rows(rows, value_input_option="USER_ENTERED")
+    except Exception as e:
+        try:
+            landed = rows_landed(sheet.get_all_values(), rows)
+        except Exception as check_error:
+            raise UnconfirmedAppendError(
+                f"запись в '{title}' не удалась ({e}), проверить лист не получилось ({check_error})"
+            ) from e
+        if not landed:
+            raise
+        logger.warning(f"⚠️ Запись в '{title}' вернула ошибку ({e}), но строки уже в листе")
+
+    _after_append(title)
+    return rows
+
+
+def _append_rows_one_by_one(title: str, rows: List[list]) -> List[Tuple[Optional[list], Optional[Exception]]]:
+    """
+    Записать строки по одной, чтобы выяснить, какие из них не проходят.
+
+    Returns:
+        list: [(записанная_строка, None) или (None, ошибка), ...]
+    """
+    results = []
+    for row in rows:
+        try:
+            results.append((_append_rows(title, [row])[0], None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+class SheetsWriteQueue:
+    """
+    Копит добавления строк по листам и записывает их пачками.
+
+    Работает в event loop бота; сами запросы к Sheets идут через run_sheets.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: Dict[str, List[Tuple[list, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._flushing = set()
+
+    async def append(self, title: str, row: list) -> list:
+        """
+        Поставить строку в очередь и дождаться её записи.
+
+        Args:
+            title: Название листа
+            row: Значения строки
+
+        Returns:
+            list: Строка в том виде, в каком она записана в лист
+
+        Raises:
+            Exception: Ошибка записи именно этой строки
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(title, [])
+        batch.append((row, future))
+
+        if len(batch) >= self._max_batch:
+            self._cancel_timer(title)
+            task = loop.create_task(self._flush(title))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+        elif title not in self._timers:
+            self._timers[title] = loop.create_task(self._flush_later(title))
+
+        return await future
+
+    async def flush(self):
+        """Немедленно записать всё, что накопилось (при остановке бота)."""
+        for title in list(self._pending):
+            self._cancel_timer(title)
+            await self._flush(title)
+
+    def _cancel_timer(self, title: str):
+        timer = self._timers.pop(title, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+    async def _flush_later(self, title: str):
+        await asyncio.sleep(self._window)
+        self._timers.pop(title, None)
+        await self._flush(title)
+
+    async def _flush(self, title: str):
+        batch = self._pending.pop(title, [])
+        if not batch:
+            return
+
+        rows = [row for row, _ in batch]
+        try:
+            written = await run_sheets(_append_rows, title, rows)
+            results = [(row, None) for row in written]
+            logger.info(f"✅ В лист '{title}' записано строк одним запросом: {len(rows)}")
+        except UnconfirmedAppendError as e:
+            # Построчная запись могла бы задвоить уже записанные строки
+            logger.error(f"❌ {e}")
+            results = [(None, e)] * len(rows)
+        except Exception as e:
+            logger.warning(f"⚠️ Пакетная запись в '{title}' не удалась ({e}), пишем построчно")
+            try:
+                results = await run_sheets(_append_rows_one_by_one, title, rows)
+            except Exception as e:
+                results = [(None, e)] * len(rows)
+
+        failed = 0
+        for (_, future), (row, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(row)
+            else:
+                failed += 1
+                future.set_exception(error)
+
+        if failed:
+            logger.error(f"❌ Не записано строк в '{title}': {failed} из {len(rows)}")
+
+
+_queue = SheetsWriteQueue(SHEETS_WRITE_BATCH_WINDOW, SHEETS_WRITE_BATCH_SIZE)
+
+
+async def enqueue_append(title: str, row: list) -> list:
+    """Добавить строку в лист через общую очередь (см. SheetsWriteQueue.append)."""
+    return await _queue.append(title, row)
+
+
+async def flush_write_queue():
+    """Дописать накопленные строки (при завершении бота)."""
+    await _queue.flush()
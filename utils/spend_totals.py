@@ -0,0 +1,138 @@
+"""
+Расходы сотрудников за текущие день, неделю и месяц.
+
+Лимит проверяется при каждом вводе суммы в /add. Раньше для этого
+get_expenses_for_period скачивал весь лист "Расходы" (и всё равно
+возвращал 0). Здесь суммы хранятся в памяти по ключам
+(сотрудник, день), (сотрудник, неделя), (сотрудник, месяц): при дозаписи
+листа учитываются только новые строки, после полной перечитки итоги
+строятся заново одним проходом, а проверка лимита — поиск в словаре.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from utils.expense_store import ExpenseTable, get_expense_table
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAY = "день"
+PERIOD_WEEK = "неделя"
+PERIOD_MONTH = "месяц"
+
+# Типы операций, которые расходуют лимит ("" — строки до появления типа)
+LIMITED_OPERATIONS = {"", "расход"}
+
+
+def period_keys(day: datetime) -> Dict[str, tuple]:
+    """Ключи дня, недели (с понедельника) и месяца, в которые попадает дата."""
+    week_start = day - timedelta(days=day.weekday())
+    return {
+        PERIOD_DAY: (day.year, day.month, day.day),
+        PERIOD_WEEK: (week_start.year, week_start.month, week_start.day),
+        PERIOD_MONTH: (day.year, day.month),
+    }
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> datetime:
+    """Начало текущего дня, недели или месяца (по умолчанию — месяц)."""
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PERIOD_DAY:
+        return today
+    if period == PERIOD_WEEK:
+        return today - timedelta(days=today.weekday())
+    return today.replace(day=1)
+
+
+class SpendTotals:
+    """
+    Суммы расходов по сотрудникам и периодам, обновляемые вместе с ExpenseStore.
+
+    Все методы блокирующие.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[ExpenseTable] = None
+        # (telegram_id или (Имя, Фамилия), период, ключ периода) -> сумма
+        self._totals: Dict[tuple, float] = {}
+
+    def refresh(self):
+        """Учесть строки, появившиеся с прошлого обращения."""
+        table = get_expense_table()
+        with self._lock:
+            if table is self._table:
+                return
+
+            known = table.appended_since(self._table)
+            if known is None:
+                self._totals = {}
+                # Для текущих периодов достаточно строк с начала недели или месяца
+                since = min(period_start(PERIOD_WEEK), period_start(PERIOD_MONTH))
+                added = self._add_rows(table, 0, since)
+                logger.info(f"🔄 Расходы за периоды пересчитаны: {added} строк")
+            else:
+                self._add_rows(table, known)
+            self._table = table
+
+    def spent(
+        self,
+        telegram_id: int,
+        name: Optional[Tuple[str, str]],
+        period: str,
+        now: Optional[datetime] = None,
+    ) -> float:
+        """
+        Сумма расходов сотрудника за текущий период.
+
+        Args:
+            name: (Имя, Фамилия) — чтобы учесть строки без telegram_id
+        """
+        if period not in (PERIOD_DAY, PERIOD_WEEK):
+            period = PERIOD_MONTH
+        key = period_keys(now or datetime.now())[period]
+        with self._lock:
+            total = self._totals.get((str(telegram_id), period, key), 0.0)
+            if name is not None:
+                total += self._totals.get((name, period, key), 0.0)
+            return total
+
+    def _add_rows(self, table: ExpenseTable, start: int, since: Optional[datetime] = None) -> int:
+        totals = self._totals
+        added = 0
+        for i in range(start, len(table)):
+            day = table.days[i]
+            amount = table.amounts[i]
+            if day is None or amount is None or table.operation_types[i] not in LIMITED_OPERATIONS:
+                continue
+            if since is not None and day < since:
+                continue
+            owner = table.telegram_ids[i] or (table.first_names[i], table.last_names[i])
+            for period, key in period_keys(day).items():
+                total_key = (owner, period, key)
+                totals[total_key] = totals.get(total_key, 0.0) + amount
+            added += 1
+        return added
+
+
+_totals = SpendTotals()
+
+
+def get_spent_for_period(telegram_id: int, name: Optional[Tuple[str, str]], period: str) -> float:
+    """
+    Сумма расходов сотрудника за текущий день, неделю или месяц (блокирующий вызов).
+
+    Args:
+        telegram_id: ID сотрудника
+        name: (Имя, Фамилия) — для строк без telegram_id
+        period: "день", "неделя", "месяц"
+    """
+    _totals.refresh()
+    return _totals.spent(telegram_id, name, period)
+
+
+def warm_spend_totals():
+    """Построить итоги заранее (при запуске бота), а не при первом /add."""
+    _totals.refresh()
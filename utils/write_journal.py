@@ -0,0 +1,171 @@
+"""
+Локальный журнал изменений (write-ahead) на SQLite.
+
+Сохранение расхода сначала фиксируется в локальной базе (с fsync),
+и пользователь сразу получает ответ. Перенос в Google Sheets выполняет
+фоновый services/journal_replayer.py: по порядку, с повторами.
+Поэтому медленный или недоступный Sheets больше не теряет введённые
+в FSM данные.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from config.settings import JOURNAL_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class JournalEntry:
+    """Запись журнала: одна операция пользователя."""
+    id: int
+    kind: str
+    payload: dict
+    created_at: str
+    attempts: int = 0
+    state: dict = field(default_factory=dict)  # прогресс применения по шагам
+
+
+class WriteJournal:
+    """Хранилище журнала. Методы блокирующие и потокобезопасные."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                created_at TEXT NOT NULL,
+                applied_at TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS journal_status ON journal (status, id)")
+        self._conn.commit()
+
+    def append(self, kind: str, payload: dict) -> JournalEntry:
+        """Зафиксировать новую операцию (возврат — после записи на диск)."""
+        created_at = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO journal (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), created_at),
+            )
+            self._conn.commit()
+        return JournalEntry(cursor.lastrowid, kind, payload, created_at)
+
+    def pending(self, limit: int = 100) -> List[JournalEntry]:
+        """Неприменённые записи в порядке поступления."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, created_at, attempts, state FROM journal "
+                "WHERE status = ? ORDER BY id LIMIT ?",
+                (STATUS_PENDING, limit),
+            ).fetchall()
+        return [
+            JournalEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], json.loads(row[5]))
+            for row in rows
+        ]
+
+    def save_state(self, entry: JournalEntry):
+        """Сохранить прогресс применения записи."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE journal SET state = ? WHERE id = ?",
+                (json.dumps(entry.state, ensure_ascii=False), entry.id),
+            )
+            self._conn.commit()
+
+    def mark_done(self, entry: JournalEntry):
+        """Отметить запись перенесённой в Sheets."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE journal SET status = ?, state = ?, applied_at = ? WHERE id = ?",
+                (
+                    STATUS_DONE,
+                    json.dumps(entry.state, ensure_ascii=False),
+                    datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+                    entry.id,
+                ),
+            )
+            self._conn.commit()
+
+    def mark_failed(self, entry: JournalEntry, error: str):
+        """Снять запись с очереди: её невозможно применить (например, сотрудник удалён)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE journal SET status = ?, last_error = ?, state = ? WHERE id = ?",
+                (STATUS_FAILED, error, json.dumps(entry.state, ensure_ascii=False), entry.id),
+            )
+            self._conn.commit()
+
+    def mark_failed_attempt(self, entry: JournalEntry, error: str):
+        """Учесть неудачную попытку (запись остаётся в очереди)."""
+        entry.attempts += 1
+        with self._lock:
+            self._conn.execute(
+                "UPDATE journal SET attempts = ?, last_error = ?, state = ? WHERE id = ?",
+                (entry.attempts, error, json.dumps(entry.state, ensure_ascii=False), entry.id),
+            )
+            self._conn.commit()
+
+
+_journal: Optional[WriteJournal] = None
+_journal_lock = threading.Lock()
+_new_entries: Optional[asyncio.Event] = None
+
+
+def get_journal() -> WriteJournal:
+    """Получить общий журнал (база открывается при первом обращении)."""
+    global _journal
+
+    with _journal_lock:
+        if _journal is None:
+            _journal = WriteJournal(JOURNAL_DB_PATH)
+            logger.info(f"✅ Журнал изменений открыт: {JOURNAL_DB_PATH}")
+        return _journal
+
+
+def _new_entries_event() -> asyncio.Event:
+    global _new_entries
+
+    if _new_entries is None:
+        _new_entries = asyncio.Event()
+    return _new_entries
+
+
+async def journal_append(kind: str, payload: dict) -> JournalEntry:
+    """Записать операцию в журнал и разбудить фоновый перенос в Sheets."""
+    entry = await asyncio.to_thread(lambda: get_journal().append(kind, payload))
+    _new_entries_event().set()
+    return entry
+
+
+async def wait_for_entries(timeout: float):
+    """Подождать новых записей журнала (не дольше timeout секунд)."""
+    event = _new_entries_event()
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    event.clear()